@@ -0,0 +1,250 @@
+import queue
+import threading
+
+import psutil
+
+from src.utils.windows import get_window_registry
+
+try:
+    import win32con
+    import win32gui
+except ImportError:  # Windows가 아닌 환경
+    win32con = None
+    win32gui = None
+
+
+def _request_close(process, registry):
+    """정상 종료 요청: Windows에서는 프로세스 창에 WM_CLOSE, 그 밖에서는 SIGTERM"""
+    if win32gui is not None:
+        windows = registry.snapshot(max_age=0).by_pid.get(process.pid, ())
+        if windows:
+            for window in windows:
+                try:
+                    win32gui.PostMessage(window.hwnd, win32con.WM_CLOSE, 0, 0)
+                except Exception:
+                    pass
+            return
+    process.terminate()
+
+
+def terminate_processes(pids, grace=2.0, kill_timeout=2.0, registry=None):
+    """여러 PID를 한 번에 종료: 정상 종료 요청 → grace초 대기 → 강제 종료 → kill_timeout초 대기
+
+    (종료된 {pid: 종료 코드}, 아직 살아 있는 pid 목록)을 반환한다.
+    """
+    registry = registry or get_window_registry()
+    processes = []
+    exited = {}
+    for pid in pids:
+        try:
+            processes.append(psutil.Process(pid))
+        except psutil.NoSuchProcess:
+            exited[pid] = None
+
+    for process in processes:
+        try:
+            if grace:
+                _request_close(process, registry)
+            else:
+                process.kill()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    gone, alive = psutil.wait_procs(processes, timeout=grace or kill_timeout)
+
+    if alive:
+        for process in alive:
+            try:
+                process.kill()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        more_gone, alive = psutil.wait_procs(alive, timeout=kill_timeout)
+        gone += more_gone
+
+    for process in gone:
+        exited[process.pid] = process.returncode
+    registry.invalidate()  # 창 목록이 바뀌었으므로 캐시 비우기
+    return exited, [process.pid for process in alive]
+
+
+class ProcessLifecycleManager:
+    """선택된 프로세스를 psutil.wait_procs로 지켜보다가 종료되면 이벤트를 알린다
+
+    검사 스레드와 GUI는 매번 프로세스를 조회하는 대신 is_alive()/info()로 캐시된
+    상태를 읽고, 종료는 subscribe()한 콜백이나 events 큐로 전달받는다.
+    콜백은 감시 스레드(또는 terminate()를 호출한 스레드)에서 불린다.
+    검사 스레드는 request_terminate()로 종료를 종료 스레드에 맡기고 바로 돌아간다.
+    """
+
+    def __init__(self, poll_interval=0.5, grace=2.0, kill_timeout=2.0, registry=None):
+        self.poll_interval = poll_interval
+        self.grace = grace
+        self.kill_timeout = kill_timeout
+        self.registry = registry or get_window_registry()
+        self.events = queue.Queue()  # (pid, 종료 코드)
+        self._processes = {}
+        self._info = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._terminate_requests = queue.Queue()
+        self._terminating = set()
+        self._terminator = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="process-lifecycle", daemon=True)
+        self._thread.start()
+        self._terminator = threading.Thread(target=self._run_terminations, name="process-terminator",
+                                            daemon=True)
+        self._terminator.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        self._changed.set()
+        self._terminate_requests.put(None)
+        for thread in (self._thread, self._terminator):
+            if thread is not None:
+                thread.join(timeout=timeout)
+
+    def subscribe(self, callback):
+        """callback(pid, 종료 코드, info) 등록"""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def watch(self, pid):
+        """감시 시작, 이미 종료된 PID면 바로 종료 이벤트를 알리고 False"""
+        try:
+            process = psutil.Process(pid)
+            name = process.name().replace('.exe', '')
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            self._publish(pid, None, {'name': None, 'pid': pid, 'window_title': "Unknown"})
+            return False
+        with self._lock:
+            if pid not in self._processes:
+                self._processes[pid] = process
+                self._info[pid] = {'name': name, 'pid': pid, 'window_title': None}
+        self._changed.set()
+        return True
+
+    def unwatch(self, pid):
+        with self._lock:
+            self._processes.pop(pid, None)
+            self._info.pop(pid, None)
+        self._changed.set()
+
+    def watched(self):
+        with self._lock:
+            return list(self._processes)
+
+    def is_alive(self, pid):
+        with self._lock:
+            return pid in self._processes
+
+    def info(self, pid):
+        """get_process_info와 같은 형식의 캐시된 정보 (종료되었거나 감시 중이 아니면 None)
+
+        창 제목은 공유 창 목록에서 한 번 찾으면 계속 재사용한다.
+        """
+        with self._lock:
+            info = self._info.get(pid)
+            if info is None:
+                return None
+            if info['window_title']:
+                return dict(info)
+        title = self.registry.ldplayer_title(pid)
+        with self._lock:
+            info = self._info.get(pid)
+            if info is None:
+                return None
+            if title:
+                info['window_title'] = title
+            return dict(info, window_title=title or "Unknown")
+
+    def terminate(self, pids):
+        """여러 PID를 한 번에 정상 종료 → 강제 종료하고, 종료된 PID마다 이벤트를 알린다"""
+        exited, alive = terminate_processes(pids, self.grace, self.kill_timeout, self.registry)
+        for pid, returncode in exited.items():
+            self._exited(pid, returncode)
+        for pid in alive:
+            print(f"프로세스를 종료하지 못했습니다: {pid}")
+        return exited, alive
+
+    def request_terminate(self, pids):
+        """종료를 종료 스레드에 맡기고 바로 반환, 새로 맡긴 PID 목록을 돌려준다
+
+        이미 종료 중인 PID는 다시 맡기지 않는다. 완료는 다른 종료와 같이 이벤트로 알린다.
+        """
+        with self._lock:
+            pids = [pid for pid in dict.fromkeys(pids) if pid not in self._terminating]
+            self._terminating.update(pids)
+        if pids:
+            self._terminate_requests.put(pids)
+        return pids
+
+    def is_terminating(self, pid):
+        with self._lock:
+            return pid in self._terminating
+
+    def _run_terminations(self):
+        while not self._stop.is_set():
+            request = self._terminate_requests.get()
+            if request is None:
+                return
+            # 그 사이 쌓인 요청은 한 번에 종료한다 (대기 시간을 한 번만 쓰도록)
+            pids = list(request)
+            while True:
+                try:
+                    request = self._terminate_requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._terminate_requests.put(None)
+                    break
+                pids.extend(request)
+            try:
+                self.terminate(pids)
+            except Exception as e:
+                print(f"프로세스 종료 중 오류 발생: {str(e)}")
+            finally:
+                with self._lock:
+                    self._terminating.difference_update(pids)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                processes = list(self._processes.values())
+            if not processes:
+                self._changed.wait(self.poll_interval)
+                self._changed.clear()
+                continue
+            self._changed.clear()
+            try:
+                gone, _ = psutil.wait_procs(processes, timeout=self.poll_interval)
+            except Exception as e:
+                print(f"프로세스 감시 중 오류 발생: {str(e)}")
+                self._stop.wait(self.poll_interval)
+                continue
+            for process in gone:
+                self._exited(process.pid, process.returncode)
+
+    def _exited(self, pid, returncode):
+        with self._lock:
+            if self._processes.pop(pid, None) is None:
+                return  # 이미 알렸거나 감시 중이 아님
+            info = self._info.pop(pid, None)
+        self.registry.invalidate()
+        self._publish(pid, returncode, info)
+
+    def _publish(self, pid, returncode, info):
+        self.events.put((pid, returncode))
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(pid, returncode, info)
+            except Exception as e:
+                print(f"프로세스 종료 알림 처리 중 오류: {str(e)}")
@@ -3,6 +3,7 @@ from tkinter import ttk
 import sys
 import os
 import json
+import multiprocessing
 
 # 현재 디렉토리의 부모 디렉토리를 path에 추가
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,23 +12,34 @@ sys.path.append(parent_dir)
 
 CONFIG_FILE = os.path.join(current_dir, 'config.json')
 
-from src.process_manager import ProcessManager
-from src.utils.scanner import ImageScanner
-import time
+from src.utils.scanner import DEFAULT_TEMPLATE_SCALES, ImageScanner
+from src.utils.windows import get_window_registry
+from src.utils.capture import AdbScreencapBackend, PrintWindowBackend
+from src.utils.adb import device_address_for_title
+from src.scheduler import AdaptiveScheduler
+from src.process_poller import ProcessPoller
+from src.lifecycle import ProcessLifecycleManager
+from src.scenario import ScenarioWatcher
+from src.utils.recorder import RecorderPool
+from src.utils.pipeline import MatchPipeline, SCAN_PROCESS
+from src.utils.metrics import get_stage_metrics, STAGES, STAGE_WINDOW_LOOKUP
 from tkinter import messagebox
 import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 class ProcessMonitorGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("프로세스 모니터")
-        self.root.geometry("800x400")
+        self.root.geometry("800x480")
 
         # 변수 초기화
         self.selected_processes = set()
         self.is_monitoring = False
-        self.monitor_thread = None
-        self.image_scanner = ImageScanner()
+        self.scheduler = None
+        # 창 목록은 ProcessManager, ImageScanner와 같은 레지스트리를 공유
+        self.window_registry = get_window_registry()
         
         # PyInstaller의 임시 폴더 경로 가져오기
         if getattr(sys, 'frozen', False):
@@ -45,6 +57,79 @@ class ProcessMonitorGUI:
         # 설정 로드
         config = self.load_config()
         self.adb_path.set(config.get("adb_path", ""))
+        # 작업 스레드에서는 StringVar 대신 이 값을 읽는다
+        self.adb_path_value = self.adb_path.get()
+        self.adb_path.trace_add('write', self.on_adb_path_changed)
+        
+        # 캡처 방식: 'printwindow'(창 캡처) 또는 'adb'(기기 screencap, 기기 좌표 그대로 사용)
+        if config.get("capture_backend", "printwindow") == "adb":
+            capture_backend = AdbScreencapBackend(self.adb_path_value)
+        else:
+            capture_backend = PrintWindowBackend()
+        # template_scales: 해상도가 다른 인스턴스용으로 시험할 템플릿 배율 (빈 목록이면 원본 크기만,
+        #                  기준 해상도 창은 1.0에서 바로 맞으므로 보정 매칭은 창마다 한 번뿐)
+        # hit_stats: 템플릿별 매칭 확률/비용 통계로 검사 순서와 주기를 정한다 (없거나 null이면 끔)
+        # prefilter: 색상(hue) 히스토그램으로 있을 수 없는 템플릿의 매칭을 건너뛴다 (null이면 끔,
+        #            예: {"false_rejection": 0.01}, false_rejection은 밝기·대비가 바뀐 화면에서
+        #            실제로 있는 템플릿을 걸러내도 되는 목표 비율)
+        matching_options = {'template_scales': config.get("template_scales", DEFAULT_TEMPLATE_SCALES) or None,
+                            'hit_stats': config.get("hit_stats"),
+                            'prefilter': config.get("prefilter")}
+        # 탭은 기기별 대기열로 보낸다 (같은 템플릿·위치 반복 탭은 tap_cooldown초 동안 버림)
+        tap_options = {
+            'cooldown': float(config.get("tap_cooldown", 1.0)),
+            'max_queue': int(config.get("tap_queue_size", 8)),
+            'batch_window': float(config.get("tap_batch_window", 0.05)),
+        }
+        self.image_scanner = ImageScanner(window_registry=self.window_registry,
+                                          capture_backend=capture_backend,
+                                          tap_options=tap_options,
+                                          **matching_options)
+        
+        # scan_mode 'process': 캡처는 검사 스레드에서, 매칭은 공유 메모리로 프레임을 넘겨받는 별도 프로세스에서
+        if config.get("scan_mode", "thread") == SCAN_PROCESS:
+            pipeline = MatchPipeline(workers=int(config.get("match_workers", 0)) or None,
+                                     scanner_options=matching_options,
+                                     template_cache=self.image_scanner.template_cache)
+            pipeline.start()
+            self.image_scanner.pipeline = pipeline
+            print(f"매칭 프로세스 {pipeline.workers}개 시작")
+        
+        # 오동작 재현용 프레임 녹화 (인스턴스별 mmap 링 버퍼 파일)
+        if config.get("record_frames", False):
+            record_dir = config.get("record_dir") or os.path.join(os.path.dirname(self.get_config_path()), "recordings")
+            self.image_scanner.recorder = RecorderPool(record_dir, slots=int(config.get("record_slots", 60)))
+            print(f"프레임 녹화 중: {record_dir}")
+        
+        # 인스턴스 병렬 검사용 스레드 풀
+        self.scan_workers = max(1, int(config.get("scan_workers", 4)))
+        self.scan_pool = ThreadPoolExecutor(max_workers=self.scan_workers, thread_name_prefix="scan")
+        self.selected_lock = threading.Lock()
+        
+        # 인스턴스별 적응형 검사 주기 설정
+        self.schedule_config = {
+            'interval': float(config.get("scan_interval", 1.0)),
+            'min_interval': float(config.get("scan_min_interval", 0.25)),
+            'max_interval': float(config.get("scan_max_interval", 5.0)),
+            'backoff': float(config.get("scan_backoff", 1.5)),
+            'cpu_budget': float(config.get("scan_cpu_budget", 1.0)),
+            'deadline': float(config.get("scan_deadline", 2.0)),
+        }
+        # 검사할 템플릿은 config.json의 "scenario" 매니페스트와 이미지 폴더로 컴파일하고
+        # 파일이 바뀌었을 때만 다시 컴파일한다
+        self.scenario = ScenarioWatcher(self.get_config_path(), self.base_path,
+                                        poll_interval=float(config.get("scenario_poll_interval", 1.0)))
+        
+        # 프로세스 목록은 백그라운드에서 읽고 변경분만 트리뷰에 반영 (pid → 프로세스 정보)
+        self.process_rows = {}
+        self.process_poller = ProcessPoller(interval=float(config.get("process_poll_interval", 3.0)))
+        
+        # 선택된 프로세스의 종료를 감시하고 종료 요청을 처리 (종료는 이벤트로 전달받는다)
+        self.lifecycle = ProcessLifecycleManager(grace=float(config.get("kill_grace", 2.0)),
+                                                 kill_timeout=float(config.get("kill_timeout", 2.0)),
+                                                 registry=self.window_registry)
+        self.lifecycle.subscribe(self.on_process_exit)
+        self.lifecycle.start()
         
         # 메인 프레임 생성
         main_frame = ttk.Frame(root)
@@ -71,6 +156,12 @@ class ProcessMonitorGUI:
         # 선택된 프로세스 표시 레이블
         ttk.Label(right_frame, text="선택된 프로세스", font=('Arial', 10, 'bold')).pack(pady=5)
         
+        # 단계별 지연 시간 패널 (오른쪽 하단)
+        metrics_frame = ttk.LabelFrame(right_frame, text="단계별 지연 (p50 / p95 ms)")
+        metrics_frame.pack(side='bottom', fill='x', padx=5, pady=(0, 5))
+        self.metrics_label = tk.Label(metrics_frame, text="", font=('Consolas', 8), justify='left', anchor='w')
+        self.metrics_label.pack(fill='x')
+        
         # 리스트박스와 스크롤바를 담을 프레임
         listbox_frame = ttk.Frame(right_frame)
         listbox_frame.pack(fill='both', expand=True, padx=5, pady=(0, 10))
@@ -151,17 +242,31 @@ class ProcessMonitorGUI:
         self.tree.pack(side='left', fill='x')
         scrollbar.pack(side='right', fill='y')
 
-        # 초기 프로세스 목록 로드
-        self.update_process_list()
+        # 프로세스 목록 폴링 시작 (변경분은 메인 스레드에서 주기적으로 적용)
+        self.process_poller.start()
+        self.root.after(100, self.apply_process_diffs)
         
-        # 3초마다 자동 새로고침
-        self.root.after(3000, self.auto_refresh)
+        # 단계별 지연 시간 내보내기 (Prometheus 텍스트 파일 / HTTP)
+        self.stage_metrics = get_stage_metrics()
+        self.metrics_textfile = config.get("metrics_textfile", "")
+        self.metrics_server = None
+        metrics_port = int(config.get("metrics_port", 0))
+        if metrics_port:
+            try:
+                self.metrics_server = self.stage_metrics.serve(metrics_port)
+                print(f"지표 서버 시작: http://127.0.0.1:{metrics_port}/metrics")
+            except OSError as e:
+                print(f"지표 서버 시작 실패: {str(e)}")
+        self.root.after(1000, self.update_metrics_panel)
+
+    def get_config_path(self):
+        # 실행 파일 디렉토리에서 config.json 찾기
+        base_path = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(__file__)
+        return os.path.join(base_path, 'config.json')
 
     def load_config(self):
         try:
-            # 실행 파일 디렉토리에서 config.json 찾기
-            base_path = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(__file__)
-            config_path = os.path.join(base_path, 'config.json')
+            config_path = self.get_config_path()
             
             # config.json이 없으면 기본 설정으로 생성
             if not os.path.exists(config_path):
@@ -182,12 +287,11 @@ class ProcessMonitorGUI:
 
     def save_config(self):
         try:
-            base_path = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(__file__)
-            config_path = os.path.join(base_path, 'config.json')
+            config_path = self.get_config_path()
             
-            config = {
-                "adb_path": self.adb_path.get()
-            }
+            # 다른 설정 항목은 유지하고 ADB 경로만 갱신
+            config = self.load_config()
+            config["adb_path"] = self.adb_path.get()
             
             with open(config_path, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=4)
@@ -206,29 +310,73 @@ class ProcessMonitorGUI:
             self.adb_path.set(filename)
             self.save_config()  # 경로 선택 시 자동 저장
 
+    def on_adb_path_changed(self, *args):
+        self.adb_path_value = self.adb_path.get()
+        backend = self.image_scanner.capture_backend
+        if isinstance(backend, AdbScreencapBackend):
+            backend.adb_path = self.adb_path_value
+
     def on_closing(self):
         self.save_config()  # 프로그램 종료 시 설정 저장
+        self.stop_monitoring()
+        self.process_poller.stop()
+        self.lifecycle.stop()
+        self.scan_pool.shutdown(wait=False)
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+        self.image_scanner.close()  # ADB 세션, 녹화 파일 종료
         self.root.destroy()
 
     def update_process_list(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        processes = ProcessManager.get_process_list()
+        """선택 표시를 다시 그리고 프로세스 목록을 바로 다시 읽도록 요청"""
+        with self.selected_lock:
+            selected = set(self.selected_processes)
+        for pid in self.process_rows:
+            self.tree.set(str(pid), '체크', "✓" if pid in selected else " ")
+        self.process_poller.refresh()
+
+    def apply_process_diffs(self):
+        """백그라운드 폴러가 보낸 변경분만 트리뷰에 반영 (추가/삭제/제자리 갱신)"""
+        selected_changed = False
+        with self.selected_lock:
+            selected = set(self.selected_processes)
         
-        # 최대 8개까지만 표시
-        for proc in processes[:8]:
-            pid = proc['pid']
-            check = "✓" if pid in self.selected_processes else " "
-            self.tree.insert('', 'end', values=(
-                check,
-                pid,
-                proc['name'],
-                proc['window_title']
-            ))
+        for diff in self.process_poller.drain():
+            for pid in diff.removed:
+                self.process_rows.pop(pid, None)
+                if self.tree.exists(str(pid)):
+                    self.tree.delete(str(pid))
+                selected_changed |= pid in selected
+            for pid, proc in diff.changed.items():
+                self.process_rows[pid] = proc
+                if self.tree.exists(str(pid)):
+                    self.tree.set(str(pid), '이름', proc['name'])
+                    self.tree.set(str(pid), '창 제목', proc['window_title'])
+                selected_changed |= pid in selected
+            for pid, proc in diff.added.items():
+                self.process_rows[pid] = proc
+                check = "✓" if pid in selected else " "
+                if not self.tree.exists(str(pid)):
+                    self.tree.insert('', 'end', iid=str(pid), values=(
+                        check,
+                        pid,
+                        proc['name'],
+                        proc['window_title']
+                    ))
+                selected_changed |= pid in selected
         
-        # 선택된 프로세스 목록 업데이트
-        self.update_selected_listbox()
+        # 종료된 프로세스는 감시 스레드가 이미 선택 목록에서 뺐다
+        exited = self.drain_exit_events()
+        if exited:
+            selected_changed = True
+            if self.is_monitoring and not self.monitored_pids():
+                print("모니터링할 프로세스가 없습니다.")
+                self.clear_and_stop_monitoring()
+        
+        # 선택된 프로세스 목록 업데이트 (선택된 프로세스가 바뀐 경우만)
+        if selected_changed:
+            self.update_selected_listbox()
+        self.root.after(200, self.apply_process_diffs)
 
     def handle_click(self, event):
         region = self.tree.identify("region", event.x, event.y)
@@ -237,31 +385,55 @@ class ProcessMonitorGUI:
             item = self.tree.identify_row(event.y)
             
             if column == '#1' and item:
-                values = self.tree.item(item)['values']
-                if values:
-                    pid = values[1]
-                    name = values[2]
-                    window_title = values[3]
-                    
+                pid = int(item)
+                with self.selected_lock:
                     if pid in self.selected_processes:
                         self.selected_processes.remove(pid)
+                        check = " "
                     else:
                         self.selected_processes.add(pid)
-                    
-                    self.update_process_list()
-                    self.update_selected_listbox()  # 선택된 프로세스 목록 업데이트
+                        check = "✓"
+                if check == "✓":
+                    self.lifecycle.watch(pid)
+                else:
+                    self.lifecycle.unwatch(pid)
+                
+                self.tree.set(item, '체크', check)
+                self.update_selected_listbox()  # 선택된 프로세스 목록 업데이트
 
     def update_selected_listbox(self):
+        """폴러가 받아둔 프로세스 정보로 다시 그린다 (프로세스를 다시 조회하지 않음)"""
         self.selected_listbox.delete(0, tk.END)
-        for pid in self.selected_processes:
-            process_info = ProcessManager.get_process_info(pid)
+        with self.selected_lock:
+            pids = sorted(self.selected_processes)
+        for pid in pids:
+            process_info = self.process_rows.get(pid)
             if process_info:
                 self.selected_listbox.insert(tk.END, 
                     f"PID: {pid} - {process_info['name']}")
 
-    def auto_refresh(self):
-        self.update_process_list()
-        self.root.after(3000, self.auto_refresh)
+    def update_metrics_panel(self):
+        summary = self.stage_metrics.summary()
+        lines = []
+        for stage in STAGES:
+            stats = summary.get(stage)
+            if stats and stats['count']:
+                lines.append(f"{stage:<13} {stats['p50'] * 1000:6.1f} / {stats['p95'] * 1000:6.1f}")
+        taps = self.image_scanner.tap_stats()
+        if taps:
+            lines.append(f"탭 대기 {sum(taps['queue_depth'].values())} / 병합 {taps['merged']} / "
+                         f"중복 {taps['dropped_duplicate']} / 초과 {taps['dropped_backpressure']}")
+        prefilter = self.image_scanner.prefilter_stats()
+        if prefilter.get('checked'):
+            lines.append(f"사전 검사 건너뜀 {prefilter['rejected']} / {prefilter['checked']}")
+        self.metrics_label.config(text="\n".join(lines) if lines else "측정값 없음")
+        
+        if self.metrics_textfile:
+            try:
+                self.stage_metrics.write_textfile(self.metrics_textfile)
+            except OSError as e:
+                print(f"지표 파일 저장 중 오류: {str(e)}")
+        self.root.after(1000, self.update_metrics_panel)
 
     def toggle_monitoring(self):
         if not self.is_monitoring:
@@ -295,80 +467,98 @@ class ProcessMonitorGUI:
     def start_monitoring(self):
         if not self.is_monitoring:
             self.is_monitoring = True
-            self.monitor_thread = threading.Thread(target=self.monitor_images, daemon=True)
-            self.monitor_thread.start()
+            self.scheduler = AdaptiveScheduler(
+                self.scan_instance,
+                self.scan_pool,
+                self.monitored_pids,
+                **self.schedule_config
+            )
+            self.scheduler.start()
 
     def stop_monitoring(self):
         self.is_monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=1.0)
+        if self.scheduler:
+            self.scheduler.stop()
 
-    def monitor_images(self):
-        while self.is_monitoring:
+    def monitored_pids(self):
+        """스케줄러가 검사할 PID 목록 (스케줄러 스레드에서 호출)"""
+        with self.selected_lock:
+            return list(self.selected_processes)
+
+    def current_templates(self):
+        """검사할 템플릿 목록 (우선순위 순서, 매니페스트/폴더가 바뀌었을 때만 다시 컴파일)"""
+        return self.scenario.plan().templates
+
+    def resolve_capture_target(self, window_title):
+        """캡처에 넘길 창 핸들 (찾을 수 없으면 False)
+
+        ADB 캡처는 창 제목으로 기기 주소를 계산하므로 창 핸들 없이 None을 넘긴다.
+        """
+        if self.image_scanner.capture_backend.device_coordinates:
             try:
-                # 존재하지 않는 프로세스 필터링
-                active_processes = set()
-                for pid in self.selected_processes:
-                    process_info = ProcessManager.get_process_info(pid)
-                    if process_info:
-                        active_processes.add(pid)
-                    else:
-                        print(f"PID {pid}의 프로세스가 이미 종료되었습니다.")
-                
-                self.selected_processes = active_processes
-                self.root.after(0, self.update_selected_listbox)
-                
-                if not self.selected_processes:
-                    print("모니터링할 프로세스가 없습니다.")
-                    self.is_monitoring = False
-                    self.root.after(0, self.clear_and_stop_monitoring)
-                    break
-                
-                # images 폴더 검사 (로깅 제거)
-                if os.path.exists(self.images_folder):
-                    image_files = [f for f in os.listdir(self.images_folder) 
-                                 if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-                    
-                    # click_images 폴더 검사
-                    click_images_folder = os.path.join(os.path.dirname(self.images_folder), "click_images")
-                    if os.path.exists(click_images_folder):
-                        click_image_files = [f for f in os.listdir(click_images_folder) 
-                                          if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-                        
-                        for pid in list(self.selected_processes):
-                            process_info = ProcessManager.get_process_info(pid)
-                            if process_info and 'window_title' in process_info:
-                                window_title = process_info['window_title']
-                                if window_title != "Unknown":
-                                    # 클릭 이미지 검사 및 클릭
-                                    for filename in click_image_files:
-                                        image_path = os.path.join(click_images_folder, filename)
-                                        self.image_scanner.click_image(
-                                            image_path,
-                                            window_title=window_title,
-                                            confidence=0.8,
-                                            adb_path=self.adb_path.get()
-                                        )
-                                    
-                                    # 종료 조건 이미지 검사 (로깅 제거)
-                                    for filename in image_files:
-                                        image_path = os.path.join(self.images_folder, filename)
-                                        results = self.image_scanner.find_center(
-                                            image_path,
-                                            window_title=window_title,
-                                            confidence=0.8,
-                                            suppress_logging=True
-                                        )
-                                        if results:
-                                            ProcessManager.kill_process(pid)
-                                            self.selected_processes.remove(pid)
-                                            self.root.after(0, self.update_selected_listbox)
-                                            break
-                
-                time.sleep(1)
-                
-            except Exception as e:
-                print(f"모니터링 중 오류 발생: {str(e)}")
+                device_address_for_title(window_title)
+            except (IndexError, ValueError):
+                return False
+            return None
+        return self.window_registry.hwnd_for_title(window_title) or False
+
+    def scan_instance(self, pid):
+        """인스턴스 하나를 캡처해서 모든 템플릿을 검사하고 탭/종료까지 처리 (작업 스레드에서 실행)"""
+        try:
+            # 종료 여부는 감시 스레드가 알려주므로 여기서는 캐시된 정보만 읽는다
+            process_info = self.lifecycle.info(pid)
+            if not process_info or self.lifecycle.is_terminating(pid):
+                return None
+            
+            templates = self.current_templates()
+            window_title = process_info.get('window_title', "Unknown")
+            if not templates or window_title == "Unknown":
+                return None
+            with self.stage_metrics.timer(STAGE_WINDOW_LOOKUP, window_title):
+                hwnd = self.resolve_capture_target(window_title)
+            if hwnd is False:
+                return None
+            
+            # 인스턴스당 한 번 캡처해서 모든 템플릿 검사
+            result = self.image_scanner.scan_window(hwnd, window_title, templates)
+            if result is None:
+                return None
+            
+            # 종료할 인스턴스는 탭하지 않는다
+            if not result.kills:
+                for hit in result.taps:
+                    self.image_scanner.tap_hit(result, hit, self.adb_path_value)
+            
+            if result.kills:
+                # 종료는 종료 스레드가 하고, 정리는 on_process_exit에서 한다
+                self.lifecycle.request_terminate([pid])
+            return result
+        except Exception as e:
+            print(f"모니터링 중 오류 발생: {str(e)}")
+            return None
+
+    def on_process_exit(self, pid, returncode, info):
+        """감시 중인 프로세스가 종료되었을 때 (감시 스레드에서 호출, 위젯은 건드리지 않음)"""
+        title = info.get('window_title') if info else None
+        print(f"PID {pid}의 프로세스가 종료되었습니다. (종료 코드: {returncode})")
+        with self.selected_lock:
+            self.selected_processes.discard(pid)
+        if title and title != "Unknown":
+            self.image_scanner.forget_instance(title)
+        self.process_poller.refresh()  # 종료된 프로세스를 목록에서 바로 빼기
+
+    def drain_exit_events(self):
+        """GUI 스레드에서 종료 이벤트를 모두 꺼낸다"""
+        exited = []
+        while True:
+            try:
+                exited.append(self.lifecycle.events.get_nowait())
+            except queue.Empty:
+                return exited
+
+    def latency_summary(self):
+        """인스턴스별 검사 주기와 소요 시간 요약"""
+        return self.scheduler.stats() if self.scheduler else {}
 
     def stop_monitoring_gui(self):
         """GUI 스레드에서 모니터링을 중지하는 메서드"""
@@ -386,8 +576,12 @@ class ProcessMonitorGUI:
 
     def clear_and_stop_monitoring(self):
         """프로세스 목록을 초기화하고 모니터링을 중지하는 메서드"""
-        self.is_monitoring = False  # 모니터링 상태를 확실히 False로 설정
-        self.selected_processes.clear()  # 프로세스 목록 초기화
+        self.stop_monitoring()  # 모니터링 상태를 확실히 False로 설정
+        with self.selected_lock:
+            pids = list(self.selected_processes)
+            self.selected_processes.clear()  # 프로세스 목록 초기화
+        for pid in pids:
+            self.lifecycle.unwatch(pid)
         self.update_selected_listbox()   # 리스트박스 업데이트
         self.update_process_list()       # 프로세스 목록 업데이트
         
@@ -404,6 +598,7 @@ class ProcessMonitorGUI:
         )
 
 def main():
+    multiprocessing.freeze_support()  # PyInstaller 실행 파일에서 매칭 프로세스 시작용
     root = tk.Tk()
     app = ProcessMonitorGUI(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)  # 종료 이벤트 처리
@@ -1,36 +1,23 @@
 import psutil
 from datetime import datetime
 import os
-import win32gui
-import win32process
+
+from src.lifecycle import terminate_processes
+from src.utils.windows import get_window_registry
 
 class ProcessManager:
     @staticmethod
     def get_process_list():
-        import psutil
-        import win32gui
-        import win32process
-
-        def get_window_title(pid):
-            def callback(hwnd, titles):
-                if win32gui.IsWindowVisible(hwnd):
-                    _, found_pid = win32process.GetWindowThreadProcessId(hwnd)
-                    if found_pid == pid:
-                        title = win32gui.GetWindowText(hwnd)
-                        if title.startswith('LDPlayer-'):
-                            titles.append(title)
-                return True
-
-            titles = []
-            win32gui.EnumWindows(callback, titles)
-            return titles[0] if titles else "Unknown"
+        # 모든 프로세스의 창 제목은 공유 창 목록 한 번으로 조회
+        snapshot = get_window_registry().snapshot()
 
         processes = []
         for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
             try:
                 pinfo = proc.info
                 if 'dnplayer' in pinfo['name'].lower():
-                    window_title = get_window_title(pinfo['pid'])
+                    window = snapshot.ldplayer_window_for_pid(pinfo['pid'])
+                    window_title = window.title if window else "Unknown"
                     processes.append({
                         'pid': pinfo['pid'],
                         'name': pinfo['name'].replace('.exe', ''),
@@ -45,8 +32,9 @@ class ProcessManager:
     @staticmethod
     def kill_process(pid):
         try:
-            os.system(f'taskkill /F /PID {pid}')
-            return True
+            # 셸을 띄우지 않고 psutil로 종료 (정상 종료 요청 후 강제 종료)
+            _, alive = terminate_processes([pid])
+            return not alive
         except Exception as e:
             print(f"프로세스 종료 중 오류 발생: {str(e)}")
             return False
@@ -54,32 +42,16 @@ class ProcessManager:
     @staticmethod
     def get_process_info(pid):
         try:
-            import psutil
             process = psutil.Process(pid)
             name = process.name().replace('.exe', '')
             
-            # 창 제목 가져오기
-            def get_window_title(pid):
-                def callback(hwnd, titles):
-                    if win32gui.IsWindowVisible(hwnd):
-                        _, found_pid = win32process.GetWindowThreadProcessId(hwnd)
-                        if found_pid == pid:
-                            title = win32gui.GetWindowText(hwnd)
-                            if title.startswith('LDPlayer-'):
-                                titles.append(title)
-                            elif title:  # 디버깅용
-                                print(f"Found window for PID {pid}: '{title}'")
-                    return True
-
-                titles = []
-                win32gui.EnumWindows(callback, titles)
-                if not titles:  # 디버깅용
-                    print(f"No window titles found for PID {pid}")
-                return titles[0] if titles else None
-
-            window_title = get_window_title(pid)
+            # 창 제목 가져오기 (공유 창 목록 사용)
+            snapshot = get_window_registry().snapshot()
+            window = snapshot.ldplayer_window_for_pid(pid)
+            window_title = window.title if window else None
             if not window_title:  # 디버깅용
-                print(f"Window title not found for process: {name} (PID: {pid})")
+                print(f"Window title not found for process: {name} (PID: {pid}), "
+                      f"titles: {snapshot.titles_for_pid(pid)}")
             
             return {
                 'name': name,
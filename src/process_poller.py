@@ -0,0 +1,90 @@
+import queue
+import threading
+
+from src.process_manager import ProcessManager
+
+
+class ProcessListDiff:
+    """이전 목록과 비교한 프로세스 변경분 (pid → 프로세스 정보)"""
+
+    def __init__(self, added, removed, changed):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+class ProcessPoller:
+    """백그라운드 스레드에서 프로세스 목록을 주기적으로 읽고 변경분만 큐에 넣는다
+
+    Tk 위젯은 메인 스레드에서만 건드려야 하므로 GUI는 drain()으로 큐를 비워서
+    변경분을 적용한다. 화면에 보이는 필드(fields)가 바뀐 경우만 changed로 본다.
+    """
+
+    def __init__(self, interval=3.0, list_fn=None, fields=('name', 'window_title')):
+        self.interval = interval
+        self.list_fn = list_fn or ProcessManager.get_process_list
+        self.fields = fields
+        self.diffs = queue.Queue()
+        self.polls = 0
+        self._known = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="process-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+
+    def refresh(self):
+        """다음 주기를 기다리지 않고 바로 다시 읽기 (프로세스 종료 직후 등)"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"프로세스 목록 조회 중 오류 발생: {str(e)}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def poll(self):
+        """목록을 한 번 읽고 변경분이 있으면 큐에 넣은 뒤 반환"""
+        current = {proc['pid']: proc for proc in self.list_fn()}
+        self.polls += 1
+        diff = self.compare(self._known, current)
+        self._known = current
+        if diff:
+            self.diffs.put(diff)
+        return diff
+
+    def compare(self, previous, current):
+        added = {pid: proc for pid, proc in current.items() if pid not in previous}
+        removed = {pid: proc for pid, proc in previous.items() if pid not in current}
+        changed = {
+            pid: proc for pid, proc in current.items()
+            if pid in previous and any(proc.get(f) != previous[pid].get(f) for f in self.fields)
+        }
+        return ProcessListDiff(added, removed, changed)
+
+    def drain(self):
+        """쌓인 변경분을 모두 꺼내서 목록으로 반환 (메인 스레드에서 호출)"""
+        diffs = []
+        while True:
+            try:
+                diffs.append(self.diffs.get_nowait())
+            except queue.Empty:
+                return diffs
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+
+from src.utils.scanner import TemplateSpec, ACTION_TAP, ACTION_KILL, ACTION_IGNORE
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+ACTIONS = (ACTION_TAP, ACTION_KILL, ACTION_IGNORE)
+
+# 폴더 위치로 정하는 기본 동작 (매니페스트에 없는 이미지에 적용)
+FOLDER_ACTIONS = (('click_images', ACTION_TAP), ('images', ACTION_KILL))
+
+
+class ScenarioError(Exception):
+    """매니페스트 항목이 잘못되었을 때 발생"""
+
+
+class ScenarioPlan:
+    """한 번 컴파일한 검사 계획 (우선순위 높은 순서의 TemplateSpec 목록)"""
+
+    def __init__(self, templates, version=0):
+        self.templates = templates
+        self.version = version
+        self.by_path = {spec.path: spec for spec in templates}
+
+    def __len__(self):
+        return len(self.templates)
+
+    def __iter__(self):
+        return iter(self.templates)
+
+
+def compile_plan(manifest, base_path, version=0):
+    """config.json의 "scenario" 항목과 이미지 폴더로 검사 계획을 만든다
+
+    manifest 예:
+        {"default_confidence": 0.8, "folders": true,
+         "templates": [{"path": "click_images/ok.png", "action": "tap",
+                        "confidence": 0.85, "roi": [0, 400, 994, 178],
+                        "cooldown": 2.0, "priority": 10}]}
+
+    folders가 true면 click_images/(탭), images/(종료) 폴더의 이미지 중 목록에 없는
+    것도 기본값으로 포함한다. action이 "ignore"인 항목은 계획에서 빠진다.
+    """
+    manifest = manifest or {}
+    default_confidence = float(manifest.get('default_confidence', 0.8))
+    entries = {}
+
+    if manifest.get('folders', True):
+        for folder, action in FOLDER_ACTIONS:
+            folder_path = os.path.join(base_path, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for filename in sorted(os.listdir(folder_path)):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.normpath(os.path.join(folder_path, filename))
+                    entries[path] = {'action': action}
+
+    for index, entry in enumerate(manifest.get('templates', [])):
+        if 'path' not in entry:
+            raise ScenarioError(f"templates[{index}]에 path가 없습니다.")
+        path = os.path.normpath(os.path.join(base_path, entry['path']))
+        entries[path] = dict(entries.get(path, {}), **entry)
+
+    templates = []
+    for order, (path, entry) in enumerate(entries.items()):
+        action = entry.get('action', ACTION_TAP)
+        if action not in ACTIONS:
+            raise ScenarioError(f"알 수 없는 동작 '{action}': {path}")
+        if action == ACTION_IGNORE:
+            continue
+        roi = entry.get('roi')
+        if roi is not None and len(roi) != 4:
+            raise ScenarioError(f"roi는 [x, y, w, h] 형식이어야 합니다: {path}")
+        templates.append((
+            -int(entry.get('priority', 0)),
+            order,
+            TemplateSpec(path, action,
+                         confidence=float(entry.get('confidence', default_confidence)),
+                         roi=roi,
+                         cooldown=(float(entry['cooldown'])
+                                   if entry.get('cooldown') is not None else None),
+                         priority=int(entry.get('priority', 0))),
+        ))
+    templates.sort(key=lambda item: item[:2])
+    return ScenarioPlan([spec for _, _, spec in templates], version)
+
+
+class ScenarioWatcher:
+    """설정 파일과 이미지 폴더의 mtime이 바뀔 때만 검사 계획을 다시 컴파일
+
+    plan()은 poll_interval초에 한 번만 stat을 확인하고, 그 사이에는 캐시된 계획을
+    그대로 돌려준다. 새 매니페스트가 잘못되었으면 이전 계획을 유지한다.
+    """
+
+    def __init__(self, config_path, base_path, poll_interval=1.0):
+        self.config_path = config_path
+        self.base_path = base_path
+        self.poll_interval = poll_interval
+        self._plan = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.compiles = 0
+
+    def _watched_paths(self):
+        paths = [self.config_path]
+        paths += [os.path.join(self.base_path, folder) for folder, _ in FOLDER_ACTIONS]
+        return paths
+
+    def signature(self):
+        signature = []
+        for path in self._watched_paths():
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def load_manifest(self):
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('scenario', {})
+        except FileNotFoundError:
+            return {}
+
+    def plan(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._plan is not None and now - self._checked_at < self.poll_interval:
+                return self._plan
+            self._checked_at = now
+
+            signature = self.signature()
+            if self._plan is not None and signature == self._signature:
+                return self._plan
+
+            try:
+                plan = compile_plan(self.load_manifest(), self.base_path, self.compiles + 1)
+            except (ScenarioError, ValueError, TypeError, OSError) as e:
+                print(f"시나리오 컴파일 실패, 이전 계획 유지: {str(e)}")
+                if self._plan is None:
+                    self._plan = ScenarioPlan([])
+                self._signature = signature
+                return self._plan
+
+            self._plan = plan
+            self._signature = signature
+            self.compiles += 1
+            print(f"시나리오 계획 컴파일: 템플릿 {len(plan)}개 (버전 {plan.version})")
+            return plan
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+            self._checked_at = 0.0
+
@@ -0,0 +1,219 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from src.utils.metrics import LatencyStats
+
+
+class InstanceSchedule:
+    """인스턴스 하나의 현재 검사 주기와 통계"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.scans = 0
+        self.hits = 0
+        self.late = 0
+        self.latency = LatencyStats()
+        self.pending = None  # 마감 시간을 넘겨 아직 실행 중인 검사
+
+
+def _is_fresh_hit(result):
+    """직전 결과를 재사용하지 않고 이번에 새로 찾은 매칭이 있는지"""
+    return any(not getattr(hit, 'reused', False) for hit in getattr(result, 'hits', None) or ())
+
+
+def _is_idle(result):
+    """화면이 그대로라서 검사를 건너뛰었거나, 재사용한 매칭만 있는지"""
+    if getattr(result, 'scan_kind', None) == 'skipped':
+        return True
+    hits = getattr(result, 'hits', None)
+    return bool(hits) and all(getattr(hit, 'reused', False) for hit in hits)
+
+
+class AdaptiveScheduler:
+    """asyncio 기반 모니터링 스케줄러
+
+    인스턴스마다 별도 주기로 scan_fn(key)을 executor에서 실행한다.
+    새로 찾은 매칭이 있으면 바로 min_interval로 당기고, 화면에 변화가 없어 검사를
+    건너뛰었거나 직전 프레임의 매칭을 재사용했을 뿐이면 backoff 배수로 max_interval까지
+    늘린다. 화면이 바뀌었는데 매칭이 없으면 기본 주기로 돌아간다.
+    모든 인스턴스의 검사에 쓴 CPU 시간(검사 스레드의 time.thread_time) 합이 벽시계
+    1초당 cpu_budget초를 넘으면 주기를 그만큼 늘린다. 매칭을 MatchPipeline의 다른
+    프로세스에서 하면 그 프로세스의 CPU 시간은 들어가지 않는다.
+    """
+
+    def __init__(self, scan_fn, executor, keys_fn, interval=1.0, min_interval=0.25,
+                 max_interval=5.0, backoff=1.5, cpu_budget=1.0, deadline=2.0,
+                 is_hit=None, is_idle=None, budget_window=5.0):
+        self.scan_fn = scan_fn
+        self.executor = executor
+        self.keys_fn = keys_fn
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.cpu_budget = cpu_budget
+        self.deadline = deadline
+        self.is_hit = is_hit or _is_fresh_hit
+        self.is_idle = is_idle or _is_idle
+        self.budget_window = budget_window
+
+        self.schedules = {}
+        self._busy = deque()  # (종료 시각, CPU 시간)
+        self._busy_lock = threading.Lock()
+        self._loop = None
+        self._stop_event = None
+        self._thread = None
+        self._started = threading.Event()
+
+    # 스레드 제어
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._started.clear()
+        self._thread = threading.Thread(target=self._run, name="monitor-scheduler", daemon=True)
+        self._thread.start()
+        self._started.wait(timeout=1.0)
+
+    def stop(self, timeout=1.0):
+        """중지 신호를 보내고 이벤트 루프가 끝날 때까지 기다린다 (실행 중인 검사는 기다리지 않음)"""
+        loop, stop_event = self._loop, self._stop_event
+        if loop is not None and stop_event is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(stop_event.set)
+            except RuntimeError:
+                pass
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        try:
+            loop.run_until_complete(self._main())
+        finally:
+            loop.close()
+
+    async def _main(self):
+        self._stop_event = asyncio.Event()
+        self._started.set()
+        tasks = {}
+        try:
+            while not self._stop_event.is_set():
+                # 선택 목록과 인스턴스 작업을 동기화
+                keys = set(self.keys_fn())
+                for key in keys - tasks.keys():
+                    self.schedules.setdefault(key, InstanceSchedule(self.interval))
+                    tasks[key] = asyncio.create_task(self._instance_loop(key))
+                for key in list(tasks.keys() - keys):
+                    tasks.pop(key).cancel()
+                    self.schedules.pop(key, None)
+                for key, task in list(tasks.items()):
+                    if task.done():
+                        tasks.pop(key)
+                await self._sleep(min(self.min_interval, 0.5))
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    async def _sleep(self, delay):
+        """delay초 대기, 중지 신호가 오면 바로 True 반환"""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=max(0.0, delay))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _instance_loop(self, key):
+        loop = asyncio.get_running_loop()
+        schedule = self.schedules[key]
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+
+            # 이전 검사가 아직 돌고 있으면 끝날 때까지 새로 시작하지 않는다
+            if schedule.pending is not None:
+                if not schedule.pending.done():
+                    if await self._sleep(schedule.interval):
+                        return
+                    continue
+                schedule.pending = None
+
+            future = loop.run_in_executor(self.executor, self._timed_scan, key)
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), timeout=self.deadline)
+            except asyncio.TimeoutError:
+                schedule.late += 1
+                schedule.pending = future
+                print(f"검사 시간 초과: {key}")
+                result = None
+            except Exception as e:
+                print(f"{key} 검사 중 오류 발생: {str(e)}")
+                result = None
+
+            elapsed = time.monotonic() - started
+            schedule.latency.record(elapsed)
+            schedule.scans += 1
+
+            if result is not None and self.is_hit(result):
+                schedule.hits += 1
+                schedule.interval = self.min_interval
+            elif result is not None and self.is_idle(result):
+                schedule.interval = min(self.max_interval, schedule.interval * self.backoff)
+            else:
+                schedule.interval = self.interval
+
+            delay = max(0.0, schedule.interval * self._budget_factor() - elapsed)
+            if await self._sleep(delay):
+                return
+
+    # CPU 예산
+    def _timed_scan(self, key):
+        """executor 스레드에서 scan_fn을 실행하고 쓴 CPU 시간을 기록
+
+        마감 시간을 넘긴 검사도 끝날 때 기록되도록 스레드 안에서 잰다.
+        """
+        started = time.thread_time()
+        try:
+            return self.scan_fn(key)
+        finally:
+            self._record_busy(time.thread_time() - started)
+
+    def _record_busy(self, seconds):
+        now = time.monotonic()
+        with self._busy_lock:
+            self._busy.append((now, seconds))
+            while self._busy and now - self._busy[0][0] > self.budget_window:
+                self._busy.popleft()
+
+    def cpu_usage(self):
+        """최근 budget_window초 동안 벽시계 1초당 검사에 쓴 CPU 시간"""
+        with self._busy_lock:
+            return sum(seconds for _, seconds in self._busy) / self.budget_window
+
+    def _budget_factor(self):
+        usage = self.cpu_usage()
+        if not self.cpu_budget or usage <= self.cpu_budget:
+            return 1.0
+        return usage / self.cpu_budget
+
+    def stats(self):
+        return {
+            'cpu_usage': self.cpu_usage(),
+            'cpu_budget': self.cpu_budget,
+            'instances': {
+                key: {
+                    'interval': schedule.interval,
+                    'scans': schedule.scans,
+                    'hits': schedule.hits,
+                    'late': schedule.late,
+                    'latency': schedule.latency.summary(),
+                }
+                for key, schedule in list(self.schedules.items())
+            },
+        }
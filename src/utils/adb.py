@@ -0,0 +1,204 @@
+import itertools
+import queue
+import subprocess
+import threading
+import time
+
+ADB_BASE_PORT = 5555
+
+
+class AdbError(Exception):
+    """ADB 세션이 끊겼거나 응답하지 않을 때 발생"""
+
+
+class AdbResponseError(AdbError):
+    """명령은 셸에 보냈지만 완료 응답을 받지 못함 (기기에서 이미 실행됐을 수 있다)"""
+
+
+def device_address(instance_num):
+    """LDPlayer 인스턴스 번호로 ADB 주소 계산 (LDPlayer-n → 127.0.0.1:5555+2n)"""
+    return f"127.0.0.1:{ADB_BASE_PORT + instance_num * 2}"
+
+
+def device_address_for_title(title):
+    """'LDPlayer-n' 창 제목으로 ADB 주소 계산"""
+    return device_address(int(title.split('-')[1]))
+
+
+class AdbSession:
+    """기기 하나에 대해 계속 열어두는 `adb shell` 프로세스
+
+    명령마다 고유 마커를 echo해서 완료와 종료 코드를 확인한다.
+    """
+
+    def __init__(self, adb_path, serial, timeout=3.0):
+        self.adb_path = adb_path
+        self.serial = serial
+        self.timeout = timeout
+        self._process = None
+        self._lines = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self._markers = itertools.count()
+        self.connect_count = 0
+
+    def ensure_connected(self):
+        """세션이 살아 있지 않으면 연결하고, 새로 연결했는지 반환"""
+        with self._lock:
+            if self.is_alive():
+                return False
+            self.connect()
+            return True
+
+    def connect(self):
+        """adb connect 후 장시간 유지할 shell 프로세스 시작"""
+        self.close()
+        result = subprocess.run(
+            [self.adb_path, "connect", self.serial],
+            capture_output=True,
+            text=True,
+            timeout=self.timeout,
+        )
+        output = (result.stdout or '').lower()
+        if result.returncode != 0 or 'failed' in output or 'cannot' in output:
+            raise AdbError(f"ADB 연결 명령 실패 ({self.serial}): {result.stderr or result.stdout}")
+
+        self._process = subprocess.Popen(
+            [self.adb_path, "-s", self.serial, "shell"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        self._lines = queue.Queue()
+        self._reader = threading.Thread(
+            target=self._read_output, args=(self._process, self._lines), daemon=True)
+        self._reader.start()
+        self.connect_count += 1
+
+    @staticmethod
+    def _read_output(process, lines):
+        for raw in iter(process.stdout.readline, b''):
+            lines.put(raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+        lines.put(None)  # 프로세스 종료 표시
+
+    def is_alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def run(self, command, timeout=None):
+        """셸에 명령을 쓰고 종료 코드를 반환 (세션이 죽었으면 AdbError)"""
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            if not self.is_alive():
+                raise AdbError(f"ADB 세션이 종료되었습니다: {self.serial}")
+
+            marker = f"__adb_done_{next(self._markers)}__"
+            try:
+                self._process.stdin.write(f"{command}; echo {marker} $?\n".encode('utf-8'))
+                self._process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                raise AdbError(f"ADB 세션 쓰기 실패 ({self.serial}): {str(e)}")
+
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AdbResponseError(f"ADB 응답 시간 초과 ({self.serial}): {command}")
+                try:
+                    line = self._lines.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                if line is None:
+                    raise AdbResponseError(f"ADB 세션이 응답 전에 종료되었습니다: {self.serial}")
+                if line.startswith(marker):
+                    try:
+                        return int(line[len(marker):].strip() or 0)
+                    except ValueError:
+                        return -1
+                if line:
+                    print(f"[{self.serial}] {line}")
+
+    def tap(self, x, y):
+        return self.run(f"input tap {int(x)} {int(y)}") == 0
+
+    def close(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.stdin.write(b"exit\n")
+                process.stdin.flush()
+                process.wait(timeout=1.0)
+        except Exception:
+            pass
+        if process.poll() is None:
+            process.kill()
+
+
+class AdbSessionPool:
+    """기기 주소별로 AdbSession을 한 번만 연결해서 재사용하고, 끊기면 다시 연결"""
+
+    def __init__(self, adb_path, timeout=3.0):
+        self.adb_path = adb_path
+        self.timeout = timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.reconnects = 0
+
+    def session(self, serial):
+        with self._lock:
+            session = self._sessions.get(serial)
+            if session is None:
+                session = AdbSession(self.adb_path, serial, self.timeout)
+                self._sessions[serial] = session
+        if session.ensure_connected():
+            self.connects += 1
+            if session.connect_count > 1:
+                self.reconnects += 1
+        return session
+
+    def run(self, serial, command):
+        """명령 실행, 보내기 전에 세션이 죽어 있었으면 한 번 다시 연결해서 재시도
+
+        명령을 보낸 뒤 응답을 못 받은 경우(AdbResponseError)는 기기에서 이미 실행됐을 수
+        있으므로 다시 보내지 않는다 (클릭이 두 번 들어가는 것을 막는다).
+        세션은 닫아 두므로 다음 명령 때 새로 연결한다.
+        """
+        for attempt in range(2):
+            try:
+                return self.session(serial).run(command)
+            except AdbError as e:
+                retry = not attempt and not isinstance(e, AdbResponseError)
+                print(f"ADB 세션 오류{', 재연결 시도' if retry else ''}: {str(e)}")
+                with self._lock:
+                    session = self._sessions.get(serial)
+                if session is not None:
+                    session.close()
+                if not retry:
+                    raise
+        return -1
+
+    def tap(self, serial, x, y):
+        try:
+            return self.run(serial, f"input tap {int(x)} {int(y)}") == 0
+        except (AdbError, OSError, subprocess.SubprocessError) as e:
+            print(f"클릭 명령 실패 ({serial}): {str(e)}")
+            return False
+
+    def stats(self):
+        with self._lock:
+            alive = sum(1 for session in self._sessions.values() if session.is_alive())
+            return {
+                'sessions': len(self._sessions),
+                'alive': alive,
+                'connects': self.connects,
+                'reconnects': self.reconnects,
+            }
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,767 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import threading
+import tracemalloc
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(os.path.dirname(current_dir))
+if project_dir not in sys.path:
+    sys.path.append(project_dir)
+
+from src.utils.capture import AdbScreencapBackend, FileReplayBackend, PrintWindowBackend, load_frames
+from src.utils.fftmatch import FFTMatcher
+from src.utils.frame import Frame, FrameBuffers
+from src.utils.metrics import LatencyStats
+from src.utils.pipeline import MatchPipeline
+from src.utils.prefilter import TemplatePrefilter
+from src.utils.recorder import replay_recording
+from src.utils.scanner import (ImageScanner, CachedTemplate, TemplateSpec, ACTION_KILL, MATCH_FULL,
+                               MATCH_PYRAMID, MATCH_FFT, clip_region)
+from src.utils.windows import FakeWindowBackend, WindowRegistry
+
+IMAGES_FOLDER = os.path.join(project_dir, "images")
+FRAME_SIZE = (578, 994)  # PrintWindow 캡처 크기 (높이, 너비)
+CONFIDENCE = 0.8
+SUITE_FRAME_SIZES = ((540, 960), FRAME_SIZE, (1080, 1920))
+SUITE_TEMPLATE_COUNTS = (1, 4, 8)
+FFT_BANK_SIZES = ((32, 32), (64, 64), (96, 160))
+FFT_BANK_COUNTS = (1, 4, 16)
+FFT_TOLERANCE = 1e-3
+MIN_CROP_STD = 8.0
+PREFILTER_RATES = (0.0, 0.01, 0.05, 0.1)
+PREFILTER_MARGIN = 24  # RoiTracker 기본 margin과 같은 직전 매칭 위치 주변 여백
+COLOR_THRESHOLD = 30  # tap_hit 기본 색상 검증 기준
+# 사전 검사 재현율을 잴 때 프레임에 줄 밝기/대비 변화 (이름, 게인, 감마, 밝기 이동)
+# 에뮬레이터 밝기 설정, 게임의 화면 효과(어두워짐/번쩍임), 캡처 방식 차이 정도를 흉내 낸다.
+# NCC 매칭은 이런 변화에도 점수가 거의 그대로라서 사전 검사도 통과시켜야 한다.
+PHOTOMETRIC_PERTURBATIONS = (
+    ('original', 1.0, 1.0, 0),
+    ('shift+12', 1.0, 1.0, 12),
+    ('shift+24', 1.0, 1.0, 24),
+    ('shift-20', 1.0, 1.0, -20),
+    ('gain0.8', 0.8, 1.0, 0),
+    ('gain1.2', 1.2, 1.0, 0),
+    ('gamma0.9', 1.0, 0.9, 0),
+    ('gamma1.2', 1.0, 1.2, 0),
+    ('dim', 0.85, 1.1, -10),
+)
+MATCH_MODES = (MATCH_FULL, MATCH_PYRAMID, MATCH_FFT)
+
+
+def reference_templates(images_folder=IMAGES_FOLDER):
+    """images 폴더의 기준 이미지 경로 목록"""
+    return sorted(os.path.join(images_folder, f) for f in os.listdir(images_folder)
+                  if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+
+
+def synthetic_frames(template_paths, count, frame_size=FRAME_SIZE, seed=0):
+    """기준 이미지 조각을 배경으로 깔고, 절반은 템플릿 하나를 심은 BGRA 프레임 생성
+
+    (프레임, 심은 템플릿 경로 또는 None) 목록을 반환한다.
+    """
+    rng = np.random.default_rng(seed)
+    images = [cv2.imread(path, cv2.IMREAD_COLOR) for path in template_paths]
+    height, width = frame_size
+    frames = []
+    for i in range(count):
+        noise = rng.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+        frame = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+
+        # 다른 기준 이미지를 뒤집거나 잘라서 배경에 붙여 실제 화면 같은 구조를 만든다
+        for _ in range(3):
+            piece = images[rng.integers(len(images))]
+            piece = cv2.flip(piece, int(rng.integers(-1, 2)))
+            ph, pw = min(piece.shape[0], height), min(piece.shape[1], width)
+            y, x = rng.integers(0, height - ph + 1), rng.integers(0, width - pw + 1)
+            frame[y:y + ph, x:x + pw] = piece[:ph, :pw]
+
+        present = None
+        if i % 2 == 0:
+            index = int(rng.integers(len(images)))
+            template = images[index]
+            th, tw = template.shape[:2]
+            if th <= height and tw <= width:
+                y, x = rng.integers(0, height - th + 1), rng.integers(0, width - tw + 1)
+                jitter = rng.integers(-3, 4, template.shape)
+                frame[y:y + th, x:x + tw] = np.clip(template.astype(np.int16) + jitter, 0, 255)
+                present = template_paths[index]
+
+        frames.append((cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA), present))
+    return frames
+
+
+def reference_frames(template_paths, frame_size=FRAME_SIZE):
+    """기준 이미지(실제 캡처 화면) 자체와, 전부를 한 캡처 크기 프레임에 늘어놓은 프레임
+
+    (프레임, None) 목록을 반환한다. 잘라 붙이기만 하고 잡음은 넣지 않는다.
+    """
+    images = [cv2.imread(path, cv2.IMREAD_COLOR) for path in template_paths]
+    frames = [(cv2.cvtColor(image, cv2.COLOR_BGR2BGRA), None) for image in images]
+
+    height, width = frame_size
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    x = y = row_height = 0
+    for image in sorted(images, key=lambda image: -image.shape[1]):
+        ih, iw = min(image.shape[0], height), min(image.shape[1], width)
+        if x + iw > width:
+            x, y, row_height = 0, y + row_height, 0
+        if y + ih > height:
+            break
+        canvas[y:y + ih, x:x + iw] = image[:ih, :iw]
+        x, row_height = x + iw, max(row_height, ih)
+    frames.append((cv2.cvtColor(canvas, cv2.COLOR_BGR2BGRA), None))
+    return frames
+
+
+def extra_templates(template_paths, count, folder, seed=0):
+    """기준 이미지를 잘라서 추가 템플릿 파일을 만든다 (템플릿 수를 늘려 측정할 때 사용)"""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        image = cv2.imread(template_paths[i % len(template_paths)], cv2.IMREAD_COLOR)
+        height, width = image.shape[:2]
+        crop_h = int(rng.integers(max(16, height // 4), height + 1))
+        crop_w = int(rng.integers(max(16, width // 4), min(width, 400) + 1))
+        y = int(rng.integers(0, height - crop_h + 1))
+        x = int(rng.integers(0, width - crop_w + 1))
+        path = os.path.join(folder, f"crop_{i}.png")
+        cv2.imwrite(path, image[y:y + crop_h, x:x + crop_w])
+        paths.append(path)
+    return paths
+
+
+def bench_matching(template_paths, frames, match_mode=MATCH_FULL):
+    """find_center와 같은 경로(prepare_frame → locate)로 프레임을 재생하며 템플릿별 지연 측정"""
+    scanner = ImageScanner(match_mode=match_mode, change_detection=False)
+    specs = [TemplateSpec(path, ACTION_KILL) for path in template_paths]
+    templates = {spec.path: scanner.template_cache.get(spec.path) for spec in specs}
+    per_template = {spec.path: LatencyStats(window=len(frames)) for spec in specs}
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for frame, _ in frames:
+        _, gray = scanner.prepare_frame(frame)
+        for spec in specs:
+            template = templates[spec.path]
+            if template.shape[0] > gray.shape[0] or template.shape[1] > gray.shape[1]:
+                continue
+            match_start = time.perf_counter()
+            scanner.locate(gray, template, spec)
+            per_template[spec.path].record(time.perf_counter() - match_start)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = {}
+    for path, stats in per_template.items():
+        summary = stats.summary()
+        report[os.path.basename(path)] = {
+            'count': summary['count'],
+            'p50_ms': summary['p50'] * 1000,
+            'p95_ms': summary['p95'] * 1000,
+            'p99_ms': summary['p99'] * 1000,
+        }
+    return {
+        'frames': len(frames),
+        'seconds': elapsed,
+        'fps': len(frames) / elapsed if elapsed else 0.0,
+        'peak_traced_bytes': peak,
+        'templates': report,
+    }
+
+
+def peak_rss_bytes():
+    """프로세스 최대 상주 메모리 (지원하지 않는 OS에서는 None)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # 리눅스는 KB, macOS는 바이트 단위
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_suite(template_counts=SUITE_TEMPLATE_COUNTS, frame_sizes=SUITE_FRAME_SIZES,
+              modes=(MATCH_FULL, MATCH_PYRAMID), frame_count=20, seed=0, source=None):
+    """템플릿 수, 프레임 크기, 매칭 방식 조합별로 bench_matching 결과를 모은다
+
+    source(이미지 파일/폴더)를 주면 합성 프레임 대신 실제 캡처 화면을 원본 크기로 재생한다.
+    """
+    references = reference_templates()
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        pool = references + extra_templates(references, max(template_counts), folder, seed)
+        if source:
+            captured = [(frame, None) for frame in load_frames(source)]
+            frame_sets = [(captured[0][0].shape[:2], captured)] if captured else []
+        else:
+            frame_sets = [(size, synthetic_frames(references, frame_count, size, seed))
+                          for size in frame_sizes]
+        for frame_size, frames in frame_sets:
+            for count in template_counts:
+                paths = pool[:count]
+                for mode in modes:
+                    run = bench_matching(paths, frames, mode)
+                    run.update({
+                        'mode': mode,
+                        'frame_size': list(frame_size),
+                        'template_count': count,
+                    })
+                    results.append(run)
+                    print(f"{mode:8s} {frame_size[1]}x{frame_size[0]} 템플릿 {count}개: "
+                          f"{run['fps']:.1f} fps, 최대 메모리 {run['peak_traced_bytes'] / 1e6:.1f}MB")
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'frame_count': frame_count,
+            'seed': seed,
+            'source': source,
+            'peak_rss_bytes': peak_rss_bytes(),
+        },
+        'results': results,
+    }
+
+
+def compare_pyramid(template_paths, frames, scale=0.5, candidates=3, repeat=3):
+    """원본 매칭과 피라미드 매칭의 판정 일치 여부와 소요 시간 비교"""
+    full = ImageScanner(match_mode=MATCH_FULL)
+    pyramid = ImageScanner(match_mode=MATCH_PYRAMID, pyramid_scale=scale,
+                           pyramid_candidates=candidates)
+    templates = [full.template_cache.get(path) for path in template_paths]
+
+    report = {'checks': 0, 'mismatches': [], 'full_seconds': 0.0, 'pyramid_seconds': 0.0}
+    for index, (frame, _) in enumerate(frames):
+        _, gray = full.prepare_frame(frame)
+        for template in templates:
+            decisions = {}
+            for name, scanner in (('full', full), ('pyramid', pyramid)):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    score, _ = scanner.match_template(gray, template, min_score=CONFIDENCE)
+                report[f'{name}_seconds'] += (time.perf_counter() - start) / repeat
+                decisions[name] = (score >= CONFIDENCE, score)
+
+            report['checks'] += 1
+            if decisions['full'][0] != decisions['pyramid'][0]:
+                report['mismatches'].append({
+                    'frame': index,
+                    'template': os.path.basename(template.path),
+                    'full_score': decisions['full'][1],
+                    'pyramid_score': decisions['pyramid'][1],
+                })
+
+    report['speedup'] = (report['full_seconds'] / report['pyramid_seconds']
+                         if report['pyramid_seconds'] else 0.0)
+    return report
+
+
+def template_bank(template_paths, count, size, seed=0):
+    """기준 이미지에서 같은 크기(size=(높이, 너비))의 조각 count개를 잘라 템플릿 묶음 생성"""
+    rng = np.random.default_rng(seed)
+    images = [cv2.imread(path, cv2.IMREAD_COLOR) for path in template_paths]
+    images = [image for image in images if image.shape[0] >= size[0] and image.shape[1] >= size[1]]
+    bank = []
+    attempts = 0
+    while len(bank) < count and attempts < count * 50:
+        image = images[attempts % len(images)]
+        attempts += 1
+        y = int(rng.integers(0, image.shape[0] - size[0] + 1))
+        x = int(rng.integers(0, image.shape[1] - size[1] + 1))
+        crop = image[y:y + size[0], x:x + size[1]].copy()
+        # 거의 단색인 조각은 실제 템플릿으로 쓰지 않고, OpenCV 쪽 float32 오차도 커서 뺀다
+        if cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY).std() < MIN_CROP_STD:
+            continue
+        bank.append(CachedTemplate(f"crop-{size[0]}x{size[1]}-{len(bank)}", 0, 0, crop))
+    return bank
+
+
+def compare_fft(template_paths, frames, sizes=FFT_BANK_SIZES, counts=FFT_BANK_COUNTS,
+                tolerance=FFT_TOLERANCE):
+    """템플릿마다 cv2.matchTemplate을 부르는 방식과 FFT 묶음 매칭의 점수 차이와 소요 시간 비교
+
+    기준 이미지 그대로(크기가 제각각)인 묶음과, 같은 크기 조각 묶음을 템플릿 수별로 측정한다.
+    """
+    direct = ImageScanner(match_mode=MATCH_FULL)
+    banks = [('reference', [direct.template_cache.get(path) for path in template_paths])]
+    for size in sizes:
+        for count in counts:
+            banks.append((f"{size[0]}x{size[1]}", template_bank(template_paths, count, size)))
+
+    results = []
+    for label, bank in banks:
+        matcher = FFTMatcher(cache_size=len(bank))
+        buffers = FrameBuffers()
+        # 템플릿 스펙트럼은 처음 한 번만 만들므로 측정에서 뺀다
+        matcher.match_many(Frame(frames[0][0], buffers), bank)
+        row = {'bank': label, 'templates': len(bank), 'direct_seconds': 0.0, 'fft_seconds': 0.0,
+               'max_score_diff': 0.0, 'location_mismatches': 0}
+        for raw, _ in frames:
+            gray = Frame(raw).gray
+            start = time.perf_counter()
+            expected = [direct.match_template(gray, template) for template in bank]
+            row['direct_seconds'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = matcher.match_many(Frame(raw, buffers), bank)
+            row['fft_seconds'] += time.perf_counter() - start
+
+            for (expected_score, expected_loc), (score, loc) in zip(expected, actual):
+                row['max_score_diff'] = max(row['max_score_diff'], abs(expected_score - score))
+                # 점수가 같은 봉우리가 여러 개면 위치가 다를 수 있으므로 점수 차이도 같이 본다
+                if expected_loc != tuple(loc) and abs(expected_score - score) > tolerance:
+                    row['location_mismatches'] += 1
+        row['direct_ms'] = row['direct_seconds'] / len(frames) * 1000
+        row['fft_ms'] = row['fft_seconds'] / len(frames) * 1000
+        row['speedup'] = row['direct_seconds'] / row['fft_seconds'] if row['fft_seconds'] else 0.0
+        row['within_tolerance'] = row['max_score_diff'] <= tolerance and not row['location_mismatches']
+        results.append(row)
+    return {'frames': len(frames), 'frame_size': list(frames[0][0].shape[:2]),
+            'tolerance': tolerance, 'results': results}
+
+
+def photometric(raw, gain=1.0, gamma=1.0, shift=0):
+    """색 채널에 gain * 255 * (값 / 255)^gamma + shift를 적용한 복사본 (알파는 그대로)"""
+    lut = np.clip(gain * 255.0 * (np.arange(256) / 255.0) ** gamma + shift, 0, 255).round().astype(np.uint8)
+    out = raw.copy()
+    out[..., :3] = lut[raw[..., :3]]
+    return out
+
+
+def _confusion():
+    return {'tp': 0, 'fn': 0, 'fp': 0, 'tn': 0, 'prefilter_seconds': 0.0, 'match_seconds': 0.0,
+            'skipped_match_seconds': 0.0, 'gray_only': 0, 'gray_only_rejected': 0}
+
+
+def _color_diff(raw, template, top_left):
+    x, y = top_left
+    height, width = template.shape
+    window = raw[y:y + height, x:x + width, :3]
+    return sum(cv2.mean(cv2.absdiff(window, template.bgr))[:3])
+
+
+def _summarize(counts):
+    present = counts['tp'] + counts['fn']
+    absent = counts['fp'] + counts['tn']
+    passed = counts['tp'] + counts['fp']
+    return dict(counts,
+                recall=counts['tp'] / present if present else 1.0,
+                precision=counts['tp'] / passed if passed else 1.0,
+                false_rejection=counts['fn'] / present if present else 0.0,
+                rejection=counts['tn'] / absent if absent else 0.0)
+
+
+def evaluate_prefilter(template_paths, frames, rates=PREFILTER_RATES, margin=PREFILTER_MARGIN, seed=0,
+                       perturbations=PHOTOMETRIC_PERTURBATIONS, **prefilter_options):
+    """색상 히스토그램 사전 검사의 정밀도/재현율을 밝기·대비를 바꾼 프레임으로 측정
+
+    템플릿이 있는지는 원본 프레임에서 정한다: cv2.matchTemplate 점수가 CONFIDENCE 이상이고
+    매칭 위치의 색도 템플릿과 같으면(템플릿 전체 영역 색 차이 COLOR_THRESHOLD 이하) 있는 것이다.
+    perturbations마다 프레임의 밝기·대비를 바꾼 뒤, 원본에 있던 템플릿 중 바뀐 프레임에서도
+    매칭 점수가 CONFIDENCE 이상인 것을 양성으로 센다 (스캐너가 실제로 찾아낼 템플릿).
+    그레이스케일로만 비슷하고 원본에서 색이 다른 곳은 따로 gray_only로 센다.
+    프레임 전체 검색과, 직전 매칭 위치 주변 같은 작은 영역 검색(정답 위치 주변 + 같은 크기의
+    임의 영역)을 따로 센다.
+    '통과'를 양성으로 보므로 recall = 1 - 실제로 있는 템플릿을 걸러낸 비율,
+    rejection = 없는 템플릿 중 매칭을 건너뛴 비율(절약한 작업)이다.
+    """
+    rng = np.random.default_rng(seed)
+    cache = ImageScanner(match_mode=MATCH_FULL).template_cache
+    bank = [cache.get(path) for path in template_paths]
+    bank += template_bank(template_paths, 16, (64, 64), seed=seed)
+    bank += template_bank(template_paths, 16, (32, 32), seed=seed + 1)
+
+    def best_match(gray, template, region):
+        rx, ry, rw, rh = region if region is not None else (0, 0, gray.shape[1], gray.shape[0])
+        start = time.perf_counter()
+        result = cv2.matchTemplate(gray[ry:ry + rh, rx:rx + rw], template.gray, cv2.TM_CCOEFF_NORMED)
+        seconds = time.perf_counter() - start
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        return score, (rx + x, ry + y), seconds
+
+    # 검사할 영역과 원본 기준 정답은 밝기 변화나 false_rejection 값과 상관없으므로 한 번만 구한다
+    targets = []  # (프레임 번호, 템플릿, 영역 또는 None, 원본에 있는지)
+    for index, (raw, _) in enumerate(frames):
+        gray = Frame(raw).gray
+        for template in bank:
+            th, tw = template.shape
+            score, (x, y), _ = best_match(gray, template, None)
+            present = score >= CONFIDENCE and _color_diff(raw, template, (x, y)) <= COLOR_THRESHOLD
+            regions = [None]
+            if present:
+                regions.append((x - margin, y - margin, tw + margin * 2, th + margin * 2))
+            rw, rh = min(gray.shape[1], tw + margin * 2), min(gray.shape[0], th + margin * 2)
+            regions.append((int(rng.integers(0, gray.shape[1] - rw + 1)),
+                            int(rng.integers(0, gray.shape[0] - rh + 1)), rw, rh))
+            for region in regions:
+                if region is not None:
+                    region = clip_region(region, gray.shape)
+                    score, (x, y), _ = best_match(gray, template, region)
+                    present = (score >= CONFIDENCE
+                               and _color_diff(raw, template, (x, y)) <= COLOR_THRESHOLD)
+                targets.append((index, template, region, present))
+
+    # 밝기 변화별 (바뀐 프레임, [(프레임 번호, 템플릿, 영역, 정답, 그레이스케일만 일치, 매칭 초)])
+    perturbed = []
+    for name, gain, gamma, shift in perturbations:
+        changed = [photometric(raw, gain, gamma, shift) for raw, _ in frames]
+        grays = [Frame(raw).gray for raw in changed]
+        cases = []
+        for index, template, region, present in targets:
+            score, _, seconds = best_match(grays[index], template, region)
+            found = score >= CONFIDENCE
+            cases.append((index, template, region, present and found, found and not present, seconds))
+        perturbed.append((name, changed, cases))
+
+    results = []
+    for rate in rates:
+        prefilter = TemplatePrefilter(false_rejection=rate, **prefilter_options)
+        for template in bank:
+            prefilter.descriptor(template)  # 템플릿 보정은 처음 한 번만 하므로 측정에서 뺀다
+        by_perturbation = {}
+        for name, changed, cases in perturbed:
+            levels = {'frame': _confusion(), 'region': _confusion()}
+            wrapped = {}
+            for index, template, region, present, gray_only, seconds in cases:
+                frame = wrapped.get(index)
+                if frame is None:
+                    frame = wrapped[index] = Frame(changed[index])
+                start = time.perf_counter()
+                passed = prefilter.may_contain(frame, template, region)
+                counts = levels['frame' if region is None else 'region']
+                counts['prefilter_seconds'] += time.perf_counter() - start
+                counts['match_seconds'] += seconds
+                if not passed:
+                    counts['skipped_match_seconds'] += seconds
+                counts[('tp' if passed else 'fn') if present else ('fp' if passed else 'tn')] += 1
+                if gray_only:
+                    counts['gray_only'] += 1
+                    counts['gray_only_rejected'] += not passed
+            by_perturbation[name] = {level: _summarize(counts) for level, counts in levels.items()}
+        worst = {level: min(stats[level]['recall'] for stats in by_perturbation.values())
+                 for level in ('frame', 'region')}
+        results.append({'false_rejection_target': rate, 'worst_recall': worst,
+                        'perturbations': by_perturbation})
+    return {'frames': len(frames), 'templates': len(bank),
+            'perturbations': [list(p) for p in perturbations], 'results': results}
+
+
+def replay_pipeline(backend, template_paths, frames, instances=1, **scanner_options):
+    """가짜 창 목록과 재생 캡처 방식으로 scan_window 전체 경로를 실행하고 처리량 측정"""
+    windows = [(1000 + i, 1000 + i, f"LDPlayer-{i}") for i in range(instances)]
+    registry = WindowRegistry(FakeWindowBackend(windows))
+    scanner = ImageScanner(window_registry=registry, capture_backend=backend, **scanner_options)
+    templates = [TemplateSpec(path, ACTION_KILL) for path in template_paths]
+
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        for hwnd, title in scanner.find_ldplayer_windows():
+            result = scanner.scan_window(hwnd, title, templates)
+            if result is not None:
+                hits += len(result.hits)
+    elapsed = time.perf_counter() - start
+    scans = frames * instances
+    return {
+        'scans': scans,
+        'hits': hits,
+        'seconds': elapsed,
+        'fps': scans / elapsed if elapsed else 0.0,
+        'change': scanner.change_stats(),
+    }
+
+
+def _run_producers(scanner, templates, instances, frames):
+    """인스턴스마다 캡처 스레드 하나가 scan_window를 frames번 호출, (검사 수, 소요 시간) 반환"""
+    windows = scanner.find_ldplayer_windows()[:instances]
+    scans = [0] * len(windows)
+
+    def produce(index, hwnd, title):
+        for _ in range(frames):
+            if scanner.scan_window(hwnd, title, templates) is not None:
+                scans[index] += 1
+
+    threads = [threading.Thread(target=produce, args=(index, hwnd, title))
+               for index, (hwnd, title) in enumerate(windows)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(scans), time.perf_counter() - start
+
+
+def pipeline_scaling(template_paths, source_frames, instances=4, worker_counts=(1, 2, 4), frames=30):
+    """스레드 내 매칭과 매칭 프로세스 수별 파이프라인의 처리량 비교
+
+    모든 프레임을 실제로 매칭하도록 프레임 변화 감지는 끈다. worker 0은 기존 스레드 방식.
+    """
+    windows = [(1000 + i, 1000 + i, f"LDPlayer-{i}") for i in range(instances)]
+    templates = [TemplateSpec(path, ACTION_KILL) for path in template_paths]
+    matching_options = {'change_detection': False}
+
+    runs = []
+    for workers in [0] + [count for count in worker_counts if count > 0]:
+        registry = WindowRegistry(FakeWindowBackend(windows))
+        backend = FileReplayBackend.from_frames(source_frames)
+        scanner = ImageScanner(window_registry=registry, capture_backend=backend, **matching_options)
+        if workers:
+            pipeline = MatchPipeline(workers, slots=max(workers, instances) * 2,
+                                     scanner_options=matching_options,
+                                     template_cache=scanner.template_cache)
+            pipeline.start()
+            scanner.pipeline = pipeline
+            # 프로세스 시작과 템플릿 로드는 측정에서 뺀다
+            _run_producers(scanner, templates, instances, 1)
+        scans, elapsed = _run_producers(scanner, templates, instances, frames)
+        scanner.close()
+        runs.append({
+            'mode': 'process' if workers else 'thread',
+            'workers': workers,
+            'scans': scans,
+            'seconds': elapsed,
+            'fps': scans / elapsed if elapsed else 0.0,
+        })
+
+    baseline = runs[0]['fps'] or 1.0
+    for run in runs:
+        run['speedup'] = run['fps'] / baseline
+        run['efficiency'] = run['speedup'] / run['workers'] if run['workers'] else 1.0
+    return {
+        'cpu_count': multiprocessing.cpu_count(),
+        'instances': instances,
+        'frames_per_instance': frames,
+        'templates': len(template_paths),
+        'runs': runs,
+    }
+
+
+def capture_latency(backend, windows, frames):
+    """캡처 방식별 프레임 한 장당 지연 시간과 초당 프레임 측정"""
+    latencies = []
+    for _ in range(frames):
+        for hwnd, title in windows:
+            start = time.perf_counter()
+            frame = backend.capture(hwnd, title)
+            if frame is not None:
+                latencies.append(time.perf_counter() - start)
+    backend.close()
+    if not latencies:
+        return {'frames': 0}
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'frames': len(latencies),
+        'mean_ms': total / len(latencies) * 1000,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'max_ms': latencies[-1] * 1000,
+        'fps': len(latencies) / total,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="템플릿 매칭 벤치마크")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pyramid_parser = subparsers.add_parser('pyramid', help="원본 매칭과 피라미드 매칭 비교")
+    pyramid_parser.add_argument('--scale', type=float, default=0.5)
+    pyramid_parser.add_argument('--candidates', type=int, default=3)
+    pyramid_parser.add_argument('--frames', type=int, default=20)
+    pyramid_parser.add_argument('--seed', type=int, default=0)
+    pyramid_parser.add_argument('--reference', action='store_true',
+                                help="합성 프레임 대신 기준 이미지와 그 조각으로 비교")
+    pyramid_parser.add_argument('--crops', type=int, default=24)
+
+    replay_parser = subparsers.add_parser('replay', help="파일 재생 캡처로 전체 검사 경로 실행")
+    replay_parser.add_argument('source', nargs='?', help="프레임 이미지 파일 또는 폴더 (없으면 합성 프레임)")
+    replay_parser.add_argument('--frames', type=int, default=50)
+    replay_parser.add_argument('--instances', type=int, default=1)
+    replay_parser.add_argument('--mode', choices=MATCH_MODES, default=MATCH_FULL)
+    replay_parser.add_argument('--no-change-detection', action='store_true')
+
+    capture_parser = subparsers.add_parser('capture', help="PrintWindow와 ADB screencap 캡처 지연 비교")
+    capture_parser.add_argument('--adb', help="ADB 실행 파일 경로 (없으면 PrintWindow만 측정)")
+    capture_parser.add_argument('--frames', type=int, default=30)
+
+    recording_parser = subparsers.add_parser('recording', help="녹화 파일을 최대 속도로 다시 검사하고 기록된 결과와 비교")
+    recording_parser.add_argument('path', help="녹화 파일 (.ldrec)")
+    recording_parser.add_argument('--mode', choices=MATCH_MODES, default=MATCH_FULL)
+    recording_parser.add_argument('--no-change-detection', action='store_true')
+
+    fft_parser = subparsers.add_parser('fft', help="템플릿별 matchTemplate과 FFT 묶음 매칭 비교")
+    fft_parser.add_argument('--frames', type=int, default=10)
+    fft_parser.add_argument('--seed', type=int, default=0)
+    fft_parser.add_argument('--counts', type=int, nargs='+', default=list(FFT_BANK_COUNTS))
+    fft_parser.add_argument('--tolerance', type=float, default=FFT_TOLERANCE)
+    fft_parser.add_argument('--output', help="결과 JSON 파일 경로 (없으면 표 출력)")
+
+    prefilter_parser = subparsers.add_parser('prefilter', help="색상 히스토그램 사전 검사의 정밀도/재현율 측정")
+    prefilter_parser.add_argument('--frames', type=int, default=20)
+    prefilter_parser.add_argument('--seed', type=int, default=0)
+    prefilter_parser.add_argument('--rates', type=float, nargs='+', default=list(PREFILTER_RATES),
+                                  help="보정에 쓸 목표 오거부율 (false_rejection)")
+    prefilter_parser.add_argument('--bins', type=int, default=16)
+    prefilter_parser.add_argument('--output', help="결과 JSON 파일 경로 (없으면 표 출력)")
+
+    scaling_parser = subparsers.add_parser('scaling', help="공유 메모리 매칭 프로세스 수별 처리량 (JSON 출력)")
+    scaling_parser.add_argument('source', nargs='?', help="프레임 이미지 파일 또는 폴더 (없으면 합성 프레임)")
+    scaling_parser.add_argument('--workers', type=int, nargs='+',
+                                default=sorted({1, 2, max(1, multiprocessing.cpu_count())}))
+    scaling_parser.add_argument('--instances', type=int, default=max(4, multiprocessing.cpu_count()))
+    scaling_parser.add_argument('--frames', type=int, default=30)
+    scaling_parser.add_argument('--output', help="결과 JSON 파일 경로 (없으면 표준 출력)")
+
+    suite_parser = subparsers.add_parser('suite', help="템플릿 수/프레임 크기/매칭 방식별 지연 측정 (JSON 출력)")
+    suite_parser.add_argument('--source', help="합성 프레임 대신 재생할 캡처 이미지 파일 또는 폴더")
+    suite_parser.add_argument('--output', help="결과 JSON 파일 경로 (없으면 표준 출력)")
+    suite_parser.add_argument('--frames', type=int, default=20)
+    suite_parser.add_argument('--seed', type=int, default=0)
+    suite_parser.add_argument('--template-counts', type=int, nargs='+', default=list(SUITE_TEMPLATE_COUNTS))
+    suite_parser.add_argument('--modes', nargs='+', choices=MATCH_MODES,
+                              default=[MATCH_FULL, MATCH_PYRAMID])
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'suite':
+        report = run_suite(args.template_counts, modes=args.modes,
+                           frame_count=args.frames, seed=args.seed, source=args.source)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"결과 저장: {args.output}")
+        else:
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+        return 0
+
+    if args.command == 'scaling':
+        template_paths = reference_templates()
+        if args.source:
+            source_frames = load_frames(args.source)
+        else:
+            source_frames = [frame for frame, _ in synthetic_frames(template_paths, 10)]
+        report = pipeline_scaling(template_paths, source_frames, args.instances, args.workers, args.frames)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"결과 저장: {args.output}")
+        else:
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+        return 0
+
+    if args.command == 'fft':
+        template_paths = reference_templates()
+        frames = synthetic_frames(template_paths, args.frames, seed=args.seed)
+        report = compare_fft(template_paths, frames, counts=args.counts, tolerance=args.tolerance)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"결과 저장: {args.output}")
+        else:
+            print(f"{'묶음':>10} {'템플릿':>6} {'개별(ms)':>9} {'FFT(ms)':>9} {'속도 향상':>8} {'최대 점수 차':>12}")
+            for row in report['results']:
+                print(f"{row['bank']:>10} {row['templates']:>6} {row['direct_ms']:>9.1f} "
+                      f"{row['fft_ms']:>9.1f} {row['speedup']:>7.2f}x {row['max_score_diff']:>12.2e}")
+        ok = all(row['within_tolerance'] for row in report['results'])
+        return 0 if ok else 1
+
+    if args.command == 'prefilter':
+        template_paths = reference_templates()
+        frames = synthetic_frames(template_paths, args.frames, seed=args.seed)
+        report = evaluate_prefilter(template_paths, frames, args.rates, seed=args.seed, bins=args.bins)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"결과 저장: {args.output}")
+            return 0
+        print(f"프레임 {report['frames']}장, 템플릿 {report['templates']}개 "
+              f"(그레이스케일로만 비슷한 곳은 '색 불일치 거부'에 따로 표시)")
+        print(f"{'목표':>6} {'밝기 변화':>10} {'범위':>7} {'재현율':>7} {'정밀도':>7} {'건너뜀':>7} "
+              f"{'검사(ms)':>9} {'절약(ms)':>9} {'색 불일치 거부':>12}")
+        for row in report['results']:
+            for name, levels in row['perturbations'].items():
+                for level, stats in levels.items():
+                    print(f"{row['false_rejection_target']:>6.2f} {name:>10} {level:>7} "
+                          f"{stats['recall']:>7.3f} {stats['precision']:>7.3f} "
+                          f"{stats['rejection']:>7.3f} {stats['prefilter_seconds'] * 1000:>9.1f} "
+                          f"{stats['skipped_match_seconds'] * 1000:>9.1f} "
+                          f"{stats['gray_only_rejected']:>6}/{stats['gray_only']}")
+            worst = row['worst_recall']
+            print(f"{row['false_rejection_target']:>6.2f} 최저 재현율: 전체 {worst['frame']:.3f}, "
+                  f"영역 {worst['region']:.3f}")
+        return 0
+
+    if args.command == 'recording':
+        report = replay_recording(args.path, match_mode=args.mode,
+                                  change_detection=not args.no_change_detection)
+        print(f"프레임 수: {report['frames']}, 매칭 수: {report['hits']}, "
+              f"소요 시간: {report['seconds']:.2f}s, 초당 프레임: {report['fps']:.1f}")
+        for mismatch in report['mismatches']:
+            print(f"  불일치: {mismatch}")
+        return 1 if report['mismatches'] else 0
+
+    if args.command == 'pyramid':
+        template_paths = reference_templates()
+        if args.reference:
+            frames = reference_frames(template_paths)
+            with tempfile.TemporaryDirectory() as folder:
+                crops = extra_templates(template_paths, args.crops, folder, seed=args.seed)
+                report = compare_pyramid(template_paths + crops, frames, args.scale, args.candidates)
+        else:
+            frames = synthetic_frames(template_paths, args.frames, seed=args.seed)
+            report = compare_pyramid(template_paths, frames, args.scale, args.candidates)
+        print(f"검사 수: {report['checks']}, 판정 불일치: {len(report['mismatches'])}")
+        for mismatch in report['mismatches']:
+            print(f"  불일치: {mismatch}")
+        print(f"원본 매칭: {report['full_seconds'] * 1000:.1f}ms, "
+              f"피라미드 매칭: {report['pyramid_seconds'] * 1000:.1f}ms, "
+              f"속도 향상: {report['speedup']:.2f}x")
+        return 1 if report['mismatches'] else 0
+
+    if args.command == 'capture':
+        from src.utils.windows import get_window_registry
+
+        windows = get_window_registry().ldplayer_windows()
+        if not windows:
+            print("실행 중인 LDPlayer 창을 찾을 수 없습니다.")
+            return 1
+        backends = []
+        if sys.platform == 'win32':
+            backends.append(('printwindow', PrintWindowBackend()))
+        if args.adb:
+            backends.append(('adb', AdbScreencapBackend(args.adb)))
+        for name, backend in backends:
+            print(f"{name}: {capture_latency(backend, windows, args.frames)}")
+        return 0
+
+    if args.command == 'replay':
+        template_paths = reference_templates()
+        if args.source:
+            backend = FileReplayBackend(args.source)
+        else:
+            backend = FileReplayBackend.from_frames(
+                frame for frame, _ in synthetic_frames(template_paths, 10))
+        report = replay_pipeline(backend, template_paths, args.frames, args.instances,
+                                 match_mode=args.mode,
+                                 change_detection=not args.no_change_detection)
+        print(f"검사 수: {report['scans']}, 매칭 수: {report['hits']}, "
+              f"소요 시간: {report['seconds']:.2f}s, 초당 프레임: {report['fps']:.1f}")
+        print(f"프레임 변화 감지: {report['change']}")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+import ctypes
+import itertools
+import os
+import struct
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+try:
+    import win32gui
+    import win32ui
+    from ctypes import windll
+except ImportError:  # Windows가 아닌 환경에서는 파일 재생 백엔드만 사용 가능
+    win32gui = None
+    win32ui = None
+    windll = None
+
+from src.utils.adb import device_address_for_title
+from src.utils.metrics import LatencyStats
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class CaptureBackend:
+    """창(또는 기기) 화면을 BGRA numpy 배열로 가져오는 캡처 방식의 기본 클래스"""
+
+    # True면 프레임 좌표가 곧 기기(ADB) 좌표 (창 테두리 보정 불필요)
+    device_coordinates = False
+
+    def capture(self, hwnd, title=None):
+        """BGRA 프레임 반환, 실패하면 None"""
+        raise NotImplementedError
+
+    def release(self, hwnd=None):
+        """창별로 잡아둔 자원 해제 (hwnd가 None이면 전부)"""
+
+    def close(self):
+        self.release()
+
+
+class _WindowBuffer:
+    """창 하나에 대해 재사용하는 DC/비트맵/numpy 버퍼"""
+
+    def __init__(self, hwnd, width, height):
+        self.hwnd = hwnd
+        self.width = width
+        self.height = height
+        self.lock = threading.Lock()
+
+        self.hwnd_dc = win32gui.GetWindowDC(hwnd)
+        self.mfc_dc = win32ui.CreateDCFromHandle(self.hwnd_dc)
+        self.save_dc = self.mfc_dc.CreateCompatibleDC()
+        self.bitmap = win32ui.CreateBitmap()
+        self.bitmap.CreateCompatibleBitmap(self.mfc_dc, width, height)
+        self.save_dc.SelectObject(self.bitmap)
+
+        # GetBitmapBits가 바로 써 넣을 BGRA 버퍼
+        self.buffer = np.empty((height, width, 4), dtype=np.uint8)
+        self._buffer_ptr = self.buffer.ctypes.data_as(ctypes.c_void_p)
+
+    def capture(self):
+        if not windll.user32.PrintWindow(self.hwnd, self.save_dc.GetSafeHdc(), 3):
+            return None
+        copied = windll.gdi32.GetBitmapBits(
+            self.bitmap.GetHandle(), self.buffer.nbytes, self._buffer_ptr)
+        return self.buffer if copied == self.buffer.nbytes else None
+
+    def close(self):
+        try:
+            win32gui.DeleteObject(self.bitmap.GetHandle())
+            self.save_dc.DeleteDC()
+            self.mfc_dc.DeleteDC()
+            win32gui.ReleaseDC(self.hwnd, self.hwnd_dc)
+        except Exception as e:
+            print(f"캡처 자원 해제 중 오류 발생: {str(e)}")
+
+
+class PrintWindowBackend(CaptureBackend):
+    """PrintWindow 캡처, 창마다 DC/비트맵/버퍼를 유지하고 창 크기가 바뀔 때만 다시 만든다
+
+    반환되는 배열은 같은 창의 다음 캡처 때 덮어쓰므로, 오래 보관하려면 복사해야 한다.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self.allocations = 0
+
+    def capture(self, hwnd, title=None):
+        if win32gui is None:
+            raise RuntimeError("PrintWindow 캡처는 Windows에서만 사용할 수 있습니다.")
+
+        left, top, right, bot = win32gui.GetWindowRect(hwnd)
+        width, height = right - left, bot - top
+        if width <= 0 or height <= 0:
+            return None
+
+        with self._lock:
+            buffer = self._buffers.get(hwnd)
+            if buffer is None or (buffer.width, buffer.height) != (width, height):
+                if buffer is not None:
+                    buffer.close()
+                buffer = _WindowBuffer(hwnd, width, height)
+                self._buffers[hwnd] = buffer
+                self.allocations += 1
+
+        with buffer.lock:
+            return buffer.capture()
+
+    def release(self, hwnd=None):
+        with self._lock:
+            if hwnd is None:
+                buffers = list(self._buffers.values())
+                self._buffers.clear()
+            else:
+                buffer = self._buffers.pop(hwnd, None)
+                buffers = [buffer] if buffer is not None else []
+        for buffer in buffers:
+            with buffer.lock:
+                buffer.close()
+
+
+def load_frames(source):
+    """이미지 파일 하나 또는 폴더 안의 이미지들을 BGRA 배열 목록으로 로드"""
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, f) for f in os.listdir(source)
+                       if f.lower().endswith(IMAGE_EXTENSIONS))
+    else:
+        paths = [source]
+
+    frames = []
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            print(f"프레임 이미지를 불러올 수 없습니다: {path}")
+            continue
+        if len(image.shape) == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        frames.append(image)
+    return frames
+
+
+class FileReplayBackend(CaptureBackend):
+    """이미지 파일/폴더에서 프레임을 돌려주는 캡처 방식 (Windows API 없이 파이프라인 실행용)
+
+    sources는 모든 창이 공유할 경로 하나, 또는 {hwnd 또는 창 제목: 경로} 사전.
+    프레임 목록 끝에 도달하면 loop가 True일 때 처음부터 다시 재생한다.
+    """
+
+    def __init__(self, sources, loop=True):
+        self.loop = loop
+        self._lock = threading.Lock()
+        if isinstance(sources, dict):
+            self._frames = {key: load_frames(path) for key, path in sources.items()}
+        else:
+            self._frames = {None: load_frames(sources)}
+        self._cursors = {}
+        self.captures = 0
+
+    @classmethod
+    def from_frames(cls, frames, loop=True):
+        """이미 메모리에 있는 BGRA 프레임 목록으로 생성"""
+        backend = cls({}, loop)
+        backend._frames = {None: list(frames)}
+        return backend
+
+    def frame_count(self, key=None):
+        return len(self._frames.get(key, ()))
+
+    def capture(self, hwnd, title=None):
+        for key in (hwnd, title, None):
+            frames = self._frames.get(key)
+            if frames:
+                break
+        else:
+            return None
+
+        with self._lock:
+            cursor = self._cursors.get(key)
+            if cursor is None:
+                cursor = itertools.cycle(range(len(frames))) if self.loop else iter(range(len(frames)))
+                self._cursors[key] = cursor
+            index = next(cursor, None)
+            self.captures += 1
+        return frames[index] if index is not None else None
+
+    def release(self, hwnd=None):
+        with self._lock:
+            if hwnd is None:
+                self._cursors.clear()
+            else:
+                self._cursors.pop(hwnd, None)
+
+
+# screencap 원시 출력의 픽셀 형식 (모두 픽셀당 4바이트)
+SCREENCAP_RGBA_8888 = 1
+SCREENCAP_RGBX_8888 = 2
+SCREENCAP_BGRA_8888 = 5
+
+
+class AdbScreencapStream:
+    """기기 하나에 대해 `adb exec-out sh`를 열어두고 screencap 원시 프레임을 읽는다
+
+    PNG 인코딩 없이 헤더(너비, 높이, 형식[, 색공간]) + 픽셀 데이터를 받아서
+    미리 할당한 버퍼에 바로 채운다.
+    """
+
+    def __init__(self, adb_path, serial, timeout=5.0):
+        self.adb_path = adb_path
+        self.serial = serial
+        self.timeout = timeout
+        self.header_size = None
+        self._process = None
+        self._raw = None
+        self._bgra = None
+
+    def connect(self):
+        self.close()
+        subprocess.run([self.adb_path, "connect", self.serial],
+                       capture_output=True, timeout=self.timeout)
+        if self.header_size is None:
+            self.header_size = self._detect_header_size()
+        self._process = subprocess.Popen(
+            [self.adb_path, "-s", self.serial, "exec-out", "sh"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def _detect_header_size(self):
+        # 안드로이드 버전에 따라 헤더가 12바이트 또는 16바이트(색공간 포함)이므로 한 번 재본다
+        result = subprocess.run([self.adb_path, "-s", self.serial, "exec-out", "screencap"],
+                                capture_output=True, timeout=self.timeout)
+        data = result.stdout
+        if len(data) < 12:
+            raise RuntimeError(f"screencap 출력이 올바르지 않습니다 ({self.serial})")
+        width, height, _ = struct.unpack_from('<III', data)
+        header_size = len(data) - width * height * 4
+        if header_size not in (12, 16):
+            raise RuntimeError(f"screencap 헤더 크기를 알 수 없습니다 ({self.serial}): {header_size}")
+        return header_size
+
+    def is_alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def _read_exact(self, view):
+        stdout = self._process.stdout
+        filled = 0
+        while filled < len(view):
+            count = stdout.readinto(view[filled:])
+            if not count:
+                raise RuntimeError(f"screencap 스트림이 끊어졌습니다 ({self.serial})")
+            filled += count
+
+    def grab(self):
+        """BGRA 프레임 한 장 (같은 스트림의 다음 grab 때 덮어씀)"""
+        if not self.is_alive():
+            self.connect()
+
+        process = self._process
+        # 응답이 없으면 프로세스를 끊어서 블로킹 읽기를 풀어준다
+        watchdog = threading.Timer(self.timeout, process.kill)
+        watchdog.start()
+        try:
+            process.stdin.write(b"screencap\n")
+            process.stdin.flush()
+
+            header = bytearray(self.header_size)
+            self._read_exact(memoryview(header))
+            width, height, pixel_format = struct.unpack_from('<III', header)
+            if self._raw is None or self._raw.shape[:2] != (height, width):
+                self._raw = np.empty((height, width, 4), dtype=np.uint8)
+                self._bgra = np.empty((height, width, 4), dtype=np.uint8)
+            self._read_exact(memoryview(self._raw).cast('B'))
+        except (OSError, ValueError, RuntimeError):
+            self.close()
+            raise
+        finally:
+            watchdog.cancel()
+
+        if pixel_format == SCREENCAP_BGRA_8888:
+            return self._raw
+        cv2.cvtColor(self._raw, cv2.COLOR_RGBA2BGRA, dst=self._bgra)
+        return self._bgra
+
+    def close(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
+class AdbScreencapBackend(CaptureBackend):
+    """ADB screencap 원시 프레임을 기기별 상시 연결로 받아오는 캡처 방식
+
+    프레임 좌표가 기기 좌표와 같아서 창 테두리 보정이 필요 없고, 에뮬레이터 창이
+    가려져 있어도 동작한다. 기기 주소는 'LDPlayer-n' 창 제목으로 계산한다.
+    """
+
+    device_coordinates = True
+
+    def __init__(self, adb_path, timeout=5.0):
+        self.adb_path = adb_path
+        self.timeout = timeout
+        self._streams = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.latency = LatencyStats()
+        self.failures = 0
+
+    def _stream(self, serial):
+        with self._lock:
+            stream = self._streams.get(serial)
+            if stream is None or stream.adb_path != self.adb_path:
+                if stream is not None:
+                    stream.close()
+                stream = AdbScreencapStream(self.adb_path, serial, self.timeout)
+                self._streams[serial] = stream
+                self._locks.setdefault(serial, threading.Lock())
+            return stream, self._locks[serial]
+
+    def capture(self, hwnd, title=None):
+        if not title:
+            return None
+        try:
+            serial = device_address_for_title(title)
+        except (IndexError, ValueError):
+            return None
+
+        stream, lock = self._stream(serial)
+        start = time.perf_counter()
+        with lock:
+            for attempt in range(2):
+                try:
+                    frame = stream.grab()
+                    break
+                except (OSError, ValueError, RuntimeError, subprocess.SubprocessError) as e:
+                    # 끊긴 스트림은 한 번 다시 연결해서 재시도
+                    if attempt:
+                        self.failures += 1
+                        print(f"ADB 화면 캡처 실패 ({serial}): {str(e)}")
+                        return None
+        self.latency.record(time.perf_counter() - start)
+        return frame
+
+    def release(self, hwnd=None):
+        with self._lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+        for stream in streams:
+            stream.close()
+
+    def stats(self):
+        summary = self.latency.summary()
+        summary['fps'] = 1.0 / summary['mean'] if summary['mean'] else 0.0
+        summary['failures'] = self.failures
+        return summary
@@ -0,0 +1,217 @@
+import subprocess
+import threading
+import time
+from collections import deque
+
+from src.utils.adb import AdbError
+from src.utils.metrics import get_stage_metrics, STAGE_TAP
+
+
+class _Tap:
+    def __init__(self, x, y, key, instance, queued_at):
+        self.x = int(x)
+        self.y = int(y)
+        self.key = key
+        self.instance = instance
+        self.queued_at = queued_at
+
+
+class _DeviceQueue:
+    """기기 하나의 탭 대기열과 이를 처리하는 작업 스레드"""
+
+    def __init__(self, serial):
+        self.serial = serial
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.recent = {}  # 템플릿 키 → (x, y, 전송 성공 시각)
+        self.sending = []  # 작업 스레드가 지금 보내고 있는 탭
+        self.busy = False
+        self.thread = None
+
+
+class ClickDispatcher:
+    """매칭 결과와 ADB 사이의 기기별 비동기 탭 대기열
+
+    - 같은 템플릿(key)을 거의 같은 위치(tolerance 픽셀)에 다시 탭하려 할 때, 그 탭이 아직
+      대기열에 있거나 전송 중이거나 cooldown초 안에 전송에 성공했으면 버린다.
+      전송에 실패한 탭은 기록하지 않으므로 다음 매칭 때 바로 다시 시도한다.
+    - 작업 스레드는 batch_window초 동안 모인 탭을 셸 명령 한 번으로 묶어서 보낸다.
+    - 기기가 느려 대기열이 max_queue개로 차면 submit()이 put_timeout초까지 기다리고,
+      그래도 자리가 없으면 탭을 버린다 (검사 스레드가 함께 느려지는 배압).
+    """
+
+    def __init__(self, pool, cooldown=1.0, tolerance=8, max_queue=8, max_batch=4,
+                 batch_window=0.05, put_timeout=0.5, tap_interval=0.05, metrics=None):
+        self.pool = pool
+        self.cooldown = cooldown
+        self.tolerance = tolerance
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.put_timeout = put_timeout
+        # 한 번에 보내는 탭 사이의 간격 (초, 기기가 연속 입력을 놓치지 않도록)
+        self.tap_interval = tap_interval
+        self.metrics = metrics or get_stage_metrics()
+        self._devices = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.counters = {
+            'submitted': 0,
+            'executed': 0,
+            'batches': 0,
+            'merged': 0,
+            'dropped_duplicate': 0,
+            'dropped_backpressure': 0,
+            'failed': 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _device(self, serial):
+        with self._lock:
+            device = self._devices.get(serial)
+            if device is None:
+                device = _DeviceQueue(serial)
+                device.thread = threading.Thread(
+                    target=self._run, args=(device,), name=f"taps-{serial}", daemon=True)
+                self._devices[serial] = device
+                device.thread.start()
+            return device
+
+    def _is_near(self, tap, x, y):
+        return abs(x - tap.x) <= self.tolerance and abs(y - tap.y) <= self.tolerance
+
+    def _is_duplicate(self, device, tap, cooldown, now):
+        # 호출하는 쪽에서 device.condition을 잡고 있어야 한다
+        if tap.key is None or not cooldown:
+            return False
+        for other in device.sending + list(device.pending):
+            if other.key == tap.key and self._is_near(tap, other.x, other.y):
+                return True
+        recent = device.recent.get(tap.key)
+        return (recent is not None and now - recent[2] < cooldown
+                and self._is_near(tap, recent[0], recent[1]))
+
+    def submit(self, serial, x, y, key=None, instance=None, cooldown=None):
+        """탭을 대기열에 넣고 접수 여부를 반환 (실제 전송은 작업 스레드에서)"""
+        if self._closed:
+            return False
+        cooldown = self.cooldown if cooldown is None else cooldown
+        device = self._device(serial)
+        now = time.monotonic()
+        tap = _Tap(x, y, key, instance, now)
+        self._count('submitted')
+
+        with device.condition:
+            if self._is_duplicate(device, tap, cooldown, now):
+                self._count('dropped_duplicate')
+                return False
+            if len(device.pending) >= self.max_queue:
+                deadline = now + self.put_timeout
+                while len(device.pending) >= self.max_queue and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    device.condition.wait(remaining)
+                if len(device.pending) >= self.max_queue or self._closed:
+                    self._count('dropped_backpressure')
+                    print(f"탭 대기열이 가득 차서 버림 ({serial}): ({tap.x}, {tap.y})")
+                    return False
+            device.pending.append(tap)
+            device.condition.notify_all()
+        return True
+
+    def _run(self, device):
+        while True:
+            with device.condition:
+                while not device.pending and not self._closed:
+                    device.condition.wait()
+                if self._closed and not device.pending:
+                    return
+            # 같은 틱에서 들어오는 탭을 조금 더 모은다
+            if self.batch_window:
+                time.sleep(self.batch_window)
+            with device.condition:
+                batch = [device.pending.popleft()
+                         for _ in range(min(self.max_batch, len(device.pending)))]
+                device.sending = batch
+                device.busy = True
+                device.condition.notify_all()  # 자리가 생겼으니 기다리는 submit()을 깨운다
+            try:
+                self._send(device, batch)
+            except Exception as e:
+                print(f"탭 대기열 처리 중 오류 ({device.serial}): {str(e)}")
+            finally:
+                with device.condition:
+                    device.sending = []
+                    device.busy = False
+                    device.condition.notify_all()
+
+    def _send(self, device, batch):
+        serial = device.serial
+        command = f"; sleep {self.tap_interval}; ".join(f"input tap {tap.x} {tap.y}" for tap in batch)
+        try:
+            with self.metrics.timer(STAGE_TAP, batch[0].instance):
+                status = self.pool.run(serial, command)
+        except (AdbError, OSError, subprocess.SubprocessError) as e:
+            print(f"클릭 명령 실패 ({serial}): {str(e)}")
+            status = -1
+        except Exception as e:
+            # 예상하지 못한 오류도 이 묶음만 실패로 처리하고 작업 스레드는 계속 돈다
+            print(f"클릭 명령 처리 중 오류 ({serial}): {str(e)}")
+            status = -1
+        with self._lock:
+            self.counters['batches'] += 1
+            self.counters['merged'] += len(batch) - 1
+            if status == 0:
+                self.counters['executed'] += len(batch)
+            else:
+                self.counters['failed'] += len(batch)
+        if status == 0:
+            # 실제로 보낸 탭만 중복 판단 기준으로 남긴다
+            sent_at = time.monotonic()
+            with device.condition:
+                for tap in batch:
+                    if tap.key is not None:
+                        device.recent[tap.key] = (tap.x, tap.y, sent_at)
+            for tap in batch:
+                print(f"이미지 클릭 성공: {tap.instance or serial} ({tap.x}, {tap.y})")
+
+    def queue_depth(self, serial=None):
+        with self._lock:
+            devices = list(self._devices.values()) if serial is None else [self._devices.get(serial)]
+        return sum(len(device.pending) for device in devices if device is not None)
+
+    def drain(self, timeout=2.0):
+        """대기 중인 탭이 모두 전송될 때까지 기다린다 (종료 전/테스트용)"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            devices = list(self._devices.values())
+        for device in devices:
+            with device.condition:
+                while device.pending or device.busy:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    device.condition.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            devices = list(self._devices.values())
+        stats['queue_depth'] = {device.serial: len(device.pending) for device in devices}
+        return stats
+
+    def close(self, timeout=1.0):
+        self.drain(timeout)
+        self._closed = True
+        with self._lock:
+            devices = list(self._devices.values())
+        for device in devices:
+            with device.condition:
+                device.condition.notify_all()
+        for device in devices:
+            device.thread.join(timeout=timeout)
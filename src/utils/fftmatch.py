@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from src.utils.frame import Frame
+
+
+class _TemplateSpectrum:
+    def __init__(self, template, spectrum, norm):
+        self.template = template  # id() 재사용을 막기 위해 원본을 같이 들고 있는다
+        self.spectrum = spectrum
+        self.norm = norm
+
+
+class FFTMatcher:
+    """프레임 스펙트럼 하나로 여러 템플릿의 TM_CCOEFF_NORMED 점수를 계산
+
+    - 프레임: 그레이스케일을 DFT 크기로 채워 한 번만 변환하고, 창 영역의 합/제곱합은
+      적분 영상(cv2.integral2)으로 구한다. 둘 다 Frame에 캐시되어 모든 템플릿이 같이 쓴다.
+    - 템플릿: 평균을 뺀 템플릿의 스펙트럼과 노름을 DFT 크기별로 캐시한다.
+    - 같은 크기의 템플릿끼리 묶어서 창 표준편차(정규화 분모)를 크기당 한 번만 계산한다.
+
+    프레임 쪽 준비 비용이 있어서 템플릿이 한두 개면 cv2.matchTemplate이 더 빠르고,
+    전체 프레임을 검색하는 템플릿이 여러 개일 때(특히 크기가 같을 때) 이득이 난다.
+    점수는 OpenCV와 같은 규칙으로 정규화한다. images 폴더 기준 이미지에서 잘라 낸 템플릿으로
+    재 보면 cv2.matchTemplate과의 차이는 최고 점수 기준 1e-3 이하, 창 표준편차가 화소당
+    회색조 4 이상인 위치에서 1e-3 이하다. 거의 평평한 창에서는 차이가 0.08 가까이 벌어지는데,
+    float64로 직접 계산한 값과 비교하면 FFT 쪽 오차는 2e-4 이하이고 대부분 cv2.matchTemplate의
+    float32 오차다. 이런 창의 점수는 신뢰도 기준(0.7 이상)보다 훨씬 낮아 매칭 결과는 같다.
+    """
+
+    def __init__(self, cache_size=32):
+        # 템플릿 스펙트럼은 프레임 크기만큼 메모리를 쓰므로 개수를 제한한다
+        self.cache_size = cache_size
+        self._spectra = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'frames': 0, 'templates': 0, 'spectra': 0}
+
+    @staticmethod
+    def dft_shape(frame_shape):
+        height, width = frame_shape[:2]
+        return cv2.getOptimalDFTSize(height), cv2.getOptimalDFTSize(width)
+
+    def _frame_spectrum(self, frame, shape):
+        def compute():
+            padded = frame.buffer('fft_input', shape, np.float32)
+            if padded is None:
+                padded = np.zeros(shape, dtype=np.float32)
+            else:
+                padded.fill(0)
+            gray = frame.gray
+            # 평균을 빼도 평균이 0인 템플릿과의 상관값은 같고, float32 오차는 줄어든다
+            np.subtract(gray, np.float32(cv2.mean(gray)[0]), out=padded[:gray.shape[0], :gray.shape[1]],
+                        dtype=np.float32)
+            spectrum = frame.buffer('fft_spectrum', shape, np.float32)
+            self._count('frames')
+            if spectrum is None:
+                return cv2.dft(padded, nonzeroRows=gray.shape[0])
+            return cv2.dft(padded, dst=spectrum, nonzeroRows=gray.shape[0])
+        return frame.cached(('fft_spectrum', shape), compute)
+
+    def window_std(self, frame, size):
+        """크기 size(h, w)인 모든 창의 sqrt(제곱합 - 합^2/n), float32"""
+        sums, squares = frame.cached(
+            'integrals', lambda: cv2.integral2(frame.gray, sdepth=cv2.CV_64F))
+        h, w = size
+        window_sum = sums[h:, w:] - sums[:-h, w:] - sums[h:, :-w] + sums[:-h, :-w]
+        window_sq = squares[h:, w:] - squares[:-h, w:] - squares[h:, :-w] + squares[:-h, :-w]
+        window_sq -= window_sum * window_sum / (h * w)
+        np.maximum(window_sq, 0, out=window_sq)
+        return np.sqrt(window_sq).astype(np.float32)
+
+    def _template_spectrum(self, template, shape):
+        key = (id(template), shape)
+        with self._lock:
+            entry = self._spectra.get(key)
+            if entry is not None and entry.template is template:
+                self._spectra.move_to_end(key)
+                return entry
+        gray = template.gray.astype(np.float64)
+        centered = gray - gray.mean()
+        padded = np.zeros(shape, dtype=np.float32)
+        padded[:gray.shape[0], :gray.shape[1]] = centered
+        entry = _TemplateSpectrum(template, cv2.dft(padded, nonzeroRows=gray.shape[0]),
+                                  float(np.sqrt((centered * centered).sum())))
+        with self._lock:
+            self._spectra[key] = entry
+            self.counters['spectra'] += 1
+            while len(self._spectra) > self.cache_size:
+                self._spectra.popitem(last=False)
+        return entry
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def scores(self, frame, template, window_std=None):
+        """TM_CCOEFF_NORMED 결과 맵 (cv2.matchTemplate과 같은 크기)
+
+        window_std는 같은 크기 템플릿끼리 나눠 쓰도록 window_std()로 미리 구한 값.
+        """
+        frame = Frame.wrap(frame)
+        gray = frame.gray
+        h, w = template.shape
+        out_h, out_w = gray.shape[0] - h + 1, gray.shape[1] - w + 1
+        shape = self.dft_shape(gray.shape)
+        entry = self._template_spectrum(template, shape)
+        self._count('templates')
+        if entry.norm < 1e-6:
+            # 단색 템플릿은 OpenCV처럼 모든 위치에서 1
+            return np.ones((out_h, out_w), dtype=np.float32)
+
+        product = frame.buffer('fft_product', shape, np.float32)
+        product = cv2.mulSpectrums(self._frame_spectrum(frame, shape), entry.spectrum, 0,
+                                   product, conjB=True)
+        correlation = frame.buffer('fft_correlation', shape, np.float32)
+        correlation = cv2.idft(product, correlation, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT)
+        numerator = correlation[:out_h, :out_w]
+
+        if window_std is None:
+            window_std = self.window_std(frame, (h, w))
+        denominator = window_std * np.float32(entry.norm)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = numerator / denominator
+        # OpenCV 규칙: |분자| < 분모면 나눈 값, 1.125배 안이면 부호, 그 밖(평평한 창 등)은 0
+        outside = ~(np.abs(result) < 1)
+        if outside.any():
+            values = result[outside]
+            result[outside] = np.where(np.abs(values) < 1.125, np.sign(values), 0)
+        return result
+
+    def match_many(self, frame, templates):
+        """여러 템플릿을 크기별로 묶어서 검사하고 템플릿 순서대로 (점수, 좌상단) 목록을 반환"""
+        frame = Frame.wrap(frame)
+        done = frame.cached('fft_matches', dict)
+        groups = OrderedDict()
+        for template in templates:
+            known = done.get(id(template))
+            if known is None or known[0] is not template:
+                groups.setdefault(template.shape, []).append(template)
+
+        for size, group in groups.items():
+            started = time.perf_counter()
+            window_std = self.window_std(frame, size)
+            shared = (time.perf_counter() - started) / len(group)
+            for template in group:
+                started = time.perf_counter()
+                result = self.scores(frame, template, window_std)
+                _, max_val, _, max_loc = cv2.minMaxLoc(result)
+                done[id(template)] = (template, max_val, max_loc,
+                                      time.perf_counter() - started + shared)
+        return [done[id(template)][1:3] for template in templates]
+
+    def lookup(self, frame, template):
+        """이 프레임에서 match_many로 이미 구한 (점수, 좌상단, 걸린 초), 없으면 None"""
+        if not isinstance(frame, Frame):
+            return None
+        known = frame.cached('fft_matches', dict).get(id(template))
+        if known is None or known[0] is not template:
+            return None
+        return known[1:]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['cached_spectra'] = len(self._spectra)
+            return stats
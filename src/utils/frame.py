@@ -0,0 +1,144 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class FrameBuffers:
+    """인스턴스 하나가 프레임마다 다시 쓰는 변환/매칭 결과 버퍼
+
+    같은 이름과 크기의 버퍼를 계속 재사용하므로, 창 크기가 그대로면 틱마다 새로
+    할당하지 않는다. 매칭 결과처럼 크기가 여러 가지인 버퍼는 max_buffers개까지만
+    남기고 오래 쓰지 않은 것부터 버린다.
+    """
+
+    def __init__(self, max_buffers=64):
+        self.max_buffers = max_buffers
+        self._buffers = OrderedDict()
+        self.allocations = 0
+
+    def get(self, key, shape, dtype=np.uint8):
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buffer
+            self.allocations += 1
+            while len(self._buffers) > self.max_buffers:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(key)
+        return buffer
+
+
+class Frame:
+    """캡처 한 장과 그로부터 필요할 때만 만드는 파생 이미지들
+
+    그레이스케일, BGR, 축소본, 블록 평균(변화 감지용 요약값)은 처음 쓸 때 한 번만 계산해서
+    프레임이 살아 있는 동안 모든 템플릿과 색상 검증이 함께 쓴다.
+    buffers(FrameBuffers)를 주면 결과를 그 버퍼에 바로 써서 새 배열을 만들지 않는다.
+    이때 같은 버퍼를 쓰는 다음 프레임이 만들어지면 이전 프레임의 파생 이미지는
+    덮어써지므로, 한 인스턴스의 프레임은 한 번에 하나씩만 처리해야 한다.
+    """
+
+    def __init__(self, raw, buffers=None):
+        self.raw = raw
+        self.buffers = buffers
+        self._views = {}
+
+    @classmethod
+    def wrap(cls, image, buffers=None):
+        return image if isinstance(image, Frame) else cls(image, buffers)
+
+    @property
+    def shape(self):
+        return self.raw.shape[:2]
+
+    @property
+    def channels(self):
+        return self.raw.shape[2] if self.raw.ndim == 3 else 1
+
+    def buffer(self, key, shape, dtype=np.uint8):
+        """인스턴스 버퍼 (버퍼 없이 만든 Frame이면 None)"""
+        return self.buffers.get(key, shape, dtype) if self.buffers is not None else None
+
+    def cached(self, key, compute):
+        """compute()로 만든 값을 프레임이 살아 있는 동안 key로 보관 (다른 모듈의 파생 데이터용)"""
+        value = self._views.get(key)
+        if value is None:
+            value = self._views[key] = compute()
+        return value
+
+    def _convert(self, code, key, shape):
+        dst = self.buffer(key, shape)
+        if dst is None:
+            return cv2.cvtColor(self.raw, code)
+        return cv2.cvtColor(self.raw, code, dst=dst)
+
+    @property
+    def gray(self):
+        """그레이스케일 (BGRA에서 바로 변환, BGR을 거치지 않는다)"""
+        view = self._views.get('gray')
+        if view is None:
+            channels = self.channels
+            if channels == 1:
+                view = self.raw
+            else:
+                code = cv2.COLOR_BGRA2GRAY if channels == 4 else cv2.COLOR_BGR2GRAY
+                view = self._convert(code, 'gray', self.shape)
+            self._views['gray'] = view
+        return view
+
+    @property
+    def bgr(self):
+        """색상 검증용 BGR (매칭된 템플릿이 있을 때만 필요)"""
+        view = self._views.get('bgr')
+        if view is None:
+            channels = self.channels
+            if channels == 3:
+                view = self.raw
+            else:
+                code = cv2.COLOR_BGRA2BGR if channels == 4 else cv2.COLOR_GRAY2BGR
+                view = self._convert(code, 'bgr', self.shape + (3,))
+            self._views['bgr'] = view
+        return view
+
+    def downscaled(self, scale):
+        """scale배로 축소한 그레이스케일 (피라미드 매칭용)"""
+        key = ('downscaled', scale)
+        view = self._views.get(key)
+        if view is None:
+            height, width = self.shape
+            size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            # 일부 영역을 감싼 Frame과 버퍼를 나눠 쓰지 않도록 크기까지 키에 넣는다
+            dst = self.buffer(key + size, (size[1], size[0]))
+            if dst is None:
+                view = cv2.resize(self.gray, size, interpolation=cv2.INTER_AREA)
+            else:
+                view = cv2.resize(self.gray, size, dst=dst, interpolation=cv2.INTER_AREA)
+            self._views[key] = view
+        return view
+
+    def block_means(self, block_size):
+        """block_size 픽셀 블록별 평균 밝기 (float32, 프레임 변화 감지용)"""
+        key = ('blocks', block_size)
+        view = self._views.get(key)
+        if view is None:
+            height, width = self.shape
+            blocks = (max(1, width // block_size), max(1, height // block_size))
+            # 반올림으로 작은 변화가 사라지지 않도록 실수로 평균을 낸다
+            gray_float = self.buffer('gray_float', self.shape, np.float32)
+            if gray_float is None:
+                gray_float = self.gray.astype(np.float32)
+            else:
+                gray_float[...] = self.gray
+            dst = self.buffer(key, (blocks[1], blocks[0]), np.float32)
+            if dst is None:
+                view = cv2.resize(gray_float, blocks, interpolation=cv2.INTER_AREA)
+            else:
+                view = cv2.resize(gray_float, blocks, dst=dst, interpolation=cv2.INTER_AREA)
+            self._views[key] = view
+        return view
+
+    def match_buffer(self, key, shape):
+        """cv2.matchTemplate 결과를 받을 float32 버퍼 (버퍼가 없으면 None)"""
+        return self.buffer(('match', key, shape), shape, np.float32)
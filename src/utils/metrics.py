@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LatencyStats:
+    """최근 N개의 소요 시간(초)을 보관하고 백분위수를 계산"""
+
+    def __init__(self, window=500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total = self.count, self.total
+        if not samples:
+            return {'count': count, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+        return {
+            'count': count,
+            'mean': total / count,
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'p99': percentile(99),
+            'max': samples[-1],
+        }
+
+
+# 단계별 지연 시간 히스토그램 경계값 (초)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+STAGE_WINDOW_LOOKUP = 'window_lookup'
+STAGE_CAPTURE = 'capture'
+STAGE_CONVERT = 'convert'
+STAGE_MATCH = 'match'
+STAGE_VERIFY = 'verify'
+STAGE_TAP = 'tap'
+STAGES = (STAGE_WINDOW_LOOKUP, STAGE_CAPTURE, STAGE_CONVERT, STAGE_MATCH, STAGE_VERIFY, STAGE_TAP)
+
+
+class Histogram:
+    """스레드마다 따로 쌓고 읽을 때만 합치는 히스토그램
+
+    관측값 기록은 자기 스레드 샤드만 건드리므로 잠금이 필요 없다.
+    샤드를 처음 만들 때만 잠금을 잡는다.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            # [버킷별 개수..., +Inf 개수], [합계, 개수]
+            shard = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def observe(self, value):
+        counts, totals = self._shard()
+        counts[bisect_left(self.buckets, value)] += 1
+        totals[0] += value
+        totals[1] += 1
+
+    def snapshot(self):
+        """(버킷별 개수, 합계, 개수) - 버킷 개수는 누적이 아닌 구간별 값"""
+        with self._lock:
+            shards = list(self._shards)
+        counts = [0] * (len(self.buckets) + 1)
+        total, count = 0.0, 0
+        for shard_counts, shard_totals in shards:
+            for i, value in enumerate(shard_counts):
+                counts[i] += value
+            total += shard_totals[0]
+            count += shard_totals[1]
+        return counts, total, count
+
+    def quantile(self, q, snapshot=None):
+        """버킷 안에서 선형 보간한 근사 백분위수"""
+        counts, _, count = snapshot or self.snapshot()
+        if not count:
+            return 0.0
+        target = q * count
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if seen + bucket_count >= target and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (target - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class _StageTimer:
+    def __init__(self, metrics, stage, instance, template):
+        self.metrics = metrics
+        self.stage = stage
+        self.instance = instance
+        self.template = template
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start, self.instance, self.template)
+        return False
+
+
+class StageMetrics:
+    """캡처/매칭/검증/탭 등 단계별 지연 시간을 인스턴스·템플릿 단위로 모은다"""
+
+    METRIC_NAME = 'ldmonitor_stage_seconds'
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage, instance=None, template=None):
+        # 템플릿 레이블은 파일 이름만 쓴다 (전체 경로는 레이블 값 종류가 너무 많아진다)
+        key = (stage, instance or '', os.path.basename(template) if template else '')
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, stage, seconds, instance=None, template=None):
+        self.histogram(stage, instance, template).observe(seconds)
+
+    def timer(self, stage, instance=None, template=None):
+        """with 블록의 소요 시간을 기록하는 컨텍스트 매니저"""
+        return _StageTimer(self, stage, instance, template)
+
+    def summary(self):
+        """단계별로 모든 인스턴스/템플릿을 합친 개수와 근사 p50/p95 (GUI 표시용)"""
+        with self._lock:
+            items = list(self._histograms.items())
+        merged = {}
+        for (stage, _, _), histogram in items:
+            counts, total, count = histogram.snapshot()
+            if stage in merged:
+                previous = merged[stage]
+                counts = [a + b for a, b in zip(previous[0], counts)]
+                total += previous[1]
+                count += previous[2]
+            merged[stage] = (counts, total, count)
+
+        reference = Histogram(self.buckets)
+        return {
+            stage: {
+                'count': snapshot[2],
+                'mean': snapshot[1] / snapshot[2] if snapshot[2] else 0.0,
+                'p50': reference.quantile(0.5, snapshot),
+                'p95': reference.quantile(0.95, snapshot),
+            }
+            for stage, snapshot in merged.items()
+        }
+
+    def render_prometheus(self):
+        """Prometheus 텍스트 형식으로 모든 히스토그램 출력"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        lines = [
+            f"# HELP {self.METRIC_NAME} Latency of each monitor stage in seconds.",
+            f"# TYPE {self.METRIC_NAME} histogram",
+        ]
+        for (stage, instance, template), histogram in items:
+            counts, total, count = histogram.snapshot()
+            labels = f'stage="{_escape(stage)}"'
+            if instance:
+                labels += f',instance="{_escape(instance)}"'
+            if template:
+                labels += f',template="{_escape(template)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.METRIC_NAME}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.METRIC_NAME}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.METRIC_NAME}_sum{{{labels}}} {total}')
+            lines.append(f'{self.METRIC_NAME}_count{{{labels}}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """node_exporter textfile 수집기가 읽을 수 있도록 파일을 원자적으로 교체"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+    def serve(self, port, host='127.0.0.1'):
+        """/metrics 경로로 Prometheus 텍스트를 제공하는 HTTP 서버를 백그라운드로 시작"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+        thread.start()
+        return server
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_default_metrics = StageMetrics()
+
+
+def get_stage_metrics():
+    """프로세스 전체에서 공유하는 기본 StageMetrics"""
+    return _default_metrics
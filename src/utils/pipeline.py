@@ -0,0 +1,371 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import connection, shared_memory
+
+import cv2
+import numpy as np
+
+from src.utils.scanner import ImageScanner, TemplateSpec, MatchHit, ScanResult
+
+SCAN_THREAD = 'thread'
+SCAN_PROCESS = 'process'
+
+
+def _spec_tuple(spec):
+    return (spec.path, spec.action, spec.confidence, spec.roi, spec.cooldown, spec.priority)
+
+
+def _attach_shared_memory(name):
+    """자식 프로세스에서 공유 메모리에 연결 (정리는 만든 쪽 부모 프로세스가 한다)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.12 이하: spawn으로 만든 자식은 부모의 resource_tracker를 같이 쓰므로
+        # 여기서 다시 등록되어도 부모가 unlink할 때 한 번만 정리된다
+        return shared_memory.SharedMemory(name=name)
+
+
+def _matcher_main(shm_name, slot_size, jobs, results, scanner_options):
+    """매칭 프로세스: 공유 메모리 슬롯의 프레임을 복사 없이 읽어서 scan_frame 실행
+
+    결과는 이 프로세스 전용 파이프(results)로 보낸다. 여러 프로세스가 같은 큐에 쓰면
+    한 프로세스가 큐 잠금을 잡은 채 죽었을 때 나머지 결과도 모두 막히기 때문이다.
+
+    jobs 메시지:
+        ('templates', [spec 튜플...])  검사할 템플릿 교체
+        ('scan', job_id, 인스턴스, 슬롯, shape)
+        ('forget', 인스턴스)
+        None  종료
+    """
+    cv2.setNumThreads(1)  # 프로세스 수만큼 코어를 나눠 쓰므로 OpenCV 내부 스레드는 끈다
+    shm = _attach_shared_memory(shm_name)
+    scanner = ImageScanner(**scanner_options)
+    templates = []
+    try:
+        while True:
+            message = jobs.get()
+            if message is None:
+                break
+            kind = message[0]
+            if kind == 'templates':
+                templates = [TemplateSpec(*spec) for spec in message[1]]
+            elif kind == 'forget':
+                scanner.forget_instance(message[1])
+            elif kind == 'scan':
+                _, job_id, instance, slot, shape = message
+                started = time.perf_counter()
+                try:
+                    frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_size)
+                    result = scanner.scan_frame(frame, templates, instance=instance)
+                    del frame
+                    hits = [(hit.spec.path, hit.top_left, hit.score) for hit in result.hits]
+                    results.send((job_id, hits, result.scores, result.scan_kind, result.scale,
+                                  time.perf_counter() - started, None))
+                except Exception as e:
+                    results.send((job_id, [], {}, 'full', 1.0, time.perf_counter() - started, str(e)))
+    finally:
+        scanner.close()
+        shm.close()
+
+
+class _Job:
+    def __init__(self, instance, slot, shape, specs, worker):
+        self.instance = instance
+        self.slot = slot
+        self.shape = shape
+        self.specs = specs
+        self.worker = worker
+        self.submitted = time.monotonic()
+        self.future = Future()
+
+
+class MatchPipeline:
+    """캡처는 인스턴스별 스레드에서, 매칭은 별도 프로세스 풀에서 하는 검사 파이프라인
+
+    캡처한 프레임은 multiprocessing.shared_memory의 고정 크기 슬롯에 한 번 복사하고,
+    매칭 프로세스는 슬롯을 복사 없이 읽어 매칭 결과(좌표/점수)만 큐로 돌려준다.
+    인스턴스는 처음 본 순간 매칭 프로세스 하나에 배정되어, 프레임 변화 감지와
+    마지막 매칭 위치 같은 인스턴스별 상태가 한 프로세스 안에 유지된다.
+    빈 슬롯이 없으면 submit()이 기다리므로 매칭이 밀리면 캡처도 함께 느려진다.
+
+    결과 수집 스레드가 health_interval초마다 매칭 프로세스를 확인해서, 죽었거나
+    작업 하나를 hang_timeout초 넘게 붙잡고 있는 프로세스를 다시 띄운다. 그 프로세스에
+    걸려 있던 작업은 오류로 끝내고 슬롯을 돌려준다. scan()은 기본으로 timeout초까지만 기다린다.
+    """
+
+    def __init__(self, workers=None, slots=None, max_width=1024, max_height=600, channels=4,
+                 scanner_options=None, template_cache=None, timeout=5.0, hang_timeout=10.0,
+                 health_interval=0.5):
+        self.workers = workers or max(1, multiprocessing.cpu_count() - 1)
+        self.slots = slots or self.workers * 2
+        self.max_width = max_width
+        self.max_height = max_height
+        self.channels = channels
+        self.slot_size = max_width * max_height * channels
+        self.scanner_options = dict(scanner_options or {})
+        # 결과를 MatchHit로 되돌릴 때 쓰는 템플릿 캐시 (부모 프로세스의 스캐너와 공유)
+        self.template_cache = template_cache
+        self.timeout = timeout
+        self.hang_timeout = hang_timeout
+        self.health_interval = health_interval
+        self._context = None
+        self._closing = False
+        self._shm = None
+        self._processes = []
+        self._job_queues = []
+        self._readers = []  # 매칭 프로세스별 결과 파이프 (죽은 프로세스는 None)
+        self._wake = None  # close()가 결과 수집 스레드를 깨우는 파이프 (읽는 쪽, 쓰는 쪽)
+        self._collector = None
+        self._free_slots = queue.Queue()
+        self._jobs = {}
+        self._job_ids = 0
+        self._assignments = {}
+        self._templates_key = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.errors = 0
+        self.restarts = 0
+        self.match_seconds = 0.0
+
+    def start(self):
+        if self._processes:
+            return
+        self._context = multiprocessing.get_context('spawn')
+        self._closing = False
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_size * self.slots)
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+        self._wake = self._context.Pipe(duplex=False)
+        for index in range(self.workers):
+            jobs, process, reader = self._spawn(index)
+            self._job_queues.append(jobs)
+            self._processes.append(process)
+            self._readers.append(reader)
+        self._collector = threading.Thread(target=self._collect, name="pipeline-results", daemon=True)
+        self._collector.start()
+
+    def _spawn(self, index):
+        jobs = self._context.Queue()
+        reader, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_matcher_main,
+            args=(self._shm.name, self.slot_size, jobs, writer, self.scanner_options),
+            name=f"matcher-{index}",
+            daemon=True,
+        )
+        process.start()
+        # 쓰는 쪽은 자식만 들고 있어야 자식이 죽었을 때 읽는 쪽에서 EOFError가 난다
+        writer.close()
+        return jobs, process, reader
+
+    def close(self, timeout=2.0):
+        if not self._processes:
+            return
+        self._closing = True
+        for jobs in self._job_queues:
+            jobs.put(None)
+        for process in self._processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        self._wake[1].send(None)
+        self._collector.join(timeout=timeout)
+        with self._lock:
+            pending = list(self._jobs.values())
+            self._jobs.clear()
+        for job in pending:
+            job.future.set_exception(RuntimeError("파이프라인이 종료되었습니다."))
+        for reader in self._readers + list(self._wake):
+            if reader is not None:
+                reader.close()
+        self._processes = []
+        self._job_queues = []
+        self._readers = []
+        self._wake = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def fits(self, frame):
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        return height <= self.max_height and width <= self.max_width and channels <= self.channels
+
+    def _worker_for(self, instance):
+        # 호출하는 쪽에서 self._lock을 잡고 있어야 한다
+        worker = self._assignments.get(instance)
+        if worker is None:
+            loads = [0] * self.workers
+            for assigned in self._assignments.values():
+                loads[assigned] += 1
+            worker = loads.index(min(loads))
+            self._assignments[instance] = worker
+        return worker
+
+    def _sync_templates(self, specs):
+        # 호출하는 쪽에서 self._lock을 잡고 있어야 한다
+        key = tuple(_spec_tuple(spec) for spec in specs)
+        if key != self._templates_key:
+            for jobs in self._job_queues:
+                jobs.put(('templates', list(key)))
+            self._templates_key = key
+
+    def submit(self, instance, frame, templates, timeout=None):
+        """프레임을 빈 슬롯에 복사하고 매칭을 요청, ScanResult를 돌려줄 Future 반환"""
+        specs = [spec if isinstance(spec, TemplateSpec) else TemplateSpec(spec) for spec in templates]
+        frame = np.ascontiguousarray(frame)
+        slot = self._free_slots.get(timeout=timeout)
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self.slot_size)
+        view[...] = frame
+        del view
+
+        with self._lock:
+            worker = self._worker_for(instance)
+            job = _Job(instance, slot, frame.shape, specs, worker)
+            self._job_ids += 1
+            job_id = self._job_ids
+            self._jobs[job_id] = job
+            self._sync_templates(specs)
+            self._job_queues[worker].put(('scan', job_id, instance, slot, frame.shape))
+        return job.future
+
+    def scan(self, instance, frame, templates, timeout=None):
+        """submit 후 결과를 기다린다 (timeout이 None이면 self.timeout초)
+
+        빈 슬롯을 기다리는 시간과 결과를 기다리는 시간에 각각 timeout을 적용하며,
+        시간을 넘기면 queue.Empty 또는 concurrent.futures.TimeoutError가 발생한다.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        return self.submit(instance, frame, templates, timeout).result(timeout)
+
+    def forget(self, instance):
+        with self._lock:
+            worker = self._assignments.pop(instance, None)
+            if worker is not None:
+                self._job_queues[worker].put(('forget', instance))
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while True:
+            readers = [reader for reader in self._readers if reader is not None]
+            ready = connection.wait(readers + [self._wake[0]], timeout=self.health_interval)
+            if self._wake[0] in ready:
+                return
+            for reader in ready:
+                try:
+                    message = reader.recv()
+                except (EOFError, OSError):
+                    # 프로세스가 죽었다, 다음 상태 확인 때 다시 띄운다
+                    self._readers[self._readers.index(reader)] = None
+                    reader.close()
+                    continue
+                self._handle_result(message)
+            if time.monotonic() - last_check >= self.health_interval:
+                self._check_workers()
+                last_check = time.monotonic()
+
+    def _handle_result(self, message):
+        job_id, hits, scores, scan_kind, scale, seconds, error = message
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            self.completed += 1
+            self.match_seconds += seconds
+            if error:
+                self.errors += 1
+        if job is None:
+            return
+        try:
+            result = self._build_result(job, hits, scores, scan_kind, scale) if not error else None
+        except Exception as e:
+            result, error = None, str(e)
+        finally:
+            self._free_slots.put(job.slot)
+        if error:
+            job.future.set_exception(RuntimeError(f"매칭 프로세스 오류 ({job.instance}): {error}"))
+        else:
+            job.future.set_result(result)
+
+    def _check_workers(self):
+        """죽은 매칭 프로세스를 다시 띄우고, 멈춘 프로세스는 끝내서 다음 확인 때 다시 띄운다"""
+        if self._closing:
+            return
+        now = time.monotonic()
+        for index, process in enumerate(list(self._processes)):
+            if process.is_alive():
+                with self._lock:
+                    stuck = any(job.worker == index and now - job.submitted > self.hang_timeout
+                                for job in self._jobs.values())
+                if stuck:
+                    print(f"매칭 프로세스 응답 없음, 다시 시작합니다: {process.name}")
+                    process.kill()
+                continue
+
+            print(f"매칭 프로세스가 종료되었습니다 (종료 코드: {process.exitcode}), 다시 시작합니다: {process.name}")
+            jobs, replacement, reader = self._spawn(index)
+            if self._readers[index] is not None:
+                self._readers[index].close()
+            self._readers[index] = reader
+            with self._lock:
+                old_jobs = self._job_queues[index]
+                self._job_queues[index] = jobs
+                self._processes[index] = replacement
+                if self._templates_key is not None:
+                    jobs.put(('templates', list(self._templates_key)))
+                failed = [job_id for job_id, job in self._jobs.items() if job.worker == index]
+                failed = [self._jobs.pop(job_id) for job_id in failed]
+                self.errors += len(failed)
+                self.restarts += 1
+            # 죽은 프로세스가 읽지 않은 메시지 때문에 종료가 막히지 않도록 한다
+            old_jobs.cancel_join_thread()
+            old_jobs.close()
+            for job in failed:
+                self._free_slots.put(job.slot)
+                job.future.set_exception(
+                    RuntimeError(f"매칭 프로세스가 종료되었습니다 ({job.instance})"))
+
+    def _build_result(self, job, hits, scores, scan_kind, scale):
+        """매칭 프로세스가 보낸 좌표/점수를 ScanResult로 되돌린다
+
+        매칭된 템플릿이 있을 때만 슬롯 프레임을 BGR로 복사해서 색상 검증에 쓸 수 있게 한다.
+        """
+        frame_bgr = None
+        if hits:
+            view = np.ndarray(job.shape, dtype=np.uint8, buffer=self._shm.buf,
+                              offset=job.slot * self.slot_size)
+            if view.ndim == 2:
+                frame_bgr = cv2.cvtColor(view, cv2.COLOR_GRAY2BGR)
+            elif view.shape[2] == 4:
+                frame_bgr = cv2.cvtColor(view, cv2.COLOR_BGRA2BGR)
+            else:
+                frame_bgr = view.copy()
+            del view
+
+        result = ScanResult(frame_bgr, job.instance)
+        result.scores = scores
+        result.scan_kind = scan_kind
+        result.scale = scale
+        by_path = {spec.path: spec for spec in job.specs}
+        for path, top_left, score in hits:
+            template = self.template_cache.get(path) if self.template_cache is not None else None
+            if template is None:
+                continue
+            # 매칭 프로세스가 보정한 배율의 템플릿
+            template = template.scaled(scale)
+            result.hits.append(MatchHit(by_path[path], template, tuple(top_left), score))
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'slots': self.slots,
+                'free_slots': self._free_slots.qsize(),
+                'pending': len(self._jobs),
+                'completed': self.completed,
+                'errors': self.errors,
+                'restarts': self.restarts,
+                'match_seconds': self.match_seconds,
+            }
@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from src.utils.frame import Frame
+
+
+def _hue_planes(bgr, min_saturation, min_value):
+    """(색상 채널 0~255, 색이 뚜렷한 픽셀 마스크)
+
+    채도나 밝기가 낮은 픽셀은 밝기가 조금만 바뀌어도 색상 값이 크게 흔들리므로 무채색으로 따로 센다.
+    """
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV_FULL)
+    chromatic = cv2.inRange(hsv, (0, min_saturation, min_value), (255, 255, 255))
+    return hsv[..., 0].copy(), chromatic
+
+
+def _hue_histogram(hue, chromatic, bins):
+    """색상 bins칸 + 무채색 1칸 히스토그램"""
+    histogram = np.empty(bins + 1, dtype=np.float32)
+    histogram[:bins] = cv2.calcHist([hue], [0], chromatic, [bins], [0, 256]).ravel()
+    histogram[bins] = hue.size - histogram[:bins].sum()
+    return histogram
+
+
+def containment(template_hist, region_hist):
+    """템플릿 픽셀 중 검색 영역에 같은 색 칸의 픽셀이 충분히 있는 비율 (0~1)
+
+    템플릿이 영역 안에 그대로 있으면 영역의 칸별 픽셀 수가 템플릿보다 적을 수 없으므로 1이다.
+    """
+    total = template_hist.sum()
+    if total <= 0:
+        return 1.0
+    return float(np.minimum(template_hist, region_hist).sum() / total)
+
+
+class _TemplateDescriptor:
+    def __init__(self, template, histogram, threshold):
+        self.template = template  # id() 재사용을 막기 위해 원본을 같이 들고 있는다
+        self.histogram = histogram
+        self.threshold = threshold
+
+
+class TemplatePrefilter:
+    """전체 매칭 전에 색상(hue) 히스토그램으로 검색 영역에 있을 수 없는 템플릿을 걸러낸다
+
+    템플릿마다 색상 bins칸 + 무채색 1칸 히스토그램을 만들고, 검색 영역(프레임 전체, ROI,
+    직전 매칭 위치 주변)의 히스토그램이 템플릿 색을 충분히 담고 있지 않으면 매칭을 건너뛴다.
+    색상은 밝기 이동과 게인(대비)에 거의 변하지 않으므로, NCC 매칭처럼 화면이 조금 어두워지거나
+    밝아져도 템플릿을 걸러내지 않는다. 프레임의 색상 채널과 영역 히스토그램은 Frame에 캐시되어
+    같은 프레임을 보는 템플릿이 같이 쓴다.
+
+    기준값은 템플릿마다 보정한다: 템플릿에 게인(1±gain), 감마(1±gamma배), 밝기 이동(±shift),
+    캡처 노이즈(±noise)를 무작위로 samples번 준 포함 비율의 false_rejection 분위수로 잡으므로,
+    그 정도 변화 안에서는 실제로 있는 템플릿을 걸러낼 확률이 대략 false_rejection 이하가 된다.
+    그레이스케일로만 비슷하고 색이 다른 곳도 걸러지므로, 색상 검증을 거치지 않는 종료
+    템플릿도 색이 맞아야 매칭된다.
+    """
+
+    def __init__(self, false_rejection=0.01, bins=16, min_saturation=48, min_value=48, gain=0.25,
+                 gamma=0.3, shift=24, noise=4, samples=32, cache_size=256, seed=0):
+        self.false_rejection = false_rejection
+        self.bins = bins
+        self.min_saturation = min_saturation
+        self.min_value = min_value
+        self.gain = gain
+        self.gamma = gamma
+        self.shift = shift
+        self.noise = noise
+        self.samples = samples
+        self.cache_size = cache_size
+        self._rng = np.random.default_rng(seed)
+        self._descriptors = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'checked': 0, 'rejected': 0}
+
+    def histogram(self, bgr):
+        return _hue_histogram(*_hue_planes(bgr, self.min_saturation, self.min_value), self.bins)
+
+    def _perturbations(self, shape):
+        """보정에 쓸 (밝기 변환표, 노이즈) samples개"""
+        levels = np.arange(256) / 255.0
+        log_gamma = np.log1p(self.gamma)
+        with self._lock:
+            rng = self._rng
+            perturbations = []
+            for _ in range(self.samples):
+                gain = rng.uniform(1 - self.gain, 1 + self.gain)
+                gamma = np.exp(rng.uniform(-log_gamma, log_gamma))
+                shift = rng.integers(-self.shift, self.shift + 1)
+                lut = np.clip(gain * 255.0 * levels ** gamma + shift, 0, 255)
+                noise = rng.integers(-self.noise, self.noise + 1, shape, dtype=np.int16)
+                perturbations.append((lut.round().astype(np.int16), noise))
+        return perturbations
+
+    def _calibrate(self, template):
+        bgr = template.bgr
+        histogram = self.histogram(bgr)
+        scores = []
+        for lut, noise in self._perturbations(bgr.shape):
+            changed = np.clip(lut[bgr] + noise, 0, 255).astype(np.uint8)
+            scores.append(containment(histogram, self.histogram(changed)))
+        threshold = float(np.quantile(scores, self.false_rejection))
+        return _TemplateDescriptor(template, histogram, threshold)
+
+    def descriptor(self, template):
+        key = id(template)
+        with self._lock:
+            entry = self._descriptors.get(key)
+            if entry is not None and entry.template is template:
+                self._descriptors.move_to_end(key)
+                return entry
+        entry = self._calibrate(template)
+        with self._lock:
+            self._descriptors[key] = entry
+            while len(self._descriptors) > self.cache_size:
+                self._descriptors.popitem(last=False)
+        return entry
+
+    def region_histogram(self, frame, region=None):
+        """프레임의 (x, y, w, h) 영역 히스토그램 (컬러가 아니면 None)"""
+        frame = Frame.wrap(frame)
+        if frame.channels < 3:
+            return None
+        height, width = frame.shape
+        x, y, w, h = region if region is not None else (0, 0, width, height)
+        hue, chromatic = frame.cached(
+            ('prefilter_hue', self.min_saturation, self.min_value),
+            lambda: _hue_planes(frame.bgr, self.min_saturation, self.min_value))
+
+        def compute():
+            return _hue_histogram(hue[y:y + h, x:x + w], chromatic[y:y + h, x:x + w], self.bins)
+        return frame.cached(('prefilter_histogram', self.bins, self.min_saturation, self.min_value,
+                             x, y, w, h), compute)
+
+    def score(self, frame, template, region=None):
+        """(포함 비율, 기준값), 컬러 프레임이 아니면 None"""
+        region_hist = self.region_histogram(frame, region)
+        if region_hist is None:
+            return None
+        entry = self.descriptor(template)
+        return containment(entry.histogram, region_hist), entry.threshold
+
+    def may_contain(self, frame, template, region=None):
+        """템플릿이 영역 안에 있을 수 있으면 True (판단할 수 없을 때도 True)
+
+        region은 clip_region으로 프레임 안에 맞춘 (x, y, w, h), None이면 프레임 전체.
+        """
+        def decide():
+            result = self.score(frame, template, region)
+            if result is None:
+                return True
+            value, threshold = result
+            rejected = value < threshold
+            with self._lock:
+                self.counters['checked'] += 1
+                if rejected:
+                    self.counters['rejected'] += 1
+            return not rejected
+        if not isinstance(frame, Frame):
+            return decide()
+        # 같은 프레임에서 FFT 묶음 선별과 매칭이 같은 판단을 두 번 묻지 않도록 캐시
+        return frame.cached(('prefilter', id(template), region), decide)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['rejection_rate'] = stats['rejected'] / stats['checked'] if stats['checked'] else 0.0
+            return stats
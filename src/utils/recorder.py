@@ -0,0 +1,340 @@
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+import numpy as np
+
+from src.utils.scanner import ImageScanner, TemplateSpec
+
+# 파일 헤더: 매직, 버전, 슬롯 수, 최대 너비/높이, 채널 수, 메타데이터 크기, 다음 순번
+FILE_MAGIC = b'LDREC1\0\0'
+FILE_VERSION = 2
+FILE_HEADER = struct.Struct('<8sIIIIIIQ')
+FILE_HEADER_SIZE = 64
+# 슬롯 헤더: 순번(0이면 비어 있거나 쓰는 중), 시각, 너비, 높이, 채널 수, 메타데이터 길이
+SLOT_HEADER = struct.Struct('<QdIIII')
+SLOT_HEADER_SIZE = 32
+# 검사 계획(템플릿 목록과 ROI)은 슬롯마다 넣지 않고 녹화 파일 옆에 한 번만 저장
+PLANS_SUFFIX = '.plans.json'
+
+
+def spec_to_dict(spec):
+    if not isinstance(spec, TemplateSpec):
+        spec = TemplateSpec(spec)
+    return {'path': spec.path, 'action': spec.action, 'confidence': spec.confidence,
+            'roi': list(spec.roi) if spec.roi else None, 'cooldown': spec.cooldown,
+            'priority': spec.priority}
+
+
+def spec_from_dict(entry):
+    return TemplateSpec(entry['path'], entry['action'], confidence=entry['confidence'],
+                        roi=entry.get('roi'), cooldown=entry.get('cooldown'),
+                        priority=entry.get('priority', 0))
+
+
+def result_metadata(result, templates=None):
+    """ScanResult를 슬롯에 함께 저장할 작은 dict로 변환
+
+    templates를 주면 경로 대신 검사 계획 안의 템플릿 번호로 저장해서, 경로가 길어도
+    슬롯 메타데이터 크기가 템플릿 수에만 비례한다.
+    """
+    metadata = {}
+    if result is None:
+        return metadata
+    metadata['instance'] = result.instance
+    metadata['scan_kind'] = result.scan_kind
+    if templates is None:
+        metadata['hits'] = [
+            {'path': hit.spec.path, 'action': hit.action,
+             'top_left': list(hit.top_left), 'score': round(float(hit.score), 4)}
+            for hit in result.hits
+        ]
+        metadata['scores'] = {path: round(float(score), 4) for path, score in result.scores.items()}
+        return metadata
+
+    paths = [spec.path if isinstance(spec, TemplateSpec) else spec for spec in templates]
+    index = {path: i for i, path in enumerate(paths)}
+    metadata['hits'] = [
+        {'template': index[hit.spec.path], 'top_left': list(hit.top_left),
+         'score': round(float(hit.score), 4)}
+        for hit in result.hits
+    ]
+    metadata['scores'] = [
+        round(float(result.scores[path]), 4) if path in result.scores else None
+        for path in paths
+    ]
+    return metadata
+
+
+class FrameRecorder:
+    """프레임 원본 바이트와 매칭 결과를 고정 크기 mmap 링 버퍼 파일에 기록
+
+    슬롯마다 [헤더 | 메타데이터(JSON) | 픽셀] 순서로 저장하고, 슬롯이 다 차면 가장
+    오래된 것부터 덮어쓴다. 이미지 인코딩 없이 memcpy 한 번으로 끝난다.
+    검사 계획은 <path>.plans.json에 한 번만 쓰고 슬롯에는 계획 번호만 남긴다.
+    쓰는 동안에는 슬롯 순번을 0으로 두었다가 마지막에 기록하므로, 중간에
+    프로세스가 죽어도 읽을 때 반쯤 쓴 슬롯은 건너뛴다.
+    """
+
+    def __init__(self, path, slots=60, max_width=1024, max_height=600, channels=4, meta_size=4096):
+        self.path = path
+        self.slots = slots
+        self.max_width = max_width
+        self.max_height = max_height
+        self.channels = channels
+        self.meta_size = meta_size
+        self.pixel_size = max_width * max_height * channels
+        self.slot_size = SLOT_HEADER_SIZE + meta_size + self.pixel_size
+        self.recorded = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+        total_size = FILE_HEADER_SIZE + self.slot_size * slots
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 같은 구성의 기존 파일이 있으면 이어서 기록 (재시작해도 직전 프레임이 남도록)
+        self._next_seq = self._existing_next_seq(total_size)
+        self._file = open(path, 'r+b' if self._next_seq else 'w+b')
+        self._file.truncate(total_size)
+        self._mmap = mmap.mmap(self._file.fileno(), total_size)
+        self._next_seq = self._next_seq or 1
+        self._write_file_header()
+        self.plans_path = path + PLANS_SUFFIX
+        self._plans = self._load_plans() if self._next_seq > 1 else []
+        if self._next_seq > 1 and self._plans is None:
+            # 계획 파일을 잃어버린 녹화는 이어 쓰지 않고 처음부터 다시 기록
+            self._clear_slots()
+        self._plans = self._plans or []
+        self._plan_ids = {json.dumps(plan, sort_keys=True): index for index, plan in enumerate(self._plans)}
+        if not self._plans:
+            self._write_plans()
+
+    def _load_plans(self):
+        try:
+            with open(self.plans_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _clear_slots(self):
+        for index in range(self.slots):
+            struct.pack_into('<Q', self._mmap, FILE_HEADER_SIZE + index * self.slot_size, 0)
+        self._next_seq = 1
+        self._write_file_header()
+
+    def _write_plans(self):
+        temp_path = self.plans_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._plans, f, ensure_ascii=False)
+        os.replace(temp_path, self.plans_path)
+
+    def plan_id(self, templates):
+        """검사 계획 번호 (처음 보는 계획이면 계획 파일에 추가)"""
+        plan = [spec_to_dict(spec) for spec in templates]
+        key = json.dumps(plan, sort_keys=True)
+        with self._lock:
+            plan_id = self._plan_ids.get(key)
+            if plan_id is None:
+                plan_id = len(self._plans)
+                self._plans.append(plan)
+                self._plan_ids[key] = plan_id
+                self._write_plans()
+            return plan_id
+
+    def _existing_next_seq(self, total_size):
+        try:
+            if os.path.getsize(self.path) != total_size:
+                return 0
+            with open(self.path, 'rb') as f:
+                header = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        except (OSError, struct.error):
+            return 0
+        expected = (FILE_MAGIC, FILE_VERSION, self.slots, self.max_width, self.max_height,
+                    self.channels, self.meta_size)
+        return header[7] if header[:7] == expected else 0
+
+    def _write_file_header(self):
+        FILE_HEADER.pack_into(self._mmap, 0, FILE_MAGIC, FILE_VERSION, self.slots, self.max_width,
+                              self.max_height, self.channels, self.meta_size, self._next_seq)
+
+    def record(self, frame, metadata=None, timestamp=None, templates=None):
+        """프레임 한 장 기록 (최대 크기보다 크거나 채널 수가 다르면 건너뛰고 False)
+
+        templates를 주면 그 검사 계획의 번호를 메타데이터에 함께 남긴다.
+        메타데이터가 meta_size를 넘으면 ValueError를 낸다.
+        """
+        frame = np.asarray(frame)
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        if width > self.max_width or height > self.max_height or channels > self.channels:
+            self.dropped += 1
+            return False
+
+        metadata = dict(metadata or {})
+        if templates is not None:
+            metadata['plan'] = self.plan_id(templates)
+        meta = json.dumps(metadata, ensure_ascii=False).encode('utf-8')
+        if len(meta) > self.meta_size:
+            self.dropped += 1
+            raise ValueError(f"메타데이터가 너무 큽니다 ({len(meta)} > {self.meta_size}바이트)")
+        timestamp = time.time() if timestamp is None else timestamp
+
+        with self._lock:
+            seq = self._next_seq
+            offset = FILE_HEADER_SIZE + ((seq - 1) % self.slots) * self.slot_size
+            SLOT_HEADER.pack_into(self._mmap, offset, 0, timestamp, width, height, channels, len(meta))
+            meta_offset = offset + SLOT_HEADER_SIZE
+            self._mmap[meta_offset:meta_offset + len(meta)] = meta
+            pixel_offset = meta_offset + self.meta_size
+            pixels = np.frombuffer(self._mmap, dtype=np.uint8, count=height * width * channels,
+                                   offset=pixel_offset).reshape(frame.shape)
+            pixels[...] = frame
+            del pixels  # mmap을 닫을 때 남은 참조가 없도록
+            struct.pack_into('<Q', self._mmap, offset, seq)
+            self._next_seq = seq + 1
+            self._write_file_header()
+            self.recorded += 1
+        return True
+
+    def flush(self):
+        with self._lock:
+            self._mmap.flush()
+
+    def close(self):
+        with self._lock:
+            if self._mmap.closed:
+                return
+            self._mmap.flush()
+            self._mmap.close()
+            self._file.close()
+
+
+class RecordingReader:
+    """FrameRecorder 파일을 오래된 프레임부터 읽는다"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.slots, self.max_width, self.max_height,
+         self.channels, self.meta_size, self.next_seq) = FILE_HEADER.unpack_from(self._data, 0)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError(f"녹화 파일 형식이 아닙니다: {path}")
+        self.slot_size = SLOT_HEADER_SIZE + self.meta_size + self.max_width * self.max_height * self.channels
+        try:
+            with open(path + PLANS_SUFFIX, encoding='utf-8') as f:
+                self.plans = [[spec_from_dict(entry) for entry in plan] for plan in json.load(f)]
+        except FileNotFoundError:
+            self.plans = []
+
+    def entries(self):
+        """(순번, 시각, 프레임, 메타데이터) 목록을 순번 순서로 반환"""
+        entries = []
+        for index in range(self.slots):
+            offset = FILE_HEADER_SIZE + index * self.slot_size
+            seq, timestamp, width, height, channels, meta_len = SLOT_HEADER.unpack_from(self._data, offset)
+            if not seq:
+                continue
+            meta_offset = offset + SLOT_HEADER_SIZE
+            metadata = json.loads(self._data[meta_offset:meta_offset + meta_len].decode('utf-8') or '{}')
+            shape = (height, width, channels) if channels > 1 else (height, width)
+            frame = np.frombuffer(self._data, dtype=np.uint8, count=height * width * channels,
+                                  offset=meta_offset + self.meta_size).reshape(shape).copy()
+            entries.append((seq, timestamp, frame, metadata))
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    def frames(self):
+        return [frame for _, _, frame, _ in self.entries()]
+
+    def close(self):
+        self._data.close()
+
+
+def _safe_filename(name):
+    return re.sub(r'[^0-9A-Za-z_.-]+', '_', str(name)) or 'instance'
+
+
+class RecorderPool:
+    """인스턴스마다 따로 녹화 파일을 만들어 기록 (directory/<인스턴스>.ldrec)"""
+
+    def __init__(self, directory, **recorder_options):
+        self.directory = directory
+        self.recorder_options = recorder_options
+        self._recorders = {}
+        self._lock = threading.Lock()
+
+    def recorder(self, instance):
+        with self._lock:
+            recorder = self._recorders.get(instance)
+            if recorder is None:
+                path = os.path.join(self.directory, f"{_safe_filename(instance)}.ldrec")
+                recorder = FrameRecorder(path, **self.recorder_options)
+                self._recorders[instance] = recorder
+            return recorder
+
+    def record(self, instance, frame, result=None, templates=None):
+        try:
+            return self.recorder(instance).record(frame, result_metadata(result, templates),
+                                                  templates=templates)
+        except (OSError, ValueError) as e:
+            print(f"프레임 녹화 중 오류 발생 ({instance}): {str(e)}")
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {instance: {'recorded': recorder.recorded, 'dropped': recorder.dropped}
+                    for instance, recorder in self._recorders.items()}
+
+    def close(self):
+        with self._lock:
+            recorders = list(self._recorders.values())
+            self._recorders.clear()
+        for recorder in recorders:
+            recorder.close()
+
+
+def replay_recording(path, templates=None, scanner=None, **scanner_options):
+    """녹화 파일의 프레임을 최대 속도로 ImageScanner에 다시 넣고 기록된 결과와 비교
+
+    templates를 주지 않으면 녹화 당시 검사한 템플릿 목록(계획 파일)을 사용한다.
+    녹화에 검사 계획이 없는 프레임이 있으면 빈 목록으로 통과시키지 않고 ValueError를 낸다.
+    """
+    reader = RecordingReader(path)
+    entries = reader.entries()
+    plans = reader.plans
+    reader.close()
+    scanner = scanner or ImageScanner(**scanner_options)
+
+    mismatches = []
+    hits = 0
+    start = time.perf_counter()
+    for seq, timestamp, frame, metadata in entries:
+        plan = metadata.get('plan')
+        recorded_specs = plans[plan] if plan is not None and 0 <= plan < len(plans) else None
+        specs = templates if templates is not None else recorded_specs
+        if specs is None:
+            raise ValueError(f"녹화 {seq}번 프레임의 검사 계획이 없습니다: {path}")
+        instance = metadata.get('instance') or os.path.basename(path)
+        result = scanner.scan_frame(frame, specs, instance=instance)
+        hits += len(result.hits)
+        if 'hits' in metadata:
+            recorded = sorted(hit['path'] if 'path' in hit else recorded_specs[hit['template']].path
+                              for hit in metadata['hits'])
+            replayed = sorted(hit.spec.path for hit in result.hits)
+            if recorded != replayed:
+                mismatches.append({'seq': seq, 'timestamp': timestamp,
+                                   'recorded': recorded, 'replayed': replayed})
+    elapsed = time.perf_counter() - start
+    return {
+        'frames': len(entries),
+        'hits': hits,
+        'seconds': elapsed,
+        'fps': len(entries) / elapsed if elapsed else 0.0,
+        'mismatches': mismatches,
+    }
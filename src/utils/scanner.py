@@ -1,86 +1,701 @@
-import pyautogui
 import cv2
 import numpy as np
-import win32gui
-import win32ui
-import win32con
-import win32process
-from ctypes import windll
 import os
+import queue
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
 
-class ImageScanner:
-    def __init__(self):
-        self.hwnd = None
+from src.utils.adb import AdbSessionPool, device_address_for_title
+from src.utils.capture import PrintWindowBackend
+from src.utils.clicks import ClickDispatcher
+from src.utils.fftmatch import FFTMatcher
+from src.utils.frame import Frame, FrameBuffers
+from src.utils.prefilter import TemplatePrefilter
+from src.utils.metrics import (get_stage_metrics, STAGE_CAPTURE, STAGE_CONVERT, STAGE_MATCH,
+                               STAGE_VERIFY, STAGE_WINDOW_LOOKUP)
+from src.utils.windows import get_window_registry
 
-    def capture_window(self, hwnd):
-        # 창 크기 가져오기
-        left, top, right, bot = win32gui.GetWindowRect(hwnd)
-        width = right - left
-        height = bot - top
 
-        # 창 DC 가져오기
-        hwndDC = win32gui.GetWindowDC(hwnd)
-        mfcDC = win32ui.CreateDCFromHandle(hwndDC)
-        saveDC = mfcDC.CreateCompatibleDC()
+class CachedTemplate:
+    """한 번 로드해서 전처리까지 끝낸 템플릿 이미지"""
 
-        # 비트맵 생성
-        saveBitMap = win32ui.CreateBitmap()
-        saveBitMap.CreateCompatibleBitmap(mfcDC, width, height)
-        saveDC.SelectObject(saveBitMap)
+    def __init__(self, path, mtime, size, bgr):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.bgr = bgr
+        self.gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        self._scaled = {}
+        self._variants = {}
 
-        # 창 내용 복사
-        result = windll.user32.PrintWindow(hwnd, saveDC.GetSafeHdc(), 3)
+    @property
+    def shape(self):
+        return self.gray.shape
 
-        # 이미지를 numpy 배열로 변환
-        bmpinfo = saveBitMap.GetInfo()
-        bmpstr = saveBitMap.GetBitmapBits(True)
-        img = np.frombuffer(bmpstr, dtype='uint8')
-        img.shape = (height, width, 4)
+    def scaled_gray(self, scale):
+        """축소된 그레이스케일 템플릿 (배율별로 한 번만 만든다)"""
+        scaled = self._scaled.get(scale)
+        if scaled is None:
+            scaled = cv2.resize(self.gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            self._scaled[scale] = scaled
+        return scaled
 
-        # 정리
-        win32gui.DeleteObject(saveBitMap.GetHandle())
-        saveDC.DeleteDC()
-        mfcDC.DeleteDC()
-        win32gui.ReleaseDC(hwnd, hwndDC)
+    def scaled(self, scale):
+        """다른 해상도의 인스턴스용으로 크기를 바꾼 템플릿 (배율별로 한 번만 만든다)"""
+        if scale == 1.0:
+            return self
+        variant = self._variants.get(scale)
+        if variant is None:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            bgr = cv2.resize(self.bgr, None, fx=scale, fy=scale, interpolation=interpolation)
+            variant = CachedTemplate(self.path, self.mtime, self.size, bgr)
+            self._variants[scale] = variant
+        return variant
 
-        return img if result else None
 
-    def find_window_by_pid(self, pid):
-        def callback(hwnd, hwnds):
-            if win32gui.IsWindowVisible(hwnd):
-                _, found_pid = win32process.GetWindowThreadProcessId(hwnd)
-                window_title = win32gui.GetWindowText(hwnd)
-                print(f"Found window - PID: {found_pid}, Title: '{window_title}', HWND: {hwnd}")
-                if found_pid == pid:
-                    hwnds.append(hwnd)
-            return True
+class TemplateCache:
+    """파일 경로별 템플릿 캐시 (mtime/크기가 바뀔 때만 다시 로드, LRU 제거)"""
 
-        hwnds = []
-        win32gui.EnumWindows(callback, hwnds)
-        return hwnds[0] if hwnds else None
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
-    def find_ldplayer_windows(self):
-        def callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                title = win32gui.GetWindowText(hwnd)
-                if title.startswith('LDPlayer-'):
-                    windows.append((hwnd, title))
-            return True
+    def get(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.mtime == st.st_mtime and entry.size == st.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # 디스크 읽기는 잠금 밖에서 처리
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            return None
+        if len(image.shape) == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        entry = CachedTemplate(path, st.st_mtime, st.st_size, image)
+
+        with self._lock:
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+ACTION_TAP = 'tap'
+ACTION_KILL = 'kill'
+ACTION_IGNORE = 'ignore'
+# 매칭되면 그 인스턴스의 이번 검사를 끝내는 동작
+TERMINAL_ACTIONS = (ACTION_KILL,)
+
+
+class TemplateSpec:
+    """검사할 템플릿 한 개와 매칭 시 수행할 동작"""
+
+    def __init__(self, path, action=ACTION_TAP, confidence=0.8, roi=None, cooldown=None, priority=0):
+        self.path = path
+        self.action = action
+        self.confidence = confidence
+        # 검색 영역 (x, y, w, h), None이면 전체 프레임
+        self.roi = tuple(roi) if roi else None
+        # 같은 인스턴스에서 다시 동작하기까지 기다릴 시간 (초), None이면 탭 대기열의 기본값
+        self.cooldown = cooldown
+        # 값이 클수록 먼저 검사하고 먼저 동작
+        self.priority = priority
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def __repr__(self):
+        return f"TemplateSpec({self.name!r}, action={self.action!r})"
+
+
+class MatchHit:
+    """scan_frame에서 찾은 템플릿 한 개의 위치와 점수"""
+
+    def __init__(self, spec, template, top_left, score):
+        self.spec = spec
+        self.template = template
+        self.top_left = top_left
+        self.score = score
+        # 화면이 바뀌지 않아 직전 프레임의 결과를 그대로 쓴 매칭인지
+        self.reused = False
+
+    @property
+    def center(self):
+        return (self.top_left[0] + self.template.shape[1] // 2,
+                self.top_left[1] + self.template.shape[0] // 2)
+
+    @property
+    def action(self):
+        return self.spec.action
+
+    def __repr__(self):
+        return f"MatchHit({self.spec.name!r}, center={self.center}, score={self.score:.3f})"
+
+
+class ScanResult:
+    """프레임 한 장에 대한 모든 템플릿 검사 결과"""
+
+    def __init__(self, frame, instance=None):
+        self.frame = frame
+        self.instance = instance
+        self.hits = []
+        self.scores = {}
+        self.missing = []
+        # 프레임 변화 감지 결과: 'full'(전체 검사), 'partial'(일부 템플릿만), 'skipped'(검사 생략)
+        self.scan_kind = 'full'
+        self.reused = 0
+        # 인스턴스 해상도에 맞춰 사용한 템플릿 배율
+        self.scale = 1.0
+        # 이번 검사에서 건너뛴 템플릿 (드물게 매칭되어 주기가 늦춰졌거나, 종료 동작 뒤라서)
+        self.deferred = []
+        self.stopped_early = False
+
+    def by_action(self, action):
+        return [hit for hit in self.hits if hit.action == action]
+
+    @property
+    def taps(self):
+        return self.by_action(ACTION_TAP)
+
+    @property
+    def kills(self):
+        return self.by_action(ACTION_KILL)
+
+
+def clip_region(region, frame_shape):
+    """(x, y, w, h) 영역을 프레임 안으로 자른다"""
+    height, width = frame_shape[:2]
+    x, y, w, h = region
+    x0, y0 = max(0, int(x)), max(0, int(y))
+    x1, y1 = min(width, int(x + w)), min(height, int(y + h))
+    return x0, y0, max(0, x1 - x0), max(0, y1 - y0)
+
+
+class RoiTracker:
+    """템플릿별 마지막 매칭 위치와 학습된 검색 영역, 단계별 적중률 관리
+
+    검색 단계는 last_hit(마지막 위치 주변) → roi(선언/학습된 영역) → full(전체 프레임)
+    """
+
+    TIERS = ('last_hit', 'roi', 'full')
+
+    def __init__(self, margin=24, learn_min_hits=0, full_scan_every=10):
+        self.margin = margin
+        # 0이면 영역 학습 비활성화
+        self.learn_min_hits = learn_min_hits
+        # 학습된 영역에서 연속으로 놓친 경우 몇 번마다 전체 프레임을 다시 검사할지
+        self.full_scan_every = full_scan_every
+        self._last_hits = {}
+        self._learned = {}
+        self._learned_misses = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def last_hit_region(self, instance, path, template_shape):
+        with self._lock:
+            top_left = self._last_hits.get((instance, path))
+        if top_left is None:
+            return None
+        return (top_left[0] - self.margin, top_left[1] - self.margin,
+                template_shape[1] + self.margin * 2, template_shape[0] + self.margin * 2)
+
+    def search_region(self, spec):
+        """선언된 ROI, 없으면 충분히 학습된 영역을 반환 (둘 다 없으면 None)"""
+        if spec.roi:
+            return spec.roi
+        if not self.learn_min_hits:
+            return None
+        with self._lock:
+            learned = self._learned.get(spec.path)
+            if learned is None or learned[4] < self.learn_min_hits:
+                return None
+            misses = self._learned_misses.get(spec.path, 0)
+            # 가끔은 전체 프레임을 검사해서 영역 밖으로 이동한 버튼도 찾는다
+            if self.full_scan_every and misses and misses % self.full_scan_every == 0:
+                return None
+            x0, y0, x1, y1, _ = learned
+        return (x0 - self.margin, y0 - self.margin,
+                x1 - x0 + self.margin * 2, y1 - y0 + self.margin * 2)
+
+    def record(self, tier, path, hit):
+        with self._lock:
+            stats = self._stats.setdefault(path, {t: [0, 0] for t in self.TIERS})
+            stats[tier][0] += 1
+            if hit:
+                stats[tier][1] += 1
+            if path in self._learned:
+                if hit:
+                    self._learned_misses[path] = 0
+                elif tier != 'last_hit':
+                    # 주기적인 전체 검사에서 놓친 경우도 세어야 다음 검사가 다시 영역으로 돌아간다
+                    self._learned_misses[path] = self._learned_misses.get(path, 0) + 1
+
+    def remember(self, instance, path, top_left, template_shape):
+        x, y = top_left
+        x1, y1 = x + template_shape[1], y + template_shape[0]
+        with self._lock:
+            self._last_hits[(instance, path)] = top_left
+            learned = self._learned.get(path)
+            if learned is None:
+                self._learned[path] = (x, y, x1, y1, 1)
+            else:
+                self._learned[path] = (min(learned[0], x), min(learned[1], y),
+                                       max(learned[2], x1), max(learned[3], y1), learned[4] + 1)
+
+    def forget(self, instance=None):
+        with self._lock:
+            if instance is None:
+                self._last_hits.clear()
+            else:
+                for key in [k for k in self._last_hits if k[0] == instance]:
+                    del self._last_hits[key]
+
+    def learned_rois(self):
+        """지금까지 매칭된 위치를 모두 포함하는 템플릿별 영역 (config에 선언할 때 참고용)"""
+        with self._lock:
+            return {path: (x0, y0, x1 - x0, y1 - y0)
+                    for path, (x0, y0, x1, y1, _) in self._learned.items()}
+
+    def stats(self):
+        with self._lock:
+            report = {}
+            for path, stats in self._stats.items():
+                report[os.path.basename(path)] = {
+                    tier: {
+                        'attempts': attempts,
+                        'hits': hits,
+                        'hit_rate': hits / attempts if attempts else 0.0,
+                    }
+                    for tier, (attempts, hits) in stats.items()
+                }
+            return report
+
+
+class FrameChangeDetector:
+    """인스턴스별 직전 프레임의 블록 평균값을 보관해서 바뀐 블록을 찾는다"""
+
+    def __init__(self, block_size=32, threshold=1.0):
+        self.block_size = block_size
+        # 블록 평균 밝기가 이 값보다 많이 바뀌면 변경된 것으로 본다
+        self.threshold = threshold
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+    def signature(self, frame):
+        """프레임(Frame 또는 그레이스케일 배열)의 블록 평균값과 크기"""
+        frame = Frame.wrap(frame)
+        return frame.block_means(self.block_size), frame.shape
+
+    def update(self, instance, frame):
+        """바뀐 블록 마스크를 반환 (이전 프레임이 없거나 크기가 다르면 None)"""
+        signature, shape = self.signature(frame)
+        with self._lock:
+            previous = self._signatures.get(instance)
+            if previous is not None and previous[0].shape == signature.shape:
+                # 블록 평균은 프레임 버퍼에 있으므로 인스턴스별 배열에 옮겨 담는다
+                mask = np.abs(signature - previous[0]) > self.threshold
+                np.copyto(previous[0], signature)
+                changed = previous[1] == shape
+                self._signatures[instance] = (previous[0], shape)
+                return mask if changed else None
+            self._signatures[instance] = (signature.copy(), shape)
+        return None
+
+    def region_changed(self, mask, region, frame_shape):
+        """(x, y, w, h) 영역에 바뀐 블록이 하나라도 있는지 확인"""
+        x, y, w, h = clip_region(region, frame_shape)
+        if w == 0 or h == 0:
+            return False
+        # 블록 수는 프레임 크기를 block_size로 나눈 값이므로 좌표도 같은 비율로 변환
+        scale_x = mask.shape[1] / frame_shape[1]
+        scale_y = mask.shape[0] / frame_shape[0]
+        bx0, by0 = int(x * scale_x), int(y * scale_y)
+        bx1 = min(mask.shape[1] - 1, int((x + w - 1) * scale_x))
+        by1 = min(mask.shape[0] - 1, int((y + h - 1) * scale_y))
+        return bool(mask[by0:by1 + 1, bx0:bx1 + 1].any())
+
+    def forget(self, instance=None):
+        with self._lock:
+            if instance is None:
+                self._signatures.clear()
+            else:
+                self._signatures.pop(instance, None)
+
+
+# 설정에 template_scales가 없을 때 시험할 배율
+DEFAULT_TEMPLATE_SCALES = (0.5, 0.75, 1.0, 1.25, 1.5)
+
+
+class _InstanceScale:
+    def __init__(self, shape, scale):
+        self.shape = shape
+        self.scale = scale
+        self.score = None
+        self.calibrated = False
+        self.frames = 0
+        self.attempts = 0  # 실패한 보정 횟수
+        self.next_retry = 0  # 다음 보정까지 남은 프레임 수
+
+
+class ScaleCalibrator:
+    """인스턴스별로 템플릿이 가장 잘 맞는 배율을 한 번 찾아서 기억
+
+    템플릿은 reference_size 크기의 캡처에서 잘라낸 것으로 보고, 프레임 크기 비율에
+    가까운 배율부터 시험한다. 어떤 템플릿도 min_score 이상 맞지 않으면(화면에
+    아무것도 없으면) 추정 배율을 쓰다가 retry_every 프레임 뒤에 다시 시도하고,
+    실패할 때마다 간격을 두 배로 늘린다. max_attempts번 실패하면 추정 배율로 굳히고
+    프레임 크기(창 크기)가 바뀔 때까지 다시 보정하지 않는다.
+    프레임 크기가 바뀌면 처음부터 다시 보정한다.
+    """
+
+    # 이 점수 이상이면 나머지 배율은 시험하지 않는다
+    EARLY_ACCEPT_SCORE = 0.95
+
+    def __init__(self, scales, reference_size=(994, 578), min_score=0.7, retry_every=10,
+                 max_attempts=5):
+        self.scales = sorted(set(float(scale) for scale in scales))
+        self.reference_size = reference_size
+        self.min_score = min_score
+        self.retry_every = retry_every
+        self.max_attempts = max_attempts
+        self._states = {}
+        self._lock = threading.Lock()
+        self.calibrations = 0
+        self.failures = 0
+
+    def guess(self, frame_shape):
+        """프레임 너비/높이 비율로 추정한 배율"""
+        ref_w, ref_h = self.reference_size
+        return min(frame_shape[1] / ref_w, frame_shape[0] / ref_h)
+
+    def candidates(self, frame_shape):
+        guess = self.guess(frame_shape)
+        return sorted(self.scales, key=lambda scale: abs(scale - guess))
+
+    def scale_for(self, instance, frame_gray, templates):
+        """(배율, 배율이 바뀌었는지) 반환, 필요할 때만 보정 매칭을 한다"""
+        shape = frame_gray.shape[:2]
+        with self._lock:
+            state = self._states.get(instance)
+            if state is not None and state.shape == shape:
+                if state.calibrated or state.attempts >= self.max_attempts:
+                    return state.scale, False
+                state.frames += 1
+                state.next_retry -= 1
+                if state.next_retry > 0:
+                    return state.scale, False
+            previous = state.scale if state is not None else None
+            if state is None or state.shape != shape:
+                state = _InstanceScale(shape, self.candidates(shape)[0])
+                self._states[instance] = state
+
+        scale, score = self.calibrate(frame_gray, templates)
+        with self._lock:
+            self.calibrations += 1
+            state.score = score
+            if score >= self.min_score:
+                state.scale = scale
+                state.calibrated = True
+            else:
+                self.failures += 1
+                state.attempts += 1
+                state.next_retry = self.retry_every * 2 ** (state.attempts - 1)
+        return state.scale, state.scale != previous
+
+    def calibrate(self, frame_gray, templates):
+        """모든 배율·템플릿 중 가장 높은 (배율, 점수)"""
+        best_scale, best_score = None, -1.0
+        for scale in self.candidates(frame_gray.shape):
+            for template in templates:
+                gray = template.scaled(scale).gray
+                if gray.shape[0] > frame_gray.shape[0] or gray.shape[1] > frame_gray.shape[1]:
+                    continue
+                result = cv2.matchTemplate(frame_gray, gray, cv2.TM_CCOEFF_NORMED)
+                _, score, _, _ = cv2.minMaxLoc(result)
+                if score > best_score:
+                    best_scale, best_score = scale, score
+            if best_score >= self.EARLY_ACCEPT_SCORE:
+                break
+        return best_scale, best_score
+
+    def forget(self, instance=None):
+        with self._lock:
+            if instance is None:
+                self._states.clear()
+            else:
+                self._states.pop(instance, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calibrations': self.calibrations,
+                'failures': self.failures,
+                'instances': {
+                    instance: {'scale': state.scale, 'score': state.score, 'calibrated': state.calibrated}
+                    for instance, state in self._states.items()
+                },
+            }
+
+
+class _TemplateStat:
+    def __init__(self, prior):
+        self.hit_rate = prior
+        self.cost = None
+        self.scans = 0
+        self.last_scanned = None
+
+
+class HitStatistics:
+    """인스턴스·템플릿별 매칭 확률과 매칭 비용의 지수 이동 평균(EWMA)
+
+    order()는 (우선순위, 매칭 확률 / 비용) 순서로 이번에 검사할 템플릿을 고른다.
+    warmup번 이상 검사했는데 매칭 확률이 demote_below보다 낮은 템플릿은
+    demoted_interval초에 한 번만 검사하고, 우선순위가 0보다 큰 템플릿은
+    늦춰지더라도 max_staleness초 넘게 건너뛰지 않는다.
+    종료 템플릿(TERMINAL_ACTIONS)은 드물게 나타나는 것이 정상이므로 늦추지 않고,
+    매칭 확률과 상관없이 가장 먼저 검사한다 (매칭되면 나머지 검사를 끝낼 수 있도록).
+    """
+
+    def __init__(self, alpha=0.2, prior=0.5, demote_below=0.02, warmup=20,
+                 demoted_interval=3.0, max_staleness=1.0):
+        self.alpha = alpha
+        self.prior = prior
+        self.demote_below = demote_below
+        self.warmup = warmup
+        self.demoted_interval = demoted_interval
+        self.max_staleness = max_staleness
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.deferred = 0
+
+    def _stat(self, instance, path):
+        # 호출하는 쪽에서 self._lock을 잡고 있어야 한다
+        stat = self._stats.get((instance, path))
+        if stat is None:
+            stat = self._stats[(instance, path)] = _TemplateStat(self.prior)
+        return stat
+
+    def _value(self, stat):
+        # 비용을 아직 모르면 먼저 한 번 재 보도록 가장 앞에 둔다
+        if stat.cost is None:
+            return float('inf')
+        return stat.hit_rate / max(stat.cost, 1e-6)
+
+    def is_demoted(self, stat):
+        return stat.scans >= self.warmup and stat.hit_rate < self.demote_below
+
+    def order(self, instance, specs, now=None):
+        """(이번에 검사할 spec 목록, 건너뛸 spec 목록) 반환"""
+        now = time.monotonic() if now is None else now
+        scheduled, deferred = [], []
+        with self._lock:
+            for index, spec in enumerate(specs):
+                stat = self._stat(instance, spec.path)
+                if (spec.action not in TERMINAL_ACTIONS and self.is_demoted(stat)
+                        and stat.last_scanned is not None):
+                    interval = self.max_staleness if spec.priority > 0 else self.demoted_interval
+                    if now - stat.last_scanned < interval:
+                        deferred.append(spec)
+                        continue
+                terminal = spec.action in TERMINAL_ACTIONS
+                value = 0.0 if terminal else -self._value(stat)
+                scheduled.append((not terminal, -spec.priority, value, index, spec))
+            self.deferred += len(deferred)
+        scheduled.sort(key=lambda item: item[:4])
+        return [item[4] for item in scheduled], deferred
+
+    def record(self, instance, path, hit, cost=None, now=None):
+        """실제로 매칭한 결과 반영 (직전 결과를 재사용한 검사는 넘기지 않는다)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stat = self._stat(instance, path)
+            stat.hit_rate += self.alpha * ((1.0 if hit else 0.0) - stat.hit_rate)
+            if cost is not None:
+                stat.cost = cost if stat.cost is None else stat.cost + self.alpha * (cost - stat.cost)
+            stat.scans += 1
+            stat.last_scanned = now
+
+    def forget(self, instance=None):
+        with self._lock:
+            if instance is None:
+                self._stats.clear()
+            else:
+                for key in [key for key in self._stats if key[0] == instance]:
+                    del self._stats[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'deferred': self.deferred,
+                'templates': {
+                    f"{instance}:{os.path.basename(path)}": {
+                        'hit_rate': stat.hit_rate,
+                        'cost_ms': (stat.cost or 0.0) * 1000,
+                        'scans': stat.scans,
+                        'demoted': self.is_demoted(stat),
+                    }
+                    for (instance, path), stat in self._stats.items()
+                },
+            }
+
+
+MATCH_FULL = 'full'
+MATCH_PYRAMID = 'pyramid'
+MATCH_FFT = 'fft'
+
+VERIFY_PIXEL = 'pixel'
+VERIFY_PATCH = 'patch'
+VERIFY_TEMPLATE = 'template'
+
+
+class ImageScanner:
+    # 축소 템플릿의 짧은 변이 이보다 작으면 피라미드 매칭을 쓰지 않는다
+    PYRAMID_MIN_TEMPLATE_SIDE = 12
+
+    def __init__(self, template_cache_size=64, roi_margin=24, roi_learn_min_hits=0,
+                 match_mode=MATCH_FULL, pyramid_scale=0.5, pyramid_candidates=3,
+                 pyramid_slack=0.2, window_registry=None, change_detection=True,
+                 change_block_size=32, change_threshold=1.0, capture_backend=None,
+                 metrics=None, verify_metric=VERIFY_PATCH, verify_patch_radius=3,
+                 template_scales=None, reference_size=(994, 578), calibration_min_score=0.7,
+                 calibration_retry=10, calibration_attempts=5, recorder=None, pipeline=None,
+                 tap_options=None, hit_stats=None, fft_cache_size=32, fft_min_batch=4, prefilter=None):
+        self.hwnd = None
+        # 클릭 전 색상 검증 방식 ('pixel', 'patch', 'template')
+        self.verify_metric = verify_metric
+        self.verify_patch_radius = verify_patch_radius
+        self.metrics = metrics or get_stage_metrics()
+        self.capture_backend = capture_backend or PrintWindowBackend()
+        self.window_registry = window_registry or get_window_registry()
+        self.template_cache = TemplateCache(template_cache_size)
+        self.roi_tracker = RoiTracker(roi_margin, roi_learn_min_hits)
+        # 'full': 원본 해상도 매칭, 'pyramid': 축소본에서 후보를 찾고 원본에서 재확인,
+        # 'fft': 전체 프레임 검색을 프레임 스펙트럼 하나로 묶어서 매칭 (ROI 검색은 'full'과 같음)
+        self.match_mode = match_mode
+        self.fft_matcher = FFTMatcher(fft_cache_size) if match_mode == MATCH_FFT else None
+        # 전체 프레임을 검색할 템플릿이 이보다 적으면 FFT 준비 비용이 더 커서 묶지 않는다
+        self.fft_min_batch = fft_min_batch
+        # 색상 히스토그램으로 검색 영역에 있을 수 없는 템플릿은 매칭하지 않는다
+        # (prefilter는 TemplatePrefilter 설정 dict, None이면 사용 안 함)
+        self.prefilter = TemplatePrefilter(**prefilter) if prefilter is not None else None
+        self.pyramid_scale = pyramid_scale
+        self.pyramid_candidates = pyramid_candidates
+        # 축소본 점수가 (신뢰도 - slack)보다 낮은 후보는 원본에서 재확인하지 않는다
+        self.pyramid_slack = pyramid_slack
+        self._adb_pool = None
+        self._click_dispatcher = None
+        # ClickDispatcher 설정 (cooldown, tolerance, max_queue, batch_window 등)
+        self.tap_options = dict(tap_options or {})
+        self._adb_lock = threading.Lock()
+        # 정적인 화면에서 매칭을 건너뛰기 위한 프레임 변화 감지
+        self.change_detection = change_detection
+        self.change_detector = FrameChangeDetector(change_block_size, change_threshold)
+        self._last_outcomes = {}  # instance → {경로: (템플릿, 점수, 좌상단)}
+        # 인스턴스별로 틱마다 다시 쓰는 변환/매칭 결과 버퍼
+        self._frame_buffers = {}
+        self._buffers_lock = threading.Lock()
+        self._change_lock = threading.Lock()
+        self.change_counters = {'frames': 0, 'skipped': 0, 'partial': 0, 'full': 0, 'reused': 0}
+        # 템플릿 검사 순서와 주기 조정 (hit_stats는 HitStatistics 설정 dict, None이면 사용 안 함)
+        self.hit_stats = HitStatistics(**hit_stats) if hit_stats is not None else None
+        # 캡처한 프레임과 매칭 결과를 남기는 녹화기 (RecorderPool, 없으면 녹화 안 함)
+        self.recorder = recorder
+        # 매칭을 별도 프로세스에서 하는 MatchPipeline (없으면 호출한 스레드에서 매칭)
+        self.pipeline = pipeline
+        # 다른 해상도의 인스턴스용 배율 보정 (template_scales가 없으면 원본 크기만 사용)
+        self.scale_calibrator = None
+        if template_scales:
+            self.scale_calibrator = ScaleCalibrator(template_scales, reference_size,
+                                                    calibration_min_score, calibration_retry,
+                                                    calibration_attempts)
+
+    def capture_window(self, hwnd, title=None, reuse_buffers=True):
+        """설정된 캡처 방식으로 창 화면을 가져와 Frame으로 반환 (실패 시 None)
+
+        reuse_buffers면 그레이스케일 등 파생 이미지를 인스턴스(title)별 버퍼에 다시 쓰므로,
+        같은 인스턴스의 다음 프레임을 캡처하기 전에 이번 프레임 처리를 끝내야 한다.
+        """
+        with self.metrics.timer(STAGE_CAPTURE, title):
+            screenshot = self.capture_backend.capture(hwnd, title)
+        if screenshot is None:
+            return None
+        return Frame(screenshot, self.frame_buffers(title) if reuse_buffers else None)
+
+    def frame_buffers(self, instance):
+        """인스턴스별 FrameBuffers (인스턴스를 모르면 None, 매번 새로 할당)"""
+        if instance is None:
+            return None
+        with self._buffers_lock:
+            buffers = self._frame_buffers.get(instance)
+            if buffers is None:
+                buffers = self._frame_buffers[instance] = FrameBuffers()
+            return buffers
+
+    def find_window_by_pid(self, pid):
+        return self.window_registry.hwnd_for_pid(pid)
 
-        windows = []
-        win32gui.EnumWindows(callback, windows)
-        return sorted(windows, key=lambda x: int(x[1].split('-')[1]))  # LDPlayer-n 숫자 순서로 정렬
+    def find_ldplayer_windows(self):
+        # LDPlayer-n 숫자 순서로 정렬된 (hwnd, 제목) 목록
+        return self.window_registry.ldplayer_windows()
 
     def find_center(self, image_path, window_title=None, confidence=0.8, suppress_logging=False):
+        matches = self.find_matches(image_path, window_title, confidence, suppress_logging)
+        if matches is None:
+            return None
+        return [(result.instance, result.hits[0].center) for result in matches]
+
+    def find_matches(self, image_path, window_title=None, confidence=0.8, suppress_logging=False):
+        """find_center와 같지만 매칭에 쓴 프레임까지 담은 ScanResult 목록을 반환"""
         # 파일명 추출
         filename = os.path.basename(image_path)
         if not suppress_logging:
             print(f"\n현재 검사 중인 이미지: {filename}")
 
         # LDPlayer 창 목록 가져오기
-        ldplayer_windows = self.find_ldplayer_windows()
+        with self.metrics.timer(STAGE_WINDOW_LOOKUP, window_title):
+            ldplayer_windows = self.find_ldplayer_windows()
         if not ldplayer_windows:
             if not suppress_logging:
                 print("실행 중인 LDPlayer 창을 찾을 수 없습니다.")
@@ -94,8 +709,8 @@ class ImageScanner:
                     print(f"지정된 창을 찾을 수 없습니다: {window_title}")
                 return None
 
-        # 템플릿 이미지 로드 및 전처리
-        template = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        # 템플릿 이미지 로드 및 전처리 (캐시 사용)
+        template = self.template_cache.get(image_path)
         if template is None:
             if not suppress_logging:
                 print(f"템플릿 이미지를 불러올 수 없습니다: {filename}")
@@ -106,65 +721,392 @@ class ImageScanner:
         
         results = []
         for hwnd, title in ldplayer_windows:
-            screenshot = self.capture_window(hwnd)
+            # 결과를 호출한 쪽이 들고 있으므로 인스턴스 버퍼를 쓰지 않는다
+            screenshot = self.capture_window(hwnd, title, reuse_buffers=False)
             if screenshot is None:
                 if not suppress_logging:
                     print(f"{title}: 스크린샷을 캡처할 수 없습니다.")
                 continue
             
-            # 이미지 크기 비교
-            if (template.shape[0] > screenshot.shape[0] or 
-                template.shape[1] > screenshot.shape[1]):
-                if not suppress_logging:
-                    print(f"{title}: 템플릿 이미지가 스크린샷보다 큽니다. 건너뜁니다.")
-                    print(f"템플릿 크기: {template.shape}, 스크린샷 크기: {screenshot.shape}")
-                continue
-            
-            # 이미지 채널 수 확인 및 처리
-            if len(template.shape) == 3 and template.shape[2] == 4:
-                template = cv2.cvtColor(template, cv2.COLOR_BGRA2BGR)
-            
-            if len(screenshot.shape) == 3 and screenshot.shape[2] == 4:
-                screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2BGR)
-            
-            # 그레이스케일로 변환
-            template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-            screenshot_gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
+            with self.metrics.timer(STAGE_CONVERT, title):
+                screenshot_gray = screenshot.gray
             
             if not suppress_logging:
                 print(f"{title} 스크린샷 크기: {screenshot_gray.shape}")
 
+            # 인스턴스 해상도에 맞춘 배율의 템플릿으로 크기 비교
+            scaled = template.scaled(self.instance_scale(title, screenshot_gray, [template]))
+            if (scaled.shape[0] > screenshot_gray.shape[0] or
+                scaled.shape[1] > screenshot_gray.shape[1]):
+                if not suppress_logging:
+                    print(f"{title}: 템플릿 이미지가 스크린샷보다 큽니다. 건너뜁니다.")
+                    print(f"템플릿 크기: {scaled.shape}, 스크린샷 크기: {screenshot.shape}")
+                continue
+
             # 템플릿 매칭
-            result = cv2.matchTemplate(screenshot_gray, template_gray, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            spec = TemplateSpec(image_path, confidence=confidence)
+            max_val, max_loc = self.locate(screenshot, scaled, spec, title)
             
             if not suppress_logging:
                 print(f"{title} - 매칭 신뢰도: {max_val:.3f}")
 
             if max_val >= confidence:
-                center_x = max_loc[0] + template_gray.shape[1] // 2
-                center_y = max_loc[1] + template_gray.shape[0] // 2
-                results.append((title, (center_x, center_y)))
+                # 클릭 전 색상 검증에 같은 프레임을 다시 쓰도록 결과에 담아둔다
+                result = ScanResult(screenshot, title)
+                result.scores[image_path] = max_val
+                result.hits.append(MatchHit(spec, scaled, max_loc, max_val))
+                results.append(result)
 
         return results
 
-    def click_image(self, image_path, window_title=None, confidence=0.8, color_threshold=30, adb_path=None):
-        import subprocess
-        import cv2
-        import numpy as np
-        import time
-        from datetime import datetime
-        
-        if not adb_path:
-            print("ADB 경로가 설정되지 않았습니다.")
+    def prepare_frame(self, screenshot, instance=None):
+        """캡처 이미지(배열 또는 Frame)를 (BGR, 그레이스케일) 쌍으로 변환"""
+        frame = Frame.wrap(screenshot)
+        with self.metrics.timer(STAGE_CONVERT, instance):
+            return frame.bgr, frame.gray
+
+    def match_template(self, frame_gray, template, region=None, min_score=None):
+        """그레이스케일 프레임(또는 그 일부 영역)에서 템플릿의 최고 점수와 위치를 반환
+
+        frame_gray에는 그레이스케일 배열이나 Frame을 넘긴다. Frame이면 축소본과
+        매칭 결과 버퍼를 프레임/인스턴스 단위로 재사용한다.
+        위치는 항상 전체 프레임 기준 좌표이며, 영역이 템플릿보다 작으면 (-1.0, None).
+        min_score를 주면 피라미드 모드에서 가망 없는 후보의 재확인을 건너뛴다.
+        """
+        frame = frame_gray if isinstance(frame_gray, Frame) else None
+        if frame is not None:
+            frame_gray = frame.gray
+        offset_x = offset_y = 0
+        whole = True
+        clipped = None
+        if region is not None:
+            offset_x, offset_y, w, h = clipped = clip_region(region, frame_gray.shape)
+            whole = (w, h) == (frame_gray.shape[1], frame_gray.shape[0])
+            if whole:
+                clipped = None
+            elif template.shape[0] > h or template.shape[1] > w:
+                return -1.0, None
+        if (template.shape[0] > frame_gray.shape[0] or
+                template.shape[1] > frame_gray.shape[1]):
+            return -1.0, None
+        if (self.prefilter is not None and frame is not None
+                and not self.prefilter.may_contain(frame, template, clipped)):
+            return -1.0, None
+        if not whole:
+            frame_gray = frame_gray[offset_y:offset_y + h, offset_x:offset_x + w]
+            # 축소본은 전체 프레임 기준이라 일부 영역에는 쓸 수 없다
+            frame = Frame(frame_gray, frame.buffers) if frame is not None else None
+
+        batched = None
+        if self.fft_matcher is not None and whole:
+            # scan_frame이 FFT로 미리 묶어서 계산한 결과
+            batched = self.fft_matcher.lookup(frame, template)
+        if batched is not None:
+            max_val, max_loc, _ = batched
+        elif self.match_mode == MATCH_PYRAMID and self._pyramid_worthwhile(frame_gray, template):
+            max_val, max_loc = self._match_pyramid(frame or frame_gray, template, min_score)
+        else:
+            result = self._match(frame, frame_gray, template.gray)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, (max_loc[0] + offset_x, max_loc[1] + offset_y)
+
+    def _match(self, frame, image, template_gray, key='full'):
+        """cv2.matchTemplate, frame에 버퍼가 있으면 결과를 그 버퍼에 쓴다"""
+        out = None
+        if frame is not None:
+            out = frame.match_buffer(key, (image.shape[0] - template_gray.shape[0] + 1,
+                                           image.shape[1] - template_gray.shape[1] + 1))
+        if out is None:
+            return cv2.matchTemplate(image, template_gray, cv2.TM_CCOEFF_NORMED)
+        return cv2.matchTemplate(image, template_gray, cv2.TM_CCOEFF_NORMED, result=out)
+
+    def _pyramid_worthwhile(self, frame_gray, template):
+        # 축소 템플릿이 너무 작거나 검색 범위가 템플릿과 거의 같으면 원본 매칭이 더 싸다
+        if min(template.shape) * self.pyramid_scale < self.PYRAMID_MIN_TEMPLATE_SIDE:
             return False
-        
-        results = self.find_center(image_path, window_title, confidence)
-        if not results:
+        search_w = frame_gray.shape[1] - template.shape[1] + 1
+        search_h = frame_gray.shape[0] - template.shape[0] + 1
+        refine_side = 2 * self._pyramid_pad() + 1
+        return search_w * search_h > 4 * self.pyramid_candidates * refine_side * refine_side
+
+    def _pyramid_pad(self):
+        # 축소 좌표를 원본으로 되돌릴 때 생기는 오차만큼 재확인 범위를 넓힌다
+        return int(np.ceil(1 / self.pyramid_scale)) + 2
+
+    def _match_pyramid(self, frame_gray, template, min_score=None):
+        """축소본에서 상위 후보 위치를 고르고 원본 해상도로 주변만 다시 매칭
+
+        Frame을 넘기면 축소본을 프레임당 한 번만 만들어 모든 템플릿이 같이 쓴다.
+        """
+        scale = self.pyramid_scale
+        template_small = template.scaled_gray(scale)
+        frame = Frame.wrap(frame_gray)
+        frame_gray = frame.gray
+        frame_small = frame.downscaled(scale)
+        if (template_small.shape[0] > frame_small.shape[0] or
+                template_small.shape[1] > frame_small.shape[1]):
+            result = self._match(frame, frame_gray, template.gray)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            return max_val, max_loc
+
+        # 후보를 지우며 고르므로 결과 버퍼를 그대로 고쳐 써도 된다
+        coarse = self._match(frame, frame_small, template_small, 'coarse')
+
+        # 이웃을 지워가며 상위 후보 추출 (같은 봉우리를 두 번 고르지 않도록)
+        suppress_w = max(1, template_small.shape[1] // 2)
+        suppress_h = max(1, template_small.shape[0] // 2)
+        pad = self._pyramid_pad()
+        coarse_floor = min_score - self.pyramid_slack if min_score is not None else -1.0
+        best_val, best_loc = -1.0, (0, 0)
+        for rank in range(self.pyramid_candidates):
+            _, coarse_val, _, (cx, cy) = cv2.minMaxLoc(coarse)
+            if coarse_val <= -1.0:
+                break
+            if coarse_val < coarse_floor:
+                # 가장 좋은 후보조차 가망이 없으면 축소본 점수를 그대로 돌려준다
+                if rank == 0:
+                    best_val = coarse_val
+                    best_loc = (int(round(cx / scale)), int(round(cy / scale)))
+                break
+            coarse[max(0, cy - suppress_h):cy + suppress_h + 1,
+                   max(0, cx - suppress_w):cx + suppress_w + 1] = -1.0
+
+            x = int(round(cx / scale)) - pad
+            y = int(round(cy / scale)) - pad
+            x0, y0, w, h = clip_region(
+                (x, y, template.shape[1] + pad * 2, template.shape[0] + pad * 2), frame_gray.shape)
+            window = frame_gray[y0:y0 + h, x0:x0 + w]
+            if template.shape[0] > window.shape[0] or template.shape[1] > window.shape[1]:
+                continue
+            result = self._match(frame, window, template.gray, 'refine')
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if max_val > best_val:
+                best_val, best_loc = max_val, (max_loc[0] + x0, max_loc[1] + y0)
+        return best_val, best_loc
+
+    def locate(self, frame_gray, template, spec, instance=None):
+        """마지막 매칭 위치 주변 → ROI/전체 프레임 순서로 템플릿을 찾는다"""
+        with self.metrics.timer(STAGE_MATCH, instance, spec.name):
+            return self._locate(frame_gray, template, spec, instance)
+
+    def _locate(self, frame_gray, template, spec, instance):
+        tracker = self.roi_tracker
+        if instance is not None:
+            region = tracker.last_hit_region(instance, spec.path, template.shape)
+            if region is not None:
+                score, top_left = self.match_template(frame_gray, template, region, spec.confidence)
+                hit = top_left is not None and score >= spec.confidence
+                tracker.record('last_hit', spec.path, hit)
+                if hit:
+                    tracker.remember(instance, spec.path, top_left, template.shape)
+                    return score, top_left
+
+        region = tracker.search_region(spec)
+        score, top_left = self.match_template(frame_gray, template, region, spec.confidence)
+        hit = top_left is not None and score >= spec.confidence
+        tracker.record('roi' if region is not None else 'full', spec.path, hit)
+        if hit:
+            tracker.remember(instance, spec.path, top_left, template.shape)
+        return score, top_left
+
+    def instance_scale(self, instance, frame_gray, templates):
+        """인스턴스에 맞는 템플릿 배율 (처음 보거나 창 크기가 바뀌면 보정)"""
+        if self.scale_calibrator is None or instance is None:
+            return 1.0
+        scale, changed = self.scale_calibrator.scale_for(instance, frame_gray, templates)
+        if changed:
+            # 이전 배율로 기억한 매칭 위치는 더 이상 맞지 않는다
+            self.roi_tracker.forget(instance)
+            print(f"{instance}: 템플릿 배율 {scale:.2f}")
+        return scale
+
+    def scale_stats(self):
+        return self.scale_calibrator.stats() if self.scale_calibrator else {}
+
+    def prefilter_stats(self):
+        """색상 히스토그램 사전 검사로 매칭을 건너뛴 횟수"""
+        return self.prefilter.stats() if self.prefilter else {}
+
+    def roi_stats(self):
+        """템플릿별 검색 단계(last_hit/roi/full) 적중률"""
+        return self.roi_tracker.stats()
+
+    def scan_frame(self, frame, templates, confidence=0.8, instance=None):
+        """캡처된 프레임 하나에 대해 모든 템플릿을 검사하고 결과를 한 번에 반환
+
+        templates에는 TemplateSpec 또는 이미지 경로를 넘긴다. 경로만 넘긴 경우
+        동작은 탭(ACTION_TAP), 신뢰도는 confidence 인자를 사용한다.
+        """
+        # 배열을 넘겨도 인스턴스 버퍼를 써서 틱마다 새로 할당하지 않는다
+        frame = Frame.wrap(frame, self.frame_buffers(instance))
+        with self.metrics.timer(STAGE_CONVERT, instance):
+            frame_gray = frame.gray
+        result = ScanResult(frame, instance)
+
+        # 직전 프레임과 비교해서 바뀐 블록 확인 (인스턴스를 모르면 항상 전체 검사)
+        changed = None
+        previous = {}
+        if self.change_detection and instance is not None:
+            changed = self.change_detector.update(instance, frame)
+            with self._change_lock:
+                previous = self._last_outcomes.get(instance, {})
+        outcomes = {}
+
+        specs = [spec if isinstance(spec, TemplateSpec) else TemplateSpec(spec, confidence=confidence)
+                 for spec in templates]
+        if self.hit_stats is not None and instance is not None:
+            # 매칭 확률이 높고 싼 템플릿부터, 드물게 매칭되는 템플릿은 가끔만 검사
+            specs, result.deferred = self.hit_stats.order(instance, specs)
+        else:
+            # 종료 템플릿을 먼저 검사해야 매칭됐을 때 나머지를 건너뛸 수 있다
+            specs.sort(key=lambda spec: spec.action not in TERMINAL_ACTIONS)
+        loaded = [(spec, self.template_cache.get(spec.path)) for spec in specs]
+        scale = 1.0
+        if self.scale_calibrator is not None:
+            scale = self.instance_scale(instance, frame_gray,
+                                        [template for _, template in loaded if template is not None])
+
+        result.scale = scale
+
+        if self.fft_matcher is not None:
+            # 전체 프레임을 검색할 템플릿은 프레임 스펙트럼 하나로 묶어서 미리 매칭
+            batch = [template.scaled(scale) for spec, template in loaded
+                     if template is not None and self._searches_full_frame(
+                         spec, template.scaled(scale), previous.get(spec.path), changed,
+                         instance, frame_gray.shape)]
+            if self.prefilter is not None:
+                batch = [template for template in batch if self.prefilter.may_contain(frame, template)]
+            if len(batch) >= self.fft_min_batch:
+                self.fft_matcher.match_many(frame, batch)
+
+        for index, (spec, template) in enumerate(loaded):
+            if template is None:
+                result.missing.append(spec)
+                continue
+            template = template.scaled(scale)
+
+            reuse = previous.get(spec.path)
+            cost = None
+            reused = self._reusable(changed, spec, template, reuse, frame_gray.shape)
+            if reused:
+                # 검색 범위와 직전 매칭 위치가 모두 그대로면 이전 결과 재사용
+                _, score, top_left = reuse
+                result.reused += 1
+            else:
+                started = time.perf_counter()
+                score, top_left = self.locate(frame, template, spec, instance)
+                cost = time.perf_counter() - started
+                batched = self.fft_matcher.lookup(frame, template) if self.fft_matcher else None
+                if batched is not None:
+                    # 미리 묶어서 매칭한 템플릿은 여기서 걸린 시간이 거의 0이다
+                    cost = max(cost, batched[2])
+            outcomes[spec.path] = (template, score, top_left)
+
+            hit = top_left is not None and score >= spec.confidence
+            if self.hit_stats is not None and instance is not None and cost is not None:
+                self.hit_stats.record(instance, spec.path, hit, cost)
+            if top_left is None:
+                continue
+            result.scores[spec.path] = score
+            if hit:
+                match = MatchHit(spec, template, top_left, score)
+                match.reused = reused
+                result.hits.append(match)
+                if spec.action in TERMINAL_ACTIONS:
+                    # 종료할 인스턴스라 나머지 템플릿은 볼 필요가 없다
+                    # (검사하지 않은 템플릿은 직전 결과도 남기지 않아 다음에 다시 검사된다)
+                    result.deferred.extend(remaining for remaining, _ in loaded[index + 1:])
+                    result.stopped_early = True
+                    break
+
+        if changed is not None and result.reused:
+            result.scan_kind = 'skipped' if result.reused == len(outcomes) else 'partial'
+        if instance is not None and self.change_detection:
+            with self._change_lock:
+                self._last_outcomes[instance] = outcomes
+                self.change_counters['frames'] += 1
+                self.change_counters[result.scan_kind] += 1
+                self.change_counters['reused'] += result.reused
+
+        return result
+
+    def _reusable(self, changed, spec, template, outcome, frame_shape):
+        """직전 프레임의 결과를 이번 프레임에 그대로 쓸 수 있는지 확인"""
+        return (changed is not None and outcome is not None and outcome[0] is template
+                and not self._needs_rescan(changed, spec, outcome, frame_shape))
+
+    def _searches_full_frame(self, spec, template, outcome, changed, instance, frame_shape):
+        """_locate가 이번 프레임에서 전체 프레임을 검색하게 될 템플릿인지 확인
+
+        마지막 매칭 위치 주변을 먼저 보는 템플릿은 거기서 못 찾을 때만 전체 검색을 한다.
+        """
+        if self._reusable(changed, spec, template, outcome, frame_shape):
             return False
+        if instance is not None and self.roi_tracker.last_hit_region(
+                instance, spec.path, template.shape) is not None:
+            return False
+        return self.roi_tracker.search_region(spec) is None
+
+    def _needs_rescan(self, changed, spec, outcome, frame_shape):
+        """바뀐 블록이 템플릿의 검색 범위나 직전 매칭 위치와 겹치는지 확인"""
+        if not changed.any():
+            return False
+        template, _, top_left = outcome
+        if top_left is not None and self.change_detector.region_changed(
+                changed, (top_left[0], top_left[1], template.shape[1], template.shape[0]), frame_shape):
+            return True
+        region = self.roi_tracker.search_region(spec)
+        if region is None:
+            return True
+        return self.change_detector.region_changed(changed, region, frame_shape)
+
+    def change_stats(self):
+        """프레임 변화 감지로 건너뛴/부분 검사한 횟수"""
+        with self._change_lock:
+            return dict(self.change_counters)
+
+    def forget_instance(self, instance):
+        """종료된 인스턴스의 프레임/매칭 기록 삭제"""
+        self.change_detector.forget(instance)
+        self.roi_tracker.forget(instance)
+        if self.scale_calibrator is not None:
+            self.scale_calibrator.forget(instance)
+        if self.hit_stats is not None:
+            self.hit_stats.forget(instance)
+        if self.pipeline is not None:
+            self.pipeline.forget(instance)
+        with self._change_lock:
+            self._last_outcomes.pop(instance, None)
+        with self._buffers_lock:
+            self._frame_buffers.pop(instance, None)
+
+    def scan_window(self, hwnd, title, templates, confidence=0.8):
+        """창을 한 번만 캡처해서 scan_frame으로 모든 템플릿을 검사"""
+        frame = self.capture_window(hwnd, title)
+        if frame is None:
+            print(f"{title}: 스크린샷을 캡처할 수 없습니다.")
+            return None
+        if self.pipeline is not None and self.pipeline.fits(frame.raw):
+            specs = [spec if isinstance(spec, TemplateSpec) else TemplateSpec(spec, confidence=confidence)
+                     for spec in templates]
+            try:
+                result = self.pipeline.scan(title, frame.raw, specs, timeout=self.pipeline.timeout)
+            except (queue.Empty, FutureTimeoutError, RuntimeError) as e:
+                # 매칭 프로세스가 밀렸거나 죽은 경우 이번 프레임은 건너뛴다 (프로세스는 파이프라인이 다시 띄운다)
+                print(f"{title}: 매칭 결과를 받지 못했습니다: {str(e) or type(e).__name__}")
+                return None
+        else:
+            result = self.scan_frame(frame, templates, confidence, instance=title)
+        if self.recorder is not None:
+            self.recorder.record(title, frame.raw, result, templates)
+        return result
+
+    def to_device_coords(self, center_x, center_y):
+        """PrintWindow 좌표를 기기(ADB) 좌표로 변환"""
+        if self.capture_backend.device_coordinates:
+            # ADB 화면 캡처는 이미 기기 좌표
+            return center_x, center_y
 
-        success = False
-        
         # 스크린샷과 실제 해상도 차이
         SCREENSHOT_WIDTH = 994
         SCREENSHOT_HEIGHT = 578
@@ -174,97 +1116,132 @@ class ImageScanner:
         # 좌표 오프셋 계산
         offset_x = (SCREENSHOT_WIDTH - ACTUAL_WIDTH) // 2
         offset_y = (SCREENSHOT_HEIGHT - ACTUAL_HEIGHT) // 2
+        return center_x - offset_x, center_y - offset_y
+
+    def verify_match(self, frame_bgr, hit, color_threshold=30, instance=None):
+        """매칭된 프레임(BGR 배열 또는 Frame)의 해당 영역을 템플릿과 비교해서 (통과 여부, 차이값) 반환
+
+        차이값은 픽셀당 B/G/R 절대 차이 합의 평균이다. 한 픽셀만 비교하던 기존
+        color_threshold 기준을 그대로 쓸 수 있다.
+        verify_metric 'pixel'은 중심 픽셀 하나, 'patch'는 중심 주변
+        (2*verify_patch_radius+1)^2 영역, 'template'은 템플릿 전체 영역을 비교한다.
+        """
+        template = hit.template
+        with self.metrics.timer(STAGE_VERIFY, instance, hit.spec.name):
+            if isinstance(frame_bgr, Frame):
+                # 같은 프레임의 여러 탭 대상이 BGR 변환 한 번을 같이 쓴다
+                frame_bgr = frame_bgr.bgr
+            x, y = hit.top_left
+            height, width = template.shape
+            if self.verify_metric == VERIFY_TEMPLATE:
+                y0, y1, x0, x1 = 0, height, 0, width
+            else:
+                radius = 0 if self.verify_metric == VERIFY_PIXEL else self.verify_patch_radius
+                cy, cx = height // 2, width // 2
+                y0, y1 = max(0, cy - radius), min(height, cy + radius + 1)
+                x0, x1 = max(0, cx - radius), min(width, cx + radius + 1)
+
+            frame_patch = frame_bgr[y + y0:y + y1, x + x0:x + x1]
+            template_patch = template.bgr[y0:y1, x0:x1]
+            if frame_patch.shape != template_patch.shape:
+                return False, float('inf')
+            color_diff = sum(cv2.mean(cv2.absdiff(frame_patch, template_patch))[:3])
+            return color_diff <= color_threshold, color_diff
+
+    def tap_hit(self, result, hit, adb_path, color_threshold=30):
+        """scan_frame 결과의 탭 대상을 같은 프레임으로 색상 검증 후 클릭"""
+        title = result.instance
+        ok, color_diff = self.verify_match(result.frame, hit, color_threshold, title)
+        if not ok:
+            print(f"색상이 일치하지 않습니다. 차이값: {color_diff:.1f}")
+            return False
+        adjusted_x, adjusted_y = self.to_device_coords(*hit.center)
+        return self.send_tap(adb_path, title, adjusted_x, adjusted_y,
+                             key=hit.spec.path, cooldown=hit.spec.cooldown)
+
+    def adb_pool(self, adb_path):
+        """ADB 경로별 세션 풀 (경로가 바뀌면 기존 세션을 닫고 새로 만든다)"""
+        with self._adb_lock:
+            if self._adb_pool is None or self._adb_pool.adb_path != adb_path:
+                self._close_adb()
+                self._adb_pool = AdbSessionPool(adb_path)
+                self._click_dispatcher = ClickDispatcher(self._adb_pool, metrics=self.metrics,
+                                                         **self.tap_options)
+            return self._adb_pool
+
+    def click_dispatcher(self, adb_path):
+        """세션 풀 위에서 동작하는 기기별 탭 대기열"""
+        self.adb_pool(adb_path)
+        return self._click_dispatcher
+
+    def tap_stats(self):
+        with self._adb_lock:
+            return self._click_dispatcher.stats() if self._click_dispatcher else {}
+
+    def _close_adb(self):
+        # 호출하는 쪽에서 self._adb_lock을 잡고 있어야 한다
+        if self._click_dispatcher is not None:
+            self._click_dispatcher.close()
+            self._click_dispatcher = None
+        if self._adb_pool is not None:
+            self._adb_pool.close()
+            self._adb_pool = None
+
+    def close(self):
+        """유지 중인 ADB 세션, 캡처 자원, 녹화 파일 정리"""
+        self.capture_backend.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.pipeline is not None:
+            self.pipeline.close()
+        with self._adb_lock:
+            self._close_adb()
 
-        for title, (center_x, center_y) in results:
+    def send_tap(self, adb_path, title, x, y, key=None, cooldown=None):
+        """LDPlayer 창 제목으로 ADB 주소를 계산해서 기기별 탭 대기열에 넣는다
+
+        key(템플릿 경로)를 주면 cooldown초 안에 같은 위치로 반복되는 탭은 버린다.
+        반환값은 대기열 접수 여부이며, 실제 전송은 대기열 스레드에서 한다.
+        """
+        try:
+            device = device_address_for_title(title)
+        except Exception as e:
+            print(f"인덱스 추출 오류 ({title}): {str(e)}")
+            return False
+
+        print(f"클릭 시도 - 창: {title}, 주소: {device}")
+        return self.click_dispatcher(adb_path).submit(device, x, y, key=key, instance=title,
+                                                      cooldown=cooldown)
+
+    def click_image(self, image_path, window_title=None, confidence=0.8, color_threshold=30, adb_path=None):
+        if not adb_path:
+            print("ADB 경로가 설정되지 않았습니다.")
+            return False
+        
+        # 매칭에 쓴 프레임으로 바로 색상 검증 (다시 캡처하지 않음)
+        results = self.find_matches(image_path, window_title, confidence)
+        if not results:
+            return False
+
+        success = False
+
+        for result in results:
             try:
-                if window_title and title != window_title:
-                    continue
-                
-                try:
-                    instance_num = int(title.split('-')[1])
-                    adb_port = 5555 + (instance_num * 2)
-                    device_address = f"127.0.0.1:{adb_port}"
-                    
-                    # 좌표 보정
-                    adjusted_x = center_x - offset_x
-                    adjusted_y = center_y - offset_y
-                    
-                    print(f"처리 중 - 창: {title}, 인스턴스: {instance_num}, 포트: {adb_port}")
-                    print(f"원본 좌표: ({center_x}, {center_y})")
-                    print(f"보정된 좌표: ({adjusted_x}, {adjusted_y})")
-                except Exception as e:
-                    print(f"인덱스 추출 오류 ({title}): {str(e)}")
-                    continue
-                
-                # 원본 이미지의 색상 가져오기
-                template = cv2.imread(image_path)
-                if template is None:
-                    continue
-                
-                template = cv2.cvtColor(template, cv2.COLOR_BGR2RGB)
-                template_center = template[template.shape[0]//2, template.shape[1]//2]
-                
-                hwnd = win32gui.FindWindow(None, title)
-                if not hwnd:
-                    continue
-                
-                screenshot = self.capture_window(hwnd)
-                if screenshot is None:
+                if window_title and result.instance != window_title:
                     continue
                 
-                screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2RGB)
-                click_color = screenshot[center_y, center_x]
-                color_diff = np.sum(np.abs(template_center - click_color[:3]))
+                hit = result.hits[0]
+                center_x, center_y = hit.center
+                adjusted_x, adjusted_y = self.to_device_coords(center_x, center_y)
+                print(f"처리 중 - 창: {result.instance}")
+                print(f"원본 좌표: ({center_x}, {center_y})")
+                print(f"보정된 좌표: ({adjusted_x}, {adjusted_y})")
                 
-                if color_diff <= color_threshold:
-                    try:
-                        print(f"클릭 시도 - 창: {title}, 주소: {device_address}")
-                        
-                        # ADB 연결 시도
-                        try:
-                            connect_result = subprocess.run(
-                                [adb_path, "connect", device_address], 
-                                capture_output=True, 
-                                text=True
-                            )
-                            if connect_result.returncode != 0:
-                                print(f"ADB 연결 명령 실패: {connect_result.stderr}")
-                                if connect_result.stdout:
-                                    print(f"출력: {connect_result.stdout}")
-                        except Exception as e:
-                            print(f"ADB 연결 중 오류 발생: {str(e)}")
-                            continue
-                        
-                        devices_result = subprocess.run(
-                            [adb_path, "devices"], 
-                            capture_output=True, 
-                            text=True
-                        )
-                        
-                        if device_address in devices_result.stdout:
-                            cmd = f"{adb_path} -s {device_address} shell input tap {adjusted_x} {adjusted_y}"
-                            result = subprocess.run(
-                                cmd,
-                                shell=True,
-                                capture_output=True,
-                                text=True,
-                            )
-                            
-                            if result.returncode == 0:
-                                print(f"이미지 클릭 성공: {title} ({adjusted_x}, {adjusted_y})")
-                                success = True
-                            else:
-                                print(f"클릭 명령 실패: {result.stderr}")
-                        else:
-                            print(f"ADB 연결 실패: {device_address}")
-                            
-                    except Exception as e:
-                        print(f"클릭 처 오류 발생: {str(e)}")
-                else:
-                    print(f"색상이 일치하지 않습니다. 차이값: {color_diff}")
+                if self.tap_hit(result, hit, adb_path, color_threshold):
+                    success = True
                     
             except Exception as e:
                 print(f"처리 중 오류 발생: {str(e)}")
                 continue
                 
-        return success
\ No newline at end of file
+        return success
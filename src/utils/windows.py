@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import namedtuple
+
+try:
+    import win32gui
+    import win32process
+except ImportError:  # Windows가 아닌 환경 (테스트/벤치마크용)
+    win32gui = None
+    win32process = None
+
+LDPLAYER_PREFIX = 'LDPlayer-'
+
+WindowInfo = namedtuple('WindowInfo', ['hwnd', 'pid', 'title'])
+
+
+def is_ldplayer_title(title):
+    return bool(title) and title.startswith(LDPLAYER_PREFIX)
+
+
+def ldplayer_index(title):
+    """'LDPlayer-n' 제목에서 n 추출 (형식이 다르면 None)"""
+    try:
+        return int(title.split('-')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class Win32WindowBackend:
+    """EnumWindows로 보이는 창 목록을 가져오는 기본 OS 계층"""
+
+    def enum_windows(self):
+        def callback(hwnd, windows):
+            if win32gui.IsWindowVisible(hwnd):
+                _, pid = win32process.GetWindowThreadProcessId(hwnd)
+                windows.append(WindowInfo(hwnd, pid, win32gui.GetWindowText(hwnd)))
+            return True
+
+        windows = []
+        win32gui.EnumWindows(callback, windows)
+        return windows
+
+    def get_rect(self, hwnd):
+        return win32gui.GetWindowRect(hwnd)
+
+
+class FakeWindowBackend:
+    """고정된 창 목록을 돌려주는 OS 계층 (Windows 밖에서 테스트할 때 사용)"""
+
+    def __init__(self, windows=(), rects=None):
+        self.set_windows(windows)
+        self.rects = dict(rects or {})
+        self.enum_calls = 0
+
+    def set_windows(self, windows):
+        self.windows = [WindowInfo(*window) for window in windows]
+
+    def enum_windows(self):
+        self.enum_calls += 1
+        return list(self.windows)
+
+    def get_rect(self, hwnd):
+        return self.rects.get(hwnd, (0, 0, 994, 578))
+
+
+def default_backend():
+    return Win32WindowBackend() if win32gui is not None else FakeWindowBackend()
+
+
+class WindowSnapshot:
+    """한 번의 창 목록 조회 결과 (pid → hwnd → 제목 인덱스)"""
+
+    def __init__(self, windows, timestamp):
+        self.windows = windows
+        self.timestamp = timestamp
+        self.by_hwnd = {window.hwnd: window for window in windows}
+        self.by_pid = {}
+        self.by_title = {}
+        for window in windows:
+            self.by_pid.setdefault(window.pid, []).append(window)
+            self.by_title.setdefault(window.title, window)
+
+    def ldplayer_windows(self):
+        """(hwnd, 제목) 목록을 LDPlayer-n 숫자 순서로 정렬해서 반환"""
+        windows = [(window.hwnd, window.title) for window in self.windows
+                   if is_ldplayer_title(window.title) and ldplayer_index(window.title) is not None]
+        return sorted(windows, key=lambda x: ldplayer_index(x[1]))
+
+    def ldplayer_window_for_pid(self, pid):
+        for window in self.by_pid.get(pid, ()):
+            if is_ldplayer_title(window.title):
+                return window
+        return None
+
+    def titles_for_pid(self, pid):
+        return [window.title for window in self.by_pid.get(pid, ()) if window.title]
+
+
+class WindowRegistry:
+    """ProcessManager, ImageScanner, GUI가 함께 쓰는 창 목록 캐시
+
+    창 목록은 한 번의 EnumWindows로 만들고 ttl초 동안 재사용한다.
+    프로세스 종료처럼 창 목록이 바뀌는 이벤트가 있으면 invalidate()로 비운다.
+    """
+
+    def __init__(self, backend=None, ttl=0.5):
+        self.backend = backend if backend is not None else default_backend()
+        self.ttl = ttl
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.sweeps = 0
+        self.cache_hits = 0
+
+    def snapshot(self, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is not None and now - self._snapshot.timestamp <= max_age:
+                self.cache_hits += 1
+                return self._snapshot
+            self._snapshot = WindowSnapshot(self.backend.enum_windows(), now)
+            self.sweeps += 1
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def ldplayer_windows(self):
+        return self.snapshot().ldplayer_windows()
+
+    def ldplayer_title(self, pid):
+        window = self.snapshot().ldplayer_window_for_pid(pid)
+        return window.title if window else None
+
+    def hwnd_for_pid(self, pid):
+        windows = self.snapshot().by_pid.get(pid)
+        return windows[0].hwnd if windows else None
+
+    def hwnd_for_title(self, title):
+        window = self.snapshot().by_title.get(title)
+        return window.hwnd if window else None
+
+    def get_rect(self, hwnd):
+        return self.backend.get_rect(hwnd)
+
+    def stats(self):
+        with self._lock:
+            return {'sweeps': self.sweeps, 'cache_hits': self.cache_hits}
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_window_registry():
+    """프로세스 전체에서 공유하는 기본 WindowRegistry"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = WindowRegistry()
+        return _default_registry
+
+
+def set_window_registry(registry):
+    """기본 WindowRegistry 교체 (가짜 창 목록으로 테스트할 때 사용)"""
+    global _default_registry
+    with _default_registry_lock:
+        _default_registry = registry
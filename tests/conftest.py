@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+FAKE_ADB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_adb.py')
+
+
+@pytest.fixture
+def fake_adb(tmp_path):
+    """가짜 adb를 실행하는 실행 파일 경로 (adb_path 대신 넘긴다)"""
+    if os.name == 'nt':
+        path = tmp_path / 'adb.cmd'
+        path.write_text(f'@"{sys.executable}" "{FAKE_ADB}" %*\n')
+    else:
+        path = tmp_path / 'adb'
+        path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_ADB}" "$@"\n')
+        path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def adb_log(tmp_path, monkeypatch):
+    """가짜 adb 셸이 받은 명령 목록을 읽는 함수"""
+    path = tmp_path / 'commands.log'
+    monkeypatch.setenv('FAKE_ADB_LOG', str(path))
+
+    def read():
+        return path.read_text(encoding='utf-8').splitlines() if path.exists() else []
+    return read
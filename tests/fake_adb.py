@@ -0,0 +1,94 @@
+"""테스트용 가짜 adb
+
+실제 adb와 같은 인자(connect / -s 주소 shell / -s 주소 exec-out ...)를 받아서
+셸 명령과 screencap 원시 출력을 흉내 낸다. 동작은 환경 변수로 바꾼다.
+
+- FAKE_ADB_LOG: 셸로 받은 명령을 한 줄씩 남길 파일
+- FAKE_ADB_WIDTH / FAKE_ADB_HEIGHT: screencap 크기 (기본 4x3)
+- FAKE_ADB_FORMAT: screencap 픽셀 형식 (기본 1 = RGBA_8888)
+- FAKE_ADB_HEADER: screencap 헤더 크기 12 또는 16 (기본 16)
+- FAKE_ADB_HANG: 설정하면 상시 연결(exec-out sh)의 screencap에 응답하지 않는다
+"""
+import os
+import struct
+import sys
+import time
+
+
+def _log(command):
+    path = os.environ.get('FAKE_ADB_LOG')
+    if path:
+        with open(path, 'a', encoding='utf-8') as log:
+            log.write(command + '\n')
+
+
+def screencap_bytes():
+    width = int(os.environ.get('FAKE_ADB_WIDTH', 4))
+    height = int(os.environ.get('FAKE_ADB_HEIGHT', 3))
+    pixel_format = int(os.environ.get('FAKE_ADB_FORMAT', 1))
+    header = struct.pack('<III', width, height, pixel_format)
+    if int(os.environ.get('FAKE_ADB_HEADER', 16)) == 16:
+        header += struct.pack('<I', 1)
+    # 픽셀 (x, y)의 바이트는 (x, y, 7, 255) 순서
+    pixels = bytearray()
+    for y in range(height):
+        for x in range(width):
+            pixels += bytes((x % 256, y % 256, 7, 255))
+    return header + bytes(pixels)
+
+
+def run_shell():
+    """`명령; echo 마커 $?` 형식의 줄을 받아 마커와 종료 코드를 돌려준다"""
+    for line in sys.stdin:
+        line = line.rstrip('\n')
+        if line == 'exit':
+            return
+        command, _, marker = line.partition('; echo ')
+        marker = marker.replace(' $?', '')
+        _log(command)
+        words = command.split()
+        status = 0
+        if words[:1] == ['die']:
+            sys.exit(1)
+        elif words[:1] == ['sleep']:
+            time.sleep(float(words[1]))
+        elif words[:1] == ['false']:
+            status = 1
+        elif words[:1] == ['echo']:
+            print(' '.join(words[1:]))
+        if marker:
+            print(f"{marker} {status}", flush=True)
+
+
+def run_stream():
+    """exec-out sh: 줄마다 screencap 원시 출력을 그대로 쓴다"""
+    out = sys.stdout.buffer
+    for line in sys.stdin:
+        if line.strip() != 'screencap':
+            continue
+        if os.environ.get('FAKE_ADB_HANG'):
+            time.sleep(60)
+        out.write(screencap_bytes())
+        out.flush()
+
+
+def main(argv):
+    if argv[:1] == ['connect']:
+        print(f"connected to {argv[1]}")
+        return 0
+    if argv[:1] == ['-s']:
+        argv = argv[2:]
+    if argv == ['shell']:
+        run_shell()
+    elif argv == ['exec-out', 'screencap']:
+        sys.stdout.buffer.write(screencap_bytes())
+    elif argv == ['exec-out', 'sh']:
+        run_stream()
+    else:
+        print(f"unknown command: {argv}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,63 @@
+import pytest
+
+from src.utils.adb import AdbResponseError, AdbSessionPool
+
+SERIAL = '127.0.0.1:5555'
+
+
+@pytest.fixture
+def pool(fake_adb):
+    pool = AdbSessionPool(fake_adb, timeout=2.0)
+    yield pool
+    pool.close()
+
+
+def test_marker_returns_exit_code(pool, adb_log):
+    assert pool.run(SERIAL, 'true') == 0
+    assert pool.run(SERIAL, 'false') == 1
+    # 마커 앞에 다른 출력이 있어도 마커 줄까지 읽는다
+    assert pool.run(SERIAL, 'echo hello') == 0
+    assert pool.tap(SERIAL, 10, 20)
+    assert adb_log() == ['true', 'false', 'echo hello', 'input tap 10 20']
+    assert pool.stats()['connects'] == 1
+
+
+def test_session_is_reused(pool):
+    for _ in range(3):
+        pool.run(SERIAL, 'true')
+    stats = pool.stats()
+    assert stats['connects'] == 1
+    assert stats['alive'] == 1
+
+
+def test_reconnects_when_session_died_before_write(pool, adb_log):
+    pool.run(SERIAL, 'true')
+    session = pool.session(SERIAL)
+    session._process.kill()
+    session._process.wait()
+
+    assert pool.run(SERIAL, 'input tap 1 2') == 0
+    assert pool.stats()['reconnects'] == 1
+    assert adb_log() == ['true', 'input tap 1 2']
+
+
+def test_does_not_resend_after_response_timeout(fake_adb, adb_log):
+    pool = AdbSessionPool(fake_adb, timeout=1.0)
+    try:
+        with pytest.raises(AdbResponseError):
+            pool.run(SERIAL, 'sleep 3')
+        assert adb_log() == ['sleep 3']
+        assert pool.stats()['alive'] == 0
+
+        # 다음 명령은 새 세션으로 보낸다
+        assert pool.run(SERIAL, 'true') == 0
+        assert pool.stats()['reconnects'] == 1
+    finally:
+        pool.close()
+
+
+def test_session_dying_after_write_is_not_resent(pool, adb_log):
+    with pytest.raises(AdbResponseError):
+        pool.run(SERIAL, 'die')
+    assert pool.tap(SERIAL, 5, 5)
+    assert adb_log() == ['die', 'input tap 5 5']
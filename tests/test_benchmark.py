@@ -0,0 +1,14 @@
+import pytest
+
+from src.utils.benchmark import compare_pyramid, extra_templates, reference_frames, reference_templates
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_pyramid_agrees_with_full_scan_on_reference_images(tmp_path, seed):
+    template_paths = reference_templates()
+    frames = reference_frames(template_paths)
+    crops = extra_templates(template_paths, 24, str(tmp_path), seed=seed)
+    report = compare_pyramid(template_paths + crops, frames, repeat=1)
+    assert report['checks'] == len(frames) * (len(template_paths) + len(crops))
+    # 매칭 기준(CONFIDENCE)을 두고 원본 매칭과 판정이 갈린 경우가 없어야 한다
+    assert report['mismatches'] == []
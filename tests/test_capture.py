@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.utils.capture import (SCREENCAP_BGRA_8888, AdbScreencapBackend,
+                               AdbScreencapStream)
+
+SERIAL = '127.0.0.1:5555'
+
+
+def expected_bgra(width, height):
+    """가짜 adb가 (x, y, 7, 255)로 보내는 RGBA 픽셀을 BGRA로 바꾼 값"""
+    frame = np.empty((height, width, 4), dtype=np.uint8)
+    frame[..., 0] = 7
+    frame[..., 1] = np.arange(height, dtype=np.uint8)[:, None]
+    frame[..., 2] = np.arange(width, dtype=np.uint8)[None, :]
+    frame[..., 3] = 255
+    return frame
+
+
+@pytest.mark.parametrize('header_size', [12, 16])
+def test_screencap_header_and_rgba_conversion(fake_adb, monkeypatch, header_size):
+    monkeypatch.setenv('FAKE_ADB_HEADER', str(header_size))
+    monkeypatch.setenv('FAKE_ADB_WIDTH', '5')
+    monkeypatch.setenv('FAKE_ADB_HEIGHT', '3')
+    stream = AdbScreencapStream(fake_adb, SERIAL, timeout=2.0)
+    try:
+        frame = stream.grab()
+        assert stream.header_size == header_size
+        np.testing.assert_array_equal(frame, expected_bgra(5, 3))
+        # 같은 연결로 다음 프레임도 읽는다
+        np.testing.assert_array_equal(stream.grab(), expected_bgra(5, 3))
+    finally:
+        stream.close()
+
+
+def test_bgra_screencap_is_returned_as_is(fake_adb, monkeypatch):
+    monkeypatch.setenv('FAKE_ADB_FORMAT', str(SCREENCAP_BGRA_8888))
+    stream = AdbScreencapStream(fake_adb, SERIAL, timeout=2.0)
+    try:
+        frame = stream.grab()
+        assert tuple(frame[1, 2]) == (2, 1, 7, 255)
+    finally:
+        stream.close()
+
+
+def test_backend_resolves_device_from_title(fake_adb):
+    backend = AdbScreencapBackend(fake_adb, timeout=2.0)
+    try:
+        assert backend.capture(None, 'LDPlayer-0').shape == (3, 4, 4)
+        assert backend.capture(None, 'not an instance') is None
+        assert backend.stats()['failures'] == 0
+    finally:
+        backend.release()
+
+
+def test_watchdog_unblocks_hung_stream(fake_adb, monkeypatch):
+    monkeypatch.setenv('FAKE_ADB_HANG', '1')
+    backend = AdbScreencapBackend(fake_adb, timeout=0.5)
+    try:
+        started = time.monotonic()
+        assert backend.capture(None, 'LDPlayer-0') is None
+        # 한 번 재연결해서 다시 시도하므로 제한 시간 두 번 안에 끝나야 한다
+        assert time.monotonic() - started < 5.0
+        assert backend.stats()['failures'] == 1
+    finally:
+        backend.release()
@@ -0,0 +1,109 @@
+import subprocess
+import threading
+
+from src.utils.clicks import ClickDispatcher
+
+SERIAL = '127.0.0.1:5555'
+
+
+class RecordingPool:
+    """받은 명령을 기록하고 정해 둔 종료 코드를 돌려주는 세션 풀 대용"""
+
+    def __init__(self, status=0):
+        self.status = status
+        self.commands = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def run(self, serial, command):
+        self.release.wait(5.0)
+        self.commands.append(command)
+        return self.status
+
+
+class HangingPool(RecordingPool):
+    """첫 명령에서 adb가 멈춘 것처럼 TimeoutExpired를 던지는 세션 풀 대용"""
+
+    def __init__(self):
+        super().__init__()
+        self.raised = False
+
+    def run(self, serial, command):
+        if not self.raised:
+            self.raised = True
+            raise subprocess.TimeoutExpired(['adb', 'connect', serial], 5.0)
+        return super().run(serial, command)
+
+
+def dispatcher(pool, **options):
+    return ClickDispatcher(pool, batch_window=0, tap_interval=0, **options)
+
+
+def test_repeat_within_cooldown_is_dropped_after_success():
+    pool = RecordingPool()
+    taps = dispatcher(pool, cooldown=60.0)
+    try:
+        assert taps.submit(SERIAL, 10, 10, key='a.png')
+        assert taps.drain()
+        assert not taps.submit(SERIAL, 12, 11, key='a.png')
+        assert taps.submit(SERIAL, 100, 100, key='a.png')
+        assert taps.drain()
+        assert taps.stats()['dropped_duplicate'] == 1
+    finally:
+        taps.close()
+
+
+def test_failed_tap_is_not_recorded():
+    pool = RecordingPool(status=1)
+    taps = dispatcher(pool, cooldown=60.0)
+    try:
+        assert taps.submit(SERIAL, 10, 10, key='a.png')
+        assert taps.drain()
+        # 전송에 실패했으므로 다음 매칭에서 다시 탭한다
+        assert taps.submit(SERIAL, 10, 10, key='a.png')
+        assert taps.drain()
+        assert len(pool.commands) == 2
+        assert taps.stats()['failed'] == 2
+    finally:
+        taps.close()
+
+
+def test_tap_still_queued_or_sending_is_not_repeated():
+    pool = RecordingPool()
+    pool.release.clear()
+    taps = dispatcher(pool, cooldown=60.0)
+    try:
+        assert taps.submit(SERIAL, 10, 10, key='a.png')
+        assert not taps.submit(SERIAL, 10, 10, key='a.png')
+        pool.release.set()
+        assert taps.drain()
+        assert pool.commands == ['input tap 10 10']
+    finally:
+        taps.close()
+
+
+def test_zero_cooldown_allows_repeats():
+    pool = RecordingPool()
+    taps = dispatcher(pool, cooldown=60.0)
+    try:
+        assert taps.submit(SERIAL, 10, 10, key='a.png', cooldown=0)
+        assert taps.submit(SERIAL, 10, 10, key='a.png', cooldown=0)
+        assert taps.drain()
+        assert taps.stats()['dropped_duplicate'] == 0
+    finally:
+        taps.close()
+
+
+def test_timeout_does_not_stop_the_device_queue():
+    pool = HangingPool()
+    taps = dispatcher(pool)
+    try:
+        assert taps.submit(SERIAL, 10, 10)
+        assert taps.drain()
+        # 앞 묶음이 시간 초과로 실패해도 같은 기기의 다음 탭은 보낸다
+        assert taps.submit(SERIAL, 20, 20)
+        assert taps.drain()
+        assert pool.commands == ['input tap 20 20']
+        assert taps.stats()['failed'] == 1
+    finally:
+        taps.close()
@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.utils.benchmark import reference_templates
+from src.utils.fftmatch import FFTMatcher
+from src.utils.frame import Frame
+from src.utils.scanner import CachedTemplate
+
+# cv2.matchTemplate과 비교할 때 허용하는 차이 (FFTMatcher 설명 참고)
+PEAK_TOLERANCE = 1e-3
+TEXTURED_TOLERANCE = 1e-3
+# 화소당 회색조 표준편차가 이보다 작은 창은 cv2.matchTemplate의 float32 오차가 크다
+TEXTURED_STD = 4.0
+# float64로 직접 계산한 점수와 비교할 때 허용하는 차이
+EXACT_TOLERANCE = 2e-4
+
+
+def exact_score(gray, template, y, x):
+    h, w = template.shape
+    window = gray[y:y + h, x:x + w].astype(np.float64)
+    window -= window.mean()
+    centered = template.astype(np.float64) - template.mean()
+    denominator = np.sqrt((window * window).sum() * (centered * centered).sum())
+    return (window * centered).sum() / denominator if denominator else 0.0
+
+
+def crops(bgr, count, seed):
+    rng = np.random.default_rng(seed)
+    height, width = bgr.shape[:2]
+    for index in range(count):
+        h = int(rng.integers(8, min(100, height - 1)))
+        w = int(rng.integers(8, min(160, width - 1)))
+        y, x = int(rng.integers(0, height - h)), int(rng.integers(0, width - w))
+        yield CachedTemplate(f'crop{index}.png', 0, 0, bgr[y:y + h, x:x + w].copy())
+
+
+@pytest.mark.parametrize('path', reference_templates(), ids=lambda path: path.rsplit('/', 1)[-1])
+def test_scores_match_opencv_on_reference_images(path):
+    bgr = cv2.imread(path, cv2.IMREAD_COLOR)
+    frame = Frame(cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA))
+    matcher = FFTMatcher()
+    for seed in range(3):
+        for template in crops(bgr, 10, seed):
+            expected = cv2.matchTemplate(frame.gray, template.gray, cv2.TM_CCOEFF_NORMED)
+            scores = matcher.scores(frame, template)
+            assert scores.shape == expected.shape
+            difference = np.abs(scores - expected)
+            assert abs(scores.max() - expected.max()) <= PEAK_TOLERANCE
+
+            h, w = template.shape
+            textured = matcher.window_std(frame, (h, w)) >= TEXTURED_STD * np.sqrt(h * w)
+            if textured.any():
+                assert difference[textured].max() <= TEXTURED_TOLERANCE
+            # 가장 크게 벌어진 위치에서도 FFT 쪽은 float64 계산과 맞는다
+            largest = np.argsort(difference, axis=None)[-30:]
+            for y, x in zip(*np.unravel_index(largest, difference.shape)):
+                exact = exact_score(frame.gray, template.gray, y, x)
+                assert abs(scores[y, x] - exact) <= EXACT_TOLERANCE
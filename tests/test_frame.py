@@ -0,0 +1,82 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.utils.frame import Frame, FrameBuffers
+from src.utils.scanner import MATCH_PYRAMID, ImageScanner, TemplateSpec
+
+
+def bgra(seed=0, size=(60, 80)):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size + (4,), dtype=np.uint8)
+
+
+def test_buffered_views_match_unbuffered_fallback():
+    raw = bgra()
+    plain, buffered = Frame(raw), Frame(raw, FrameBuffers())
+    assert plain.buffer('gray', plain.shape) is None
+    np.testing.assert_array_equal(buffered.gray, plain.gray)
+    np.testing.assert_array_equal(buffered.bgr, plain.bgr)
+    np.testing.assert_array_equal(buffered.downscaled(0.5), plain.downscaled(0.5))
+    np.testing.assert_array_equal(buffered.block_means(16), plain.block_means(16))
+    np.testing.assert_array_equal(plain.gray, cv2.cvtColor(raw, cv2.COLOR_BGRA2GRAY))
+
+
+def test_buffers_are_reused_between_frames_of_same_size():
+    buffers = FrameBuffers()
+    first = Frame(bgra(0), buffers)
+    gray = first.gray
+    first.bgr
+    allocations = buffers.allocations
+
+    second = Frame(bgra(1), buffers)
+    assert second.gray is gray
+    second.bgr
+    assert buffers.allocations == allocations
+    # 창 크기가 바뀌면 새로 할당한다
+    Frame(bgra(2, (30, 40)), buffers).gray
+    assert buffers.allocations == allocations + 1
+
+
+@pytest.mark.parametrize('channels', [1, 3, 4])
+def test_views_for_each_input_format(channels):
+    raw = bgra()
+    if channels == 1:
+        raw = cv2.cvtColor(raw, cv2.COLOR_BGRA2GRAY)
+    elif channels == 3:
+        raw = cv2.cvtColor(raw, cv2.COLOR_BGRA2BGR)
+    frame = Frame(raw, FrameBuffers())
+    assert frame.channels == channels
+    assert frame.gray.shape == (60, 80)
+    assert frame.bgr.shape == (60, 80, 3)
+    if channels == 1:
+        assert frame.gray is raw
+    if channels == 3:
+        assert frame.bgr is raw
+
+
+def test_derived_values_are_computed_once():
+    frame = Frame(bgra())
+    assert Frame.wrap(frame) is frame
+    calls = []
+    for _ in range(3):
+        frame.cached('summary', lambda: calls.append(1) or 'value')
+    assert calls == [1]
+    assert frame.gray is frame.gray
+
+
+def test_scan_results_do_not_depend_on_buffers(tmp_path):
+    rng = np.random.default_rng(3)
+    raw = cv2.cvtColor(cv2.resize(rng.integers(0, 256, (30, 40, 3), dtype=np.uint8), (160, 120),
+                                  interpolation=cv2.INTER_NEAREST), cv2.COLOR_BGR2BGRA)
+    path = tmp_path / 'button.png'
+    cv2.imwrite(str(path), raw[40:80, 50:110, :3])
+    scanner = ImageScanner(match_mode=MATCH_PYRAMID, change_detection=False)
+    try:
+        # 인스턴스를 주면 인스턴스 버퍼를, 주지 않으면 새 배열을 쓴다
+        buffered = scanner.scan_frame(raw, [TemplateSpec(str(path))], instance='LDPlayer-0')
+        plain = scanner.scan_frame(Frame(raw), [TemplateSpec(str(path))])
+        assert [(hit.top_left, hit.score) for hit in buffered.hits] == \
+            [(hit.top_left, hit.score) for hit in plain.hits] == [((50, 40), pytest.approx(1.0))]
+    finally:
+        scanner.close()
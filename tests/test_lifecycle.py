@@ -0,0 +1,31 @@
+import subprocess
+import sys
+import time
+
+from src.lifecycle import ProcessLifecycleManager
+
+
+def test_request_terminate_returns_immediately():
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    lifecycle = ProcessLifecycleManager(poll_interval=0.1, grace=2.0, kill_timeout=2.0)
+    lifecycle.start()
+    try:
+        assert lifecycle.watch(child.pid)
+        started = time.monotonic()
+        assert lifecycle.request_terminate([child.pid]) == [child.pid]
+        assert time.monotonic() - started < 0.1
+        # 종료 중인 PID는 다시 맡기지 않는다
+        assert lifecycle.request_terminate([child.pid]) == []
+
+        pid, _ = lifecycle.events.get(timeout=10.0)
+        assert pid == child.pid
+        assert not lifecycle.is_alive(child.pid)
+        deadline = time.monotonic() + 5.0
+        while lifecycle.is_terminating(child.pid):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        lifecycle.stop()
+        if child.poll() is None:
+            child.kill()
+        child.wait()
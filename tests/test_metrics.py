@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from src.utils.metrics import STAGE_MATCH, STAGE_TAP, Histogram, StageMetrics
+
+
+def test_quantile_interpolates_within_bucket():
+    histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.snapshot() == ([1, 2, 1, 0], 6.5, 4)
+    assert histogram.quantile(0.25) == pytest.approx(1.0)
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert histogram.quantile(1.0) == pytest.approx(4.0)
+
+
+def test_quantile_of_empty_and_overflow():
+    histogram = Histogram(buckets=(1.0, 2.0))
+    assert histogram.quantile(0.5) == 0.0
+    histogram.observe(10.0)
+    # 마지막 경계보다 큰 값은 마지막 경계로 본다
+    assert histogram.quantile(0.99) == 2.0
+
+
+def test_observations_from_threads_are_merged():
+    histogram = Histogram(buckets=(1.0,))
+    threads = [threading.Thread(target=lambda: [histogram.observe(0.5) for _ in range(100)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert histogram.snapshot()[2] == 400
+
+
+def test_render_prometheus():
+    metrics = StageMetrics(buckets=(0.01, 0.1))
+    metrics.observe(STAGE_MATCH, 0.005, 'LDPlayer-0', 'C:/images/tap/start.png')
+    metrics.observe(STAGE_MATCH, 0.05, 'LDPlayer-0', 'start.png')
+    metrics.observe(STAGE_TAP, 0.5, 'LDPlayer-"1"')
+    lines = metrics.render_prometheus().splitlines()
+    assert lines[:2] == [
+        '# HELP ldmonitor_stage_seconds Latency of each monitor stage in seconds.',
+        '# TYPE ldmonitor_stage_seconds histogram',
+    ]
+    # 템플릿 레이블은 경로가 달라도 파일 이름 하나로 모인다
+    match = 'stage="match",instance="LDPlayer-0",template="start.png"'
+    assert lines[2:7] == [
+        f'ldmonitor_stage_seconds_bucket{{{match},le="0.01"}} 1',
+        f'ldmonitor_stage_seconds_bucket{{{match},le="0.1"}} 2',
+        f'ldmonitor_stage_seconds_bucket{{{match},le="+Inf"}} 2',
+        f'ldmonitor_stage_seconds_sum{{{match}}} 0.055',
+        f'ldmonitor_stage_seconds_count{{{match}}} 2',
+    ]
+    tap = 'stage="tap",instance="LDPlayer-\\"1\\""'
+    assert f'ldmonitor_stage_seconds_bucket{{{tap},le="+Inf"}} 1' in lines
+    assert f'ldmonitor_stage_seconds_bucket{{{tap},le="0.1"}} 0' in lines
+    assert len(lines) == 12
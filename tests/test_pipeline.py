@@ -0,0 +1,81 @@
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from src.utils.pipeline import MatchPipeline
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = MatchPipeline(workers=1, slots=2, max_width=64, max_height=64,
+                             scanner_options={'change_detection': False},
+                             timeout=30.0, health_interval=0.1)
+    pipeline.start()
+    yield pipeline
+    pipeline.close()
+
+
+def frame(value=0):
+    return np.full((32, 32, 4), value, dtype=np.uint8)
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_scan_returns_result(pipeline):
+    result = pipeline.scan('LDPlayer-0', frame(), [])
+    assert result.instance == 'LDPlayer-0'
+    assert result.hits == []
+
+
+def test_dead_matcher_fails_pending_jobs_and_is_respawned(pipeline):
+    pipeline.scan('LDPlayer-0', frame(), [])
+    process = pipeline._processes[0]
+    process.kill()
+    process.join()
+
+    # 죽은 프로세스에 보낸 작업은 기다리지 않고 오류로 끝나고 슬롯도 돌아온다
+    future = pipeline.submit('LDPlayer-0', frame(1), [])
+    with pytest.raises(RuntimeError):
+        future.result(timeout=10.0)
+    wait_for(lambda: pipeline.stats()['free_slots'] == pipeline.slots)
+    assert pipeline.stats()['restarts'] == 1
+
+    # 다시 띄운 프로세스로 계속 검사한다
+    assert pipeline.scan('LDPlayer-0', frame(2), []).instance == 'LDPlayer-0'
+    assert pipeline._processes[0] is not process
+
+
+def test_scan_times_out(pipeline):
+    pipeline.scan('LDPlayer-0', frame(), [])
+    # 결과를 받을 수 없게 매칭 프로세스를 멈춘다
+    pipeline._closing = True
+    pipeline._processes[0].kill()
+    with pytest.raises(TimeoutError):
+        pipeline.scan('LDPlayer-0', frame(1), [], timeout=0.3)
+    pipeline._closing = False
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGSTOP'), reason="SIGSTOP이 없는 환경")
+def test_stuck_matcher_is_restarted():
+    pipeline = MatchPipeline(workers=1, slots=2, max_width=64, max_height=64,
+                             scanner_options={'change_detection': False},
+                             timeout=30.0, hang_timeout=0.5, health_interval=0.1)
+    pipeline.start()
+    try:
+        pipeline.scan('LDPlayer-0', frame(), [])
+        os.kill(pipeline._processes[0].pid, signal.SIGSTOP)
+        future = pipeline.submit('LDPlayer-0', frame(1), [])
+        with pytest.raises(RuntimeError):
+            future.result(timeout=10.0)
+        assert pipeline.scan('LDPlayer-0', frame(2), []).instance == 'LDPlayer-0'
+        assert pipeline.stats()['restarts'] == 1
+    finally:
+        pipeline.close()
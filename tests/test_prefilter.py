@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+
+from src.utils.benchmark import photometric
+from src.utils.frame import Frame
+from src.utils.prefilter import TemplatePrefilter
+from src.utils.scanner import CachedTemplate
+
+
+def striped_template():
+    """빨강·초록·파랑 줄무늬 템플릿"""
+    bgr = np.zeros((24, 36, 3), dtype=np.uint8)
+    bgr[:8] = (40, 40, 200)
+    bgr[8:16] = (40, 180, 40)
+    bgr[16:] = (200, 60, 40)
+    return CachedTemplate('striped.png', 0, 0, bgr)
+
+
+def frame_with(template, background=(128, 128, 128)):
+    bgr = np.full((120, 160, 3), background, dtype=np.uint8)
+    bgr[40:64, 60:96] = template.bgr
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)
+
+
+def test_present_template_passes_under_brightness_changes():
+    template = striped_template()
+    prefilter = TemplatePrefilter()
+    raw = frame_with(template)
+    for gain, gamma, shift in ((1.0, 1.0, 0), (1.0, 1.0, 24), (1.0, 1.0, -20), (0.8, 1.0, 0),
+                               (1.2, 1.0, 0), (1.0, 0.9, 0), (1.0, 1.2, 0), (0.85, 1.1, -10)):
+        frame = Frame(photometric(raw, gain, gamma, shift))
+        assert prefilter.may_contain(frame, template)
+        assert prefilter.may_contain(frame, template, (50, 30, 56, 44))
+
+
+def test_region_without_template_colors_is_rejected():
+    template = striped_template()
+    prefilter = TemplatePrefilter()
+    frame = Frame(frame_with(template))
+    # 회색 배경만 있는 영역
+    assert not prefilter.may_contain(frame, template, (0, 0, 50, 30))
+    assert prefilter.stats()['rejected'] == 1
+
+
+def test_grayscale_frame_is_never_rejected():
+    template = striped_template()
+    prefilter = TemplatePrefilter()
+    gray = np.full((120, 160), 128, dtype=np.uint8)
+    assert prefilter.may_contain(Frame(gray), template)
@@ -0,0 +1,63 @@
+import threading
+
+from src.process_poller import ProcessPoller
+
+
+class ProcessTable:
+    """poll()이 읽을 가짜 프로세스 목록"""
+
+    def __init__(self, *processes):
+        self.processes = list(processes)
+        self.reads = 0
+        self.read = threading.Event()
+
+    def __call__(self):
+        self.reads += 1
+        self.read.set()
+        return [dict(proc) for proc in self.processes]
+
+
+def proc(pid, title, name='dnplayer.exe', memory=100):
+    return {'pid': pid, 'name': name, 'window_title': title, 'memory': memory}
+
+
+def test_poll_reports_only_differences():
+    table = ProcessTable(proc(1, 'LDPlayer-0'), proc(2, 'LDPlayer-1'))
+    poller = ProcessPoller(list_fn=table)
+    first = poller.poll()
+    assert set(first.added) == {1, 2} and not first.removed and not first.changed
+
+    # 화면에 보이지 않는 필드만 바뀌면 변경분이 없다
+    table.processes = [proc(1, 'LDPlayer-0', memory=500), proc(2, 'LDPlayer-1')]
+    assert not poller.poll()
+
+    table.processes = [proc(1, 'LDPlayer-3'), proc(3, 'LDPlayer-2')]
+    diff = poller.poll()
+    assert set(diff.added) == {3}
+    assert set(diff.removed) == {2}
+    assert diff.changed == {1: proc(1, 'LDPlayer-3')}
+    # 빈 변경분은 큐에 넣지 않는다
+    assert len(poller.drain()) == 2
+    assert poller.drain() == []
+
+
+def test_background_thread_survives_errors_and_refreshes():
+    table = ProcessTable(proc(1, 'LDPlayer-0'))
+    failures = []
+
+    def flaky():
+        if not failures:
+            failures.append(True)
+            raise OSError("access denied")
+        return table()
+
+    poller = ProcessPoller(interval=60.0, list_fn=flaky)
+    poller.start()
+    try:
+        # 첫 조회가 실패해도 refresh()로 바로 다시 읽는다
+        poller.refresh()
+        assert table.read.wait(5.0)
+        assert set(poller.diffs.get(timeout=5.0).added) == {1}
+    finally:
+        poller.stop()
+    assert not poller._thread.is_alive()
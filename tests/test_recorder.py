@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.utils.recorder import FrameRecorder, RecorderPool, RecordingReader, replay_recording
+from src.utils.scanner import ImageScanner, TemplateSpec
+
+
+def textured_frame(seed=0, size=(150, 200)):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (size[0] // 4, size[1] // 4, 3), dtype=np.uint8)
+    bgr = cv2.resize(noise, (size[1], size[0]), interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)
+
+
+def long_path_templates(tmp_path, frame, count=24):
+    """긴 절대 경로에 저장한 템플릿 (예전 슬롯 메타데이터 크기를 넘길 만큼)"""
+    folder = tmp_path.joinpath(*(['templates_for_a_very_long_recording_path'] * 4))
+    folder.mkdir(parents=True)
+    specs = []
+    for index in range(count):
+        x, y = (index % 6) * 30 + 4, (index // 6) * 34 + 4
+        path = folder / f"button_{index:02d}_with_a_descriptive_name.png"
+        cv2.imwrite(str(path), frame[y:y + 20, x:x + 24, :3])
+        roi = (x - 4, y - 4, 32, 28) if index % 2 else None
+        specs.append(TemplateSpec(str(path), confidence=0.95, roi=roi))
+    return specs
+
+
+def test_record_and_replay_round_trip(tmp_path):
+    frames = [textured_frame(0), textured_frame(1)]
+    specs = long_path_templates(tmp_path, frames[0])
+    scanner = ImageScanner(change_detection=False)
+    scanner.recorder = RecorderPool(str(tmp_path / 'recordings'), slots=4, max_width=200,
+                                    max_height=150)
+    try:
+        expected_hits = []
+        for frame in frames:
+            result = scanner.scan_frame(frame, specs, instance='LDPlayer-0')
+            expected_hits.append(len(result.hits))
+            assert scanner.recorder.record('LDPlayer-0', frame, result, specs)
+        assert expected_hits[0] == len(specs)
+    finally:
+        scanner.close()
+
+    path = str(tmp_path / 'recordings' / 'LDPlayer-0.ldrec')
+    reader = RecordingReader(path)
+    try:
+        # 검사 계획은 한 번만 저장되고 ROI까지 그대로 돌아온다
+        assert len(reader.plans) == 1
+        assert [(spec.path, spec.roi) for spec in reader.plans[0]] == [(spec.path, spec.roi) for spec in specs]
+        entries = reader.entries()
+        assert [metadata['plan'] for _, _, _, metadata in entries] == [0, 0]
+        assert len(entries[0][3]['scores']) == len(specs)
+    finally:
+        reader.close()
+
+    report = replay_recording(path, change_detection=False)
+    assert report['frames'] == 2
+    assert report['hits'] == sum(expected_hits)
+    assert report['mismatches'] == []
+
+
+def test_oversized_metadata_fails_loudly(tmp_path):
+    recorder = FrameRecorder(str(tmp_path / 'small.ldrec'), slots=2, max_width=8, max_height=8,
+                             meta_size=64)
+    try:
+        with pytest.raises(ValueError):
+            recorder.record(np.zeros((8, 8, 4), dtype=np.uint8), {'hits': ['x' * 100]})
+        assert recorder.recorded == 0
+    finally:
+        recorder.close()
+
+
+def test_replay_without_plan_is_an_error(tmp_path):
+    path = str(tmp_path / 'no_plan.ldrec')
+    recorder = FrameRecorder(path, slots=2, max_width=8, max_height=8)
+    recorder.record(np.zeros((8, 8, 4), dtype=np.uint8), {'hits': []})
+    recorder.close()
+    with pytest.raises(ValueError):
+        replay_recording(path, change_detection=False)
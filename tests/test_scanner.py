@@ -0,0 +1,301 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.utils.capture import FileReplayBackend
+from src.utils.scanner import (ACTION_KILL, ACTION_TAP, CachedTemplate, HitStatistics, ImageScanner,
+                               FrameChangeDetector, MatchHit, ScaleCalibrator, ScanResult, TemplateCache,
+                               TemplateSpec, VERIFY_PATCH, VERIFY_PIXEL)
+from src.utils.windows import FakeWindowBackend, WindowRegistry
+
+
+def textured_frame(seed=0, size=(120, 160)):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (size[0] // 4, size[1] // 4, 3), dtype=np.uint8)
+    bgr = cv2.resize(noise, (size[1], size[0]), interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)
+
+
+def crop_template(tmp_path, frame, name, x, y, action=ACTION_TAP, **options):
+    path = tmp_path / name
+    cv2.imwrite(str(path), frame[y:y + 20, x:x + 24, :3])
+    return TemplateSpec(str(path), action, confidence=0.95, **options)
+
+
+def tap_result(spec, instance='LDPlayer-0'):
+    template = CachedTemplate(spec.path, 0, 0, np.zeros((10, 10, 3), dtype=np.uint8))
+    result = ScanResult(np.zeros((100, 100, 4), dtype=np.uint8), instance)
+    result.hits.append(MatchHit(spec, template, (20, 20), 0.99))
+    return result
+
+
+def test_template_without_cooldown_uses_dispatcher_default(fake_adb, adb_log, monkeypatch):
+    scanner = ImageScanner(tap_options={'cooldown': 60.0, 'batch_window': 0, 'tap_interval': 0})
+    monkeypatch.setattr(scanner, 'verify_match', lambda *args: (True, 0.0))
+    try:
+        spec = TemplateSpec('button.png')
+        assert spec.cooldown is None
+        result = tap_result(spec)
+        assert scanner.tap_hit(result, result.hits[0], fake_adb)
+        assert scanner.click_dispatcher(fake_adb).drain()
+        # 템플릿에 cooldown이 없으면 tap_cooldown이 적용되어 같은 탭을 다시 보내지 않는다
+        assert not scanner.tap_hit(result, result.hits[0], fake_adb)
+        assert scanner.tap_stats()['dropped_duplicate'] == 1
+        assert len([line for line in adb_log() if 'input tap' in line]) == 1
+    finally:
+        scanner.close()
+
+
+def test_terminal_templates_are_ordered_first():
+    stats = HitStatistics()
+    tap = TemplateSpec('tap.png', priority=5)
+    kill = TemplateSpec('kill.png', ACTION_KILL)
+    for _ in range(5):
+        stats.record('LDPlayer-0', 'tap.png', True, 0.001)
+        stats.record('LDPlayer-0', 'kill.png', False, 0.001)
+    scheduled, deferred = stats.order('LDPlayer-0', [tap, kill])
+    assert scheduled == [kill, tap]
+    assert deferred == []
+
+
+def test_likely_and_cheap_templates_are_scanned_first():
+    stats = HitStatistics()
+    rare, common = TemplateSpec('rare.png'), TemplateSpec('common.png')
+    for _ in range(5):
+        stats.record('LDPlayer-0', 'rare.png', False, 0.001)
+        stats.record('LDPlayer-0', 'common.png', True, 0.001)
+    assert stats.order('LDPlayer-0', [rare, common])[0] == [common, rare]
+
+
+def test_rare_template_is_demoted_but_kill_is_not():
+    stats = HitStatistics(warmup=3, demote_below=0.5, demoted_interval=3.0, max_staleness=1.0)
+    rare, urgent = TemplateSpec('rare.png'), TemplateSpec('urgent.png', priority=1)
+    kill = TemplateSpec('kill.png', ACTION_KILL)
+    for spec in (rare, urgent, kill):
+        for _ in range(3):
+            stats.record('LDPlayer-0', spec.path, False, 0.001, now=100.0)
+
+    scheduled, deferred = stats.order('LDPlayer-0', [rare, urgent, kill], now=100.5)
+    assert scheduled == [kill]
+    assert deferred == [rare, urgent]
+    # 우선순위가 있으면 max_staleness, 없으면 demoted_interval이 지나면 다시 검사
+    assert stats.order('LDPlayer-0', [rare, urgent, kill], now=101.5)[0] == [kill, urgent]
+    assert stats.order('LDPlayer-0', [rare, urgent, kill], now=103.5)[0] == [kill, urgent, rare]
+
+
+def test_kill_match_stops_scan_early(tmp_path):
+    frame = textured_frame()
+    tap = crop_template(tmp_path, frame, 'tap.png', 10, 10, priority=5)
+    kill = crop_template(tmp_path, frame, 'kill.png', 100, 80, ACTION_KILL)
+    for options in ({}, {'hit_stats': {}}):
+        scanner = ImageScanner(change_detection=False, **options)
+        try:
+            result = scanner.scan_frame(frame, [tap, kill], instance='LDPlayer-0')
+            assert [hit.spec for hit in result.hits] == [kill]
+            assert result.stopped_early
+            assert result.deferred == [tap]
+        finally:
+            scanner.close()
+
+
+def test_reused_results_are_not_counted_as_scans(tmp_path):
+    frame = textured_frame()
+    spec = crop_template(tmp_path, frame, 'tap.png', 10, 10)
+    scanner = ImageScanner(hit_stats={})
+    try:
+        for _ in range(3):
+            result = scanner.scan_frame(frame, [spec], instance='LDPlayer-0')
+        assert result.reused == 1
+        stat = scanner.hit_stats.stats()['templates']['LDPlayer-0:tap.png']
+        assert stat['scans'] == 1
+    finally:
+        scanner.close()
+
+
+def resized(frame, scale):
+    return cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def test_calibrator_finds_instance_scale():
+    reference = textured_frame(size=(160, 200))
+    template = CachedTemplate('button.png', 0, 0, reference[40:80, 60:120, :3].copy())
+    calibrator = ScaleCalibrator([0.5, 0.75, 1.0], reference_size=(200, 160))
+    small = cv2.cvtColor(resized(reference, 0.75), cv2.COLOR_BGRA2GRAY)
+    assert calibrator.scale_for('LDPlayer-0', small, [template]) == (0.75, True)
+    assert calibrator.stats()['instances']['LDPlayer-0']['calibrated']
+    # 보정이 끝나면 같은 크기의 프레임은 다시 매칭하지 않는다
+    assert calibrator.scale_for('LDPlayer-0', small, [template]) == (0.75, False)
+    assert calibrator.calibrations == 1
+
+    # 창 크기가 바뀌면 다시 보정한다
+    full = cv2.cvtColor(reference, cv2.COLOR_BGRA2GRAY)
+    assert calibrator.scale_for('LDPlayer-0', full, [template]) == (1.0, True)
+    assert calibrator.calibrations == 2
+
+
+def test_calibrator_backs_off_on_blank_frames():
+    template = CachedTemplate('button.png', 0, 0, textured_frame(size=(40, 60))[..., :3].copy())
+    calibrator = ScaleCalibrator([0.5, 1.0], reference_size=(200, 160), retry_every=2, max_attempts=2)
+    blank = np.full((160, 200), 128, dtype=np.uint8)
+    for _ in range(10):
+        scale, _ = calibrator.scale_for('LDPlayer-0', blank, [template])
+        assert scale == 1.0
+    # 처음 한 번, 2프레임 뒤 한 번 실패하면 추정 배율로 굳힌다
+    assert calibrator.calibrations == 2
+    assert calibrator.failures == 2
+
+
+def test_find_matches_checks_scaled_template_size(tmp_path):
+    reference = textured_frame(size=(160, 200))
+    # 원본 크기로는 절반 해상도 프레임보다 넓은 템플릿
+    path = tmp_path / 'wide.png'
+    cv2.imwrite(str(path), reference[20:140, 10:190, :3])
+    windows = WindowRegistry(FakeWindowBackend([(1, 100, 'LDPlayer-0')]))
+    capture = FileReplayBackend.from_frames([resized(reference, 0.5)])
+    scanner = ImageScanner(template_scales=[0.5, 1.0], reference_size=(200, 160),
+                           window_registry=windows, capture_backend=capture)
+    try:
+        results = scanner.find_matches(str(path), 'LDPlayer-0', suppress_logging=True)
+        assert len(results) == 1
+        hit = results[0].hits[0]
+        assert hit.template.shape == (60, 90)
+        assert hit.top_left == (5, 10)
+    finally:
+        scanner.close()
+
+
+def test_template_cache_reloads_changed_files(tmp_path):
+    path = tmp_path / 'button.png'
+    cv2.imwrite(str(path), np.full((10, 12, 3), 50, dtype=np.uint8))
+    cache = TemplateCache(max_size=2)
+    first = cache.get(str(path))
+    assert cache.get(str(path)) is first
+    assert cache.stats()['hits'] == 1
+
+    # 파일 내용과 mtime이 바뀌면 다시 읽는다
+    cv2.imwrite(str(path), np.full((20, 24, 3), 200, dtype=np.uint8))
+    os.utime(path, (first.mtime + 10, first.mtime + 10))
+    second = cache.get(str(path))
+    assert second is not first
+    assert second.shape == (20, 24)
+
+    cache.invalidate(str(path))
+    assert cache.get(str(path)) is not second
+
+    # 지워진 파일은 캐시에서도 뺀다
+    os.remove(path)
+    assert cache.get(str(path)) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_template_cache_evicts_least_recently_used(tmp_path):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f'{index}.png'
+        cv2.imwrite(str(path), np.full((8, 8, 3), index * 40, dtype=np.uint8))
+        paths.append(str(path))
+    cache = TemplateCache(max_size=2)
+    first = cache.get(paths[0])
+    cache.get(paths[1])
+    assert cache.get(paths[0]) is first
+    cache.get(paths[2])
+    assert cache.stats()['evictions'] == 1
+    # 가장 오래 안 쓴 1.png가 빠졌으므로 0.png는 그대로, 1.png는 다시 읽는다
+    assert cache.get(paths[0]) is first
+    assert cache.stats()['misses'] == 3
+    cache.get(paths[1])
+    assert cache.stats()['misses'] == 4
+
+
+def test_change_detector_marks_changed_blocks():
+    detector = FrameChangeDetector(block_size=16, threshold=1.0)
+    frame = textured_frame()
+    assert detector.update('LDPlayer-0', frame) is None
+    assert not detector.update('LDPlayer-0', frame).any()
+
+    changed = frame.copy()
+    changed[100:110, 130:150] = 0
+    mask = detector.update('LDPlayer-0', changed)
+    assert mask.sum() >= 1
+    assert detector.region_changed(mask, (120, 96, 40, 24), frame.shape)
+    assert not detector.region_changed(mask, (0, 0, 64, 64), frame.shape)
+    # 크기가 바뀐 프레임은 비교하지 않는다
+    assert detector.update('LDPlayer-0', textured_frame(size=(60, 80))) is None
+
+
+def test_unchanged_screen_reuses_previous_matches(tmp_path):
+    frame = textured_frame()
+    anywhere = crop_template(tmp_path, frame, 'anywhere.png', 10, 10)
+    corner = crop_template(tmp_path, frame, 'corner.png', 12, 60, roi=(0, 50, 60, 40))
+    scanner = ImageScanner(change_block_size=16)
+    try:
+        assert scanner.scan_frame(frame, [anywhere, corner], instance='LDPlayer-0').scan_kind == 'full'
+        result = scanner.scan_frame(frame.copy(), [anywhere, corner], instance='LDPlayer-0')
+        assert result.scan_kind == 'skipped'
+        assert len(result.hits) == 2 and all(hit.reused for hit in result.hits)
+
+        # ROI 밖만 바뀌면 ROI 템플릿은 재사용하고 ROI가 없는 템플릿만 다시 찾는다
+        changed = frame.copy()
+        changed[100:110, 130:150] = 0
+        result = scanner.scan_frame(changed, [anywhere, corner], instance='LDPlayer-0')
+        assert result.scan_kind == 'partial'
+        assert {hit.spec.name: hit.reused for hit in result.hits} == {'anywhere.png': False,
+                                                                       'corner.png': True}
+        assert scanner.change_stats()['skipped'] == 1
+    finally:
+        scanner.close()
+
+
+def hit_at(frame, x, y, size=(20, 24)):
+    template = CachedTemplate('button.png', 0, 0, frame[y:y + size[0], x:x + size[1], :3].copy())
+    return MatchHit(TemplateSpec('button.png'), template, (x, y), 1.0)
+
+
+def test_verify_rejects_recolored_match():
+    frame = textured_frame()
+    hit = hit_at(frame, 40, 30)
+    scanner = ImageScanner()
+    try:
+        assert scanner.verify_match(frame[..., :3], hit) == (True, 0.0)
+        # 밝기 구조는 같고 색만 다른 화면 (그레이스케일 매칭은 통과한다)
+        recolored = frame[..., [2, 0, 1, 3]].copy()
+        ok, diff = scanner.verify_match(recolored[..., :3], hit)
+        assert not ok and diff > 30
+    finally:
+        scanner.close()
+
+
+def test_patch_verify_tolerates_single_pixel_noise():
+    frame = textured_frame()
+    hit = hit_at(frame, 40, 30)
+    noisy = frame[..., :3].copy()
+    cx, cy = hit.center
+    noisy[cy, cx] = 255 - noisy[cy, cx]
+    pixel, patch = ImageScanner(verify_metric=VERIFY_PIXEL), ImageScanner(verify_metric=VERIFY_PATCH)
+    try:
+        assert not pixel.verify_match(noisy, hit)[0]
+        assert patch.verify_match(noisy, hit)[0]
+    finally:
+        pixel.close()
+        patch.close()
+
+
+def test_click_image_verifies_the_matched_frame(tmp_path, fake_adb, adb_log):
+    frame = textured_frame()
+    path = tmp_path / 'button.png'
+    cv2.imwrite(str(path), frame[30:50, 40:64, :3])
+    capture = FileReplayBackend.from_frames([frame])
+    scanner = ImageScanner(window_registry=WindowRegistry(FakeWindowBackend([(1, 100, 'LDPlayer-0')])),
+                           capture_backend=capture,
+                           tap_options={'batch_window': 0, 'tap_interval': 0})
+    # 캡처 좌표를 그대로 탭 좌표로 쓴다
+    scanner.capture_backend.device_coordinates = True
+    try:
+        assert scanner.click_image(str(path), 'LDPlayer-0', adb_path=fake_adb)
+        assert scanner.click_dispatcher(fake_adb).drain()
+        # 매칭에 쓴 프레임으로 검증하므로 다시 캡처하지 않는다
+        assert capture.captures == 1
+        assert 'input tap 52 40' in adb_log()
+    finally:
+        scanner.close()
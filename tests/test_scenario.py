@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+from src.scenario import ScenarioError, ScenarioWatcher, compile_plan
+from src.utils.scanner import ACTION_KILL, ACTION_TAP
+
+
+@pytest.fixture
+def base(tmp_path):
+    for folder, names in (('click_images', ('ok.png', 'skip.png', 'notes.txt')),
+                          ('images', ('error.png',))):
+        (tmp_path / folder).mkdir()
+        for name in names:
+            (tmp_path / folder / name).write_bytes(b'')
+    return tmp_path
+
+
+def names(plan):
+    return [(os.path.basename(spec.path), spec.action) for spec in plan]
+
+
+def test_folders_and_manifest_are_merged(base):
+    manifest = {
+        'default_confidence': 0.9,
+        'templates': [
+            {'path': 'click_images/skip.png', 'action': 'ignore'},
+            {'path': 'click_images/ok.png', 'confidence': 0.7, 'roi': [0, 400, 994, 178],
+             'cooldown': 2, 'priority': 10},
+            {'path': 'extra/close.png', 'action': 'kill'},
+        ],
+    }
+    plan = compile_plan(manifest, str(base), version=3)
+    # 우선순위가 높은 항목이 먼저, 같으면 폴더 → 매니페스트 순서
+    assert names(plan) == [('ok.png', ACTION_TAP), ('error.png', ACTION_KILL), ('close.png', ACTION_KILL)]
+    assert plan.version == 3
+    ok = plan.by_path[os.path.normpath(str(base / 'click_images' / 'ok.png'))]
+    assert (ok.confidence, ok.roi, ok.cooldown, ok.priority) == (0.7, (0, 400, 994, 178), 2.0, 10)
+    error = plan.templates[1]
+    # 매니페스트에 없으면 기본 신뢰도, cooldown은 탭 대기열 기본값
+    assert (error.confidence, error.cooldown, error.priority) == (0.9, None, 0)
+
+
+def test_folders_can_be_disabled(base):
+    plan = compile_plan({'folders': False, 'templates': [{'path': 'images/error.png', 'action': 'kill'}]},
+                        str(base))
+    assert names(plan) == [('error.png', ACTION_KILL)]
+
+
+@pytest.mark.parametrize('entry', [
+    {'action': 'tap'},
+    {'path': 'a.png', 'action': 'swipe'},
+    {'path': 'a.png', 'roi': [0, 0, 10]},
+])
+def test_invalid_entries_are_rejected(base, entry):
+    with pytest.raises(ScenarioError):
+        compile_plan({'templates': [entry]}, str(base))
+
+
+def test_watcher_keeps_previous_plan_on_bad_manifest(base):
+    config_path = base / 'config.json'
+    config_path.write_text(json.dumps({'scenario': {'folders': True}}), encoding='utf-8')
+    watcher = ScenarioWatcher(str(config_path), str(base), poll_interval=0)
+    first = watcher.plan()
+    assert len(first) == 3
+    assert watcher.plan() is first
+
+    config_path.write_text(json.dumps({'scenario': {'templates': [{'action': 'tap'}]}}), encoding='utf-8')
+    os.utime(config_path, ns=(0, os.stat(config_path).st_mtime_ns + 10 ** 9))
+    assert watcher.plan() is first
+
+    config_path.write_text(json.dumps({'scenario': {'folders': False}}), encoding='utf-8')
+    os.utime(config_path, ns=(0, os.stat(config_path).st_mtime_ns + 2 * 10 ** 9))
+    assert len(watcher.plan()) == 0
+    assert watcher.compiles == 2
@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.scheduler import AdaptiveScheduler
+
+
+class Hit:
+    def __init__(self, reused=False):
+        self.reused = reused
+
+
+class Result:
+    def __init__(self, hits=(), scan_kind='full'):
+        self.hits = list(hits)
+        self.scan_kind = scan_kind
+
+
+class ScriptedScan:
+    """정해 둔 결과를 차례로 돌려주고, 호출될 때마다 그 시점의 검사 주기를 기록"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.intervals = []
+        self.scheduler = None
+        self.done = threading.Event()
+
+    def __call__(self, key):
+        self.intervals.append(self.scheduler.schedules[key].interval)
+        if not self.results:
+            self.done.set()
+            return None
+        return self.results.pop(0)
+
+
+def run(results, **options):
+    scan = ScriptedScan(results)
+    executor = ThreadPoolExecutor(max_workers=1)
+    options = {'interval': 0.02, 'min_interval': 0.01, 'max_interval': 0.16, 'backoff': 2.0,
+               'cpu_budget': 0, **options}
+    scheduler = AdaptiveScheduler(scan, executor, lambda: ['LDPlayer-0'], **options)
+    scan.scheduler = scheduler
+    scheduler.start()
+    try:
+        assert scan.done.wait(10.0)
+    finally:
+        scheduler.stop()
+        executor.shutdown(wait=True)
+    return scan.intervals
+
+
+def test_static_screen_backs_off_until_max_interval():
+    intervals = run([Result(scan_kind='skipped')] * 4 + [Result(scan_kind='partial')])
+    assert intervals[:6] == [0.02, 0.04, 0.08, 0.16, 0.16, 0.02]
+
+
+def test_reused_hits_back_off_and_fresh_hit_resets():
+    reused = Result([Hit(reused=True)], scan_kind='partial')
+    intervals = run([reused, reused, Result([Hit()])])
+    # 재사용한 매칭만 있으면 늘리고, 새로 찾은 매칭이 있으면 min_interval로 당긴다
+    assert intervals[:4] == [0.02, 0.04, 0.08, 0.01]
+
+
+def test_budget_counts_cpu_time_not_wall_time():
+    def scan(key):
+        if key == 'busy':
+            deadline = time.thread_time() + 0.05
+            while time.thread_time() < deadline:
+                pass
+        else:
+            time.sleep(0.05)
+
+    scheduler = AdaptiveScheduler(scan, None, lambda: [], cpu_budget=0.005, budget_window=5.0)
+    scheduler._timed_scan('sleepy')
+    assert scheduler.cpu_usage() < 0.002
+    assert scheduler._budget_factor() == 1.0
+    scheduler._timed_scan('busy')
+    assert scheduler.cpu_usage() >= 0.01
+    # 예산을 넘긴 만큼 주기를 늘린다
+    assert scheduler._budget_factor() == scheduler.cpu_usage() / 0.005
@@ -0,0 +1,67 @@
+from src.utils.windows import FakeWindowBackend, WindowRegistry
+
+WINDOWS = [
+    (101, 1000, 'LDPlayer-2'),
+    (102, 1001, 'LDPlayer-0'),
+    (103, 1001, 'LDPlayer-0 도구'),
+    (104, 2000, '메모장'),
+]
+
+
+def registry(windows=WINDOWS, ttl=60.0):
+    backend = FakeWindowBackend(windows)
+    return backend, WindowRegistry(backend, ttl=ttl)
+
+
+def test_lookups_share_one_sweep_within_ttl():
+    backend, windows = registry()
+    assert windows.ldplayer_windows() == [(102, 'LDPlayer-0'), (101, 'LDPlayer-2')]
+    assert windows.ldplayer_title(1001) == 'LDPlayer-0'
+    assert windows.hwnd_for_pid(1000) == 101
+    assert windows.hwnd_for_title('LDPlayer-2') == 101
+    assert windows.hwnd_for_title('LDPlayer-9') is None
+    assert windows.ldplayer_title(2000) is None
+    assert backend.enum_calls == 1
+    assert windows.stats() == {'sweeps': 1, 'cache_hits': 5}
+
+
+def test_expired_snapshot_is_refreshed():
+    backend, windows = registry(ttl=0.0)
+    windows.hwnd_for_title('LDPlayer-0')
+    windows.snapshot(max_age=-1)
+    assert backend.enum_calls == 2
+
+
+def test_invalidate_picks_up_renamed_window():
+    backend, windows = registry()
+    assert windows.hwnd_for_title('LDPlayer-2') == 101
+    backend.set_windows([(101, 1000, 'LDPlayer-3'), *WINDOWS[1:]])
+    # 캐시를 비우기 전까지는 이전 목록을 쓴다
+    assert windows.hwnd_for_title('LDPlayer-2') == 101
+    windows.invalidate()
+    assert windows.hwnd_for_title('LDPlayer-2') is None
+    assert windows.hwnd_for_title('LDPlayer-3') == 101
+    assert windows.ldplayer_title(1000) == 'LDPlayer-3'
+
+
+def test_invalidate_forgets_closed_window():
+    backend, windows = registry()
+    assert windows.hwnd_for_pid(1000) == 101
+    backend.set_windows(WINDOWS[1:])
+    windows.invalidate()
+    assert windows.hwnd_for_pid(1000) is None
+    assert windows.ldplayer_title(1000) is None
+    assert windows.ldplayer_windows() == [(102, 'LDPlayer-0')]
+
+
+def test_reused_handle_maps_to_new_owner():
+    backend, windows = registry()
+    assert windows.ldplayer_title(1000) == 'LDPlayer-2'
+    # 닫힌 창의 핸들을 다른 프로세스의 새 창이 다시 받은 경우
+    backend.set_windows([(101, 3000, '메모장'), *WINDOWS[1:]])
+    windows.invalidate()
+    snapshot = windows.snapshot()
+    assert snapshot.by_hwnd[101].pid == 3000
+    assert windows.hwnd_for_pid(1000) is None
+    assert windows.hwnd_for_title('LDPlayer-2') is None
+    assert [hwnd for hwnd, _ in windows.ldplayer_windows()] == [102]